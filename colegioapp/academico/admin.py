@@ -5,7 +5,8 @@ from .models import (
     Curso, Docente, Estudiante,
     AnioLectivo, Periodo,
     AsignaturaCatalogo, AsignaturaOferta,
-    Logro, CalificacionLogro, Observador, ObservacionBoletin, PaseLista, AsistenciaDetalle, Matricula, BloqueHorario
+    Logro, CalificacionLogro, Observador, ObservacionBoletin, PaseLista, AsistenciaDetalle, Matricula, BloqueHorario,
+    CierrePeriodo,
 )
 
 @admin.register(Matricula)
@@ -217,8 +218,15 @@ class ObservacionBoletinAdmin(admin.ModelAdmin):
     texto_corto.short_description = "Observación"
 
 class AsistenciaDetalleInline(admin.TabularInline):
+    # Sólo consulta: los cambios van por el pase de lista, que mantiene los contadores
     model = AsistenciaDetalle
     extra = 0
+    fields = ("estudiante", "estado", "observacion")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(PaseLista)
 class PaseListaAdmin(admin.ModelAdmin):
@@ -278,3 +286,10 @@ class BloqueHorarioAdmin(admin.ModelAdmin):
         return f"{d.apellidos} {d.nombres}"
 
 admin.site.register(Observador)
+
+
+@admin.register(CierrePeriodo)
+class CierrePeriodoAdmin(admin.ModelAdmin):
+    list_display = ("school", "anio", "periodo", "cerrado", "cerrado_por", "fecha_cierre", "fecha_reapertura")
+    list_filter = ("school", "anio", "cerrado")
+    readonly_fields = ("cerrado_por", "fecha_cierre", "fecha_reapertura")
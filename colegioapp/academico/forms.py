@@ -241,6 +241,84 @@ class LogroForm(forms.ModelForm):
                 raise ValidationError("Ya existe un logro con ese título para esta oferta y periodo.")
         return cleaned
 
+class LogroBulkForm(forms.Form):
+    """
+    Crea el mismo logro en varias ofertas y períodos en un paso:
+    - mismo tipo, título, descripción y peso
+    - varias ofertas (p. ej. Matemáticas de todos los sextos)
+    - varios períodos (se usan los del año de cada oferta)
+    - (opcional) copia las actividades de un logro existente
+    """
+    tipo = forms.ChoiceField(
+        choices=Logro.TIPO_CHOICES,
+        initial=Logro.TIPO_HACER,
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+    titulo = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={"class": "form-input"})
+    )
+    descripcion = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={"class": "form-input", "rows": 3})
+    )
+    peso = forms.DecimalField(
+        max_digits=5, decimal_places=2,
+        min_value=Decimal("0.00"), max_value=Decimal("100.00"),
+        widget=forms.NumberInput(attrs={"class": "form-input", "step": "0.01"})
+    )
+    ofertas = forms.ModelMultipleChoiceField(
+        queryset=AsignaturaOferta.objects.none(),
+        widget=forms.SelectMultiple(attrs={"class": "form-select", "size": 10})
+    )
+    periodos = forms.ModelMultipleChoiceField(
+        queryset=Periodo.objects.select_related("anio").order_by("-anio__activo", "-anio__nombre", "numero"),
+        widget=forms.SelectMultiple(attrs={"class": "form-select", "size": 5})
+    )
+    copiar_actividades_de = forms.ModelChoiceField(
+        queryset=Logro.objects.none(),
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+
+    def __init__(self, *args, school=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["ofertas"].queryset = (
+            AsignaturaOferta.objects
+            .select_related("anio", "curso", "asignatura")
+            .filter(school=school)
+            .order_by("-anio__activo", "-anio__nombre", "asignatura__nombre", "curso__grado", "curso__nombre")
+        )
+        self.fields["copiar_actividades_de"].queryset = (
+            Logro.objects
+            .select_related("oferta__curso", "oferta__asignatura", "periodo")
+            .filter(school=school, actividades__isnull=False)
+            .distinct()
+            .order_by("oferta__asignatura__nombre", "oferta__curso__grado", "periodo__numero", "titulo")
+        )
+        self.fields["copiar_actividades_de"].label_from_instance = (
+            lambda lg: f"{lg.oferta.asignatura} · {lg.oferta.curso} · {lg.periodo.nombre} · {lg.titulo}"
+        )
+
+    def clean_titulo(self):
+        return self.cleaned_data["titulo"].strip()
+
+    def clean(self):
+        cleaned = super().clean()
+        ofertas = cleaned.get("ofertas")
+        periodos = cleaned.get("periodos")
+        if ofertas and periodos:
+            # sólo los períodos del año de cada oferta
+            cleaned["destinos"] = [
+                (oferta, periodo)
+                for oferta in ofertas
+                for periodo in periodos
+                if periodo.anio_id == oferta.anio_id
+            ]
+            if not cleaned["destinos"]:
+                raise ValidationError("Ningún período elegido pertenece al año lectivo de las ofertas.")
+        return cleaned
+
 class AnioLectivoForm(forms.ModelForm):
     class Meta:
         model = AnioLectivo
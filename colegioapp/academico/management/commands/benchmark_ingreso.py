@@ -0,0 +1,94 @@
+import json
+import statistics
+import time
+from datetime import time as hora
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from academico import utils_ingreso
+from academico.models import Estudiante
+from academico.views import ingreso_registrar
+from myapp.models import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántas lecturas por segundo atiende el ingreso por portería en un proceso: "
+        "llama a la vista con las identificaciones del colegio y vacía la cola por lotes. "
+        "Todo se deshace al final salvo con --guardar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--colegio", type=int, help="Id del colegio (por defecto, el primero).")
+        parser.add_argument("-n", "--lecturas", type=int, default=500)
+        parser.add_argument(
+            "--tarde",
+            action="store_true",
+            help="Simula que todos llegan tarde (cada lectura escribe una tardanza).",
+        )
+        parser.add_argument("--guardar", action="store_true", help="No deshacer lo escrito.")
+
+    def handle(self, *args, **opts):
+        school = (
+            School.objects.filter(pk=opts["colegio"]).first() if opts["colegio"]
+            else School.objects.first()
+        )
+        if school is None:
+            raise CommandError("No hay colegio.")
+        usuario = User.objects.filter(is_superuser=True).first()
+        if usuario is None:
+            raise CommandError("Se necesita un superusuario para llamar la vista.")
+
+        codigos = list(
+            Estudiante.objects.filter(school=school, curso__isnull=False)
+            .values_list("identificacion", flat=True)
+        )
+        if not codigos:
+            raise CommandError("El colegio no tiene estudiantes con curso.")
+        n = opts["lecturas"]
+        lecturas = [codigos[i % len(codigos)] for i in range(n)]
+        if opts["tarde"]:
+            school.hora_limite_ingreso = hora(0, 0)
+
+        fabrica = RequestFactory()
+        tiempos = []
+        with transaction.atomic():
+            utils_ingreso._indices.clear()
+
+            t0 = time.perf_counter()
+            for codigo in lecturas:
+                request = fabrica.post(
+                    "/academico/ingreso/registrar/",
+                    data=json.dumps({"codigo": codigo}),
+                    content_type="application/json",
+                )
+                request.user = usuario
+                request.school = school
+                t = time.perf_counter()
+                respuesta = ingreso_registrar(request)
+                tiempos.append(time.perf_counter() - t)
+                if respuesta.status_code != 200:
+                    raise CommandError(f"Lectura {codigo}: {respuesta.content.decode()}")
+            utils_ingreso.vaciar_cola()
+            total = time.perf_counter() - t0
+
+            if not opts["guardar"]:
+                transaction.set_rollback(True)
+
+        tiempos.sort()
+        p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+        unicas = len(set(lecturas))
+        self.stdout.write(
+            f"{n} lecturas ({unicas} estudiantes, {n - unicas} repetidas) en {total:.2f} s"
+        )
+        self.stdout.write(
+            f"por lectura: media {statistics.mean(tiempos) * 1000:.2f} ms · "
+            f"p95 {p95 * 1000:.2f} ms · máx {tiempos[-1] * 1000:.1f} ms (lectura que vacía un lote)"
+        )
+        estilo = self.style.SUCCESS if n / total >= 50 else self.style.WARNING
+        self.stdout.write(estilo(f"{n / total:,.0f} lecturas/s (objetivo: 50)"))
+        if not opts["guardar"]:
+            self.stdout.write("Cambios deshechos (usa --guardar para conservarlos).")
@@ -0,0 +1,102 @@
+import io
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from weasyprint import HTML
+
+from academico.utils_boletin import contexto_boletin_ejemplo
+from academico.utils_pdf import HOJAS_PDF, _ruta_static, renderizar_local
+from academico.utils_pdf_rapido import boletines_pdf_rapido
+
+
+def _resumen(tiempos):
+    tiempos = sorted(tiempos)
+    p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+    return (
+        f"media {statistics.mean(tiempos) * 1000:7.1f} ms · "
+        f"p50 {statistics.median(tiempos) * 1000:7.1f} ms · "
+        f"p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de render del boletín en PDF: en frío, en caliente, vía servicio "
+        "y, con --lote, un curso completo con WeasyPrint frente al motor rápido (reportlab)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--repeticiones", type=int, default=10)
+        parser.add_argument("--asignaturas", type=int, default=12)
+        parser.add_argument("--base-url", default="http://localhost/")
+        parser.add_argument(
+            "--servicio",
+            action="store_true",
+            help="Medir también el servicio persistente (requiere servidor_pdf corriendo).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=0,
+            help="Boletines por documento para comparar WeasyPrint con el motor rápido (ej. 40).",
+        )
+
+    def _medir(self, etiqueta, fn, n):
+        tiempos = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - t0)
+        self.stdout.write(f"{etiqueta:<12} {_resumen(tiempos)}")
+        return statistics.mean(tiempos)
+
+    def handle(self, *args, **opts):
+        n = opts["repeticiones"]
+        base_url = opts["base_url"]
+        html = render_to_string("academico/boletin_estudiante_pdf.html", contexto_boletin_ejemplo(opts["asignaturas"]))
+
+        # En frío = como se hacía antes: CSS incrustado y sin estado compartido
+        with open(_ruta_static(HOJAS_PDF["boletin"]), encoding="utf-8") as fh:
+            css_inline = fh.read()
+        html_frio = html.replace("</head>", f"<style>{css_inline}</style></head>", 1)
+
+        frio = self._medir("frío", lambda: HTML(string=html_frio, base_url=base_url).write_pdf(), n)
+
+        renderizar_local(html, base_url=base_url, hojas=["boletin"])  # calentar
+        caliente = self._medir(
+            "caliente", lambda: renderizar_local(html, base_url=base_url, hojas=["boletin"]), n
+        )
+        self.stdout.write(self.style.SUCCESS(f"Mejora en caliente: x{frio / caliente:.1f}"))
+
+        if opts["servicio"]:
+            from academico.servicio_pdf import renderizar_remoto
+
+            if not getattr(settings, "PDF_SERVICIO_SOCKET", None):
+                raise CommandError("Define PDF_SERVICIO_SOCKET para medir el servicio.")
+            self._medir(
+                "servicio", lambda: renderizar_remoto(html, base_url=base_url, hojas=["boletin"]), n
+            )
+
+        if opts["lote"]:
+            self._comparar_motores(opts, base_url, n)
+
+    def _comparar_motores(self, opts, base_url, n):
+        lote = opts["lote"]
+        ctx = contexto_boletin_ejemplo(opts["asignaturas"])
+        pagina = render_to_string("academico/partials/boletin_pagina.html", ctx)
+        html_curso = render_to_string(
+            "academico/boletin_curso_pdf.html",
+            {"paginas": [pagina] * lote, "curso": ctx["curso"], "periodo": ctx["periodo"]},
+        )
+
+        self.stdout.write(f"Curso de {lote} boletines:")
+        weasy = self._medir(
+            "weasyprint", lambda: renderizar_local(html_curso, base_url=base_url, hojas=["boletin"]), n
+        )
+        rapido = self._medir(
+            "reportlab", lambda: boletines_pdf_rapido([ctx] * lote, io.BytesIO()), n
+        )
+        self.stdout.write(self.style.SUCCESS(f"Motor rápido: x{weasy / rapido:.1f}"))
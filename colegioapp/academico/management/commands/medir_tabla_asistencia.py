@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+
+from academico.models import AsistenciaDetalle, Estudiante, PaseLista
+
+
+def _tamano_tabla(tabla):
+    """(bytes de datos + índices, bytes promedio por fila) o (None, None) si el motor no lo informa."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT data_length + index_length, avg_row_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [tabla],
+            )
+            fila = cursor.fetchone()
+            return (fila[0], fila[1]) if fila else (None, None)
+        if connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR tbl_name = %s",
+                    [tabla, tabla],
+                )
+            except Exception:
+                return None, None  # sqlite sin dbstat
+            return cursor.fetchone()[0], None
+    return None, None
+
+
+def _kb(n):
+    return "—" if n is None else f"{n / 1024:,.1f} KB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Tamaño de la tabla de asistencia guardando sólo excepciones, comparado con "
+        "una fila por estudiante en cada pase de lista (el esquema anterior)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--compactar",
+            action="store_true",
+            help='Borra antes las filas "presente" sin observación que queden.',
+        )
+
+    def handle(self, *args, **opts):
+        tabla = AsistenciaDetalle._meta.db_table
+
+        if opts["compactar"]:
+            borradas, _ = AsistenciaDetalle.objects.filter(
+                estado=AsistenciaDetalle.PRESENTE, observacion="",
+            ).delete()
+            self.stdout.write(f"Filas compactadas: {borradas}")
+
+        pases = PaseLista.objects.count()
+        # Filas del esquema anterior: todos los estudiantes del curso en cada pase
+        por_curso = dict(
+            Estudiante.objects.filter(curso__isnull=False)
+            .values("curso_id").annotate(n=Count("id")).values_list("curso_id", "n")
+        )
+        completas = sum(
+            por_curso.get(curso_id, 0) * n
+            for curso_id, n in PaseLista.objects.values("curso_id").annotate(n=Count("id"))
+            .values_list("curso_id", "n")
+        )
+        resumen = AsistenciaDetalle.objects.aggregate(
+            total=Count("id"),
+            presentes=Count("id", filter=Q(estado=AsistenciaDetalle.PRESENTE, observacion="")),
+        )
+        actuales = resumen["total"]
+        excepciones = actuales - resumen["presentes"]
+
+        tamano, por_fila = _tamano_tabla(tabla)
+        if por_fila is None and tamano and actuales:
+            por_fila = tamano / actuales
+
+        def estimado(filas):
+            return filas * por_fila if por_fila else None
+
+        self.stdout.write(f"Pases de lista:                 {pases:>10,}")
+        self.stdout.write(
+            f"Una fila por estudiante:        {completas:>10,} filas  {_kb(estimado(completas))}"
+        )
+        self.stdout.write(f"Guardadas ahora:                {actuales:>10,} filas  {_kb(tamano)}")
+        self.stdout.write(
+            f"Sólo excepciones:               {excepciones:>10,} filas  {_kb(estimado(excepciones))}"
+        )
+        if excepciones:
+            self.stdout.write(self.style.SUCCESS(
+                f"Reducción frente a una fila por estudiante: {completas / excepciones:.1f}×"
+            ))
+        if resumen["presentes"]:
+            self.stdout.write(self.style.WARNING(
+                f'Quedan {resumen["presentes"]:,} filas "presente" sin observación: usa --compactar.'
+            ))
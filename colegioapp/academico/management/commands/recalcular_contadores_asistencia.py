@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from academico.models import AnioLectivo
+from academico.utils_asistencia import reconstruir_contadores
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los contadores de fallas, tardanzas y excusas por estudiante "
+        "y período a partir del detalle de asistencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--anio", type=int, help="Id del año lectivo (por defecto, todos).")
+
+    def handle(self, *args, **opts):
+        anio = None
+        if opts["anio"]:
+            anio = AnioLectivo.objects.filter(pk=opts["anio"]).first()
+            if anio is None:
+                raise CommandError(f"No existe el año lectivo {opts['anio']}.")
+
+        total = reconstruir_contadores(anio)
+        self.stdout.write(self.style.SUCCESS(f"Contadores reconstruidos: {total}"))
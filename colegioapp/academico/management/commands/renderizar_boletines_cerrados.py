@@ -0,0 +1,52 @@
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+
+from academico.models import CierrePeriodo
+from academico.utils_boletin import renderizar_pdfs_cierre
+from academico.utils_pdf import html_a_pdf
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera el PDF de los boletines congelados que aún no lo tienen, en los "
+        "períodos cerrados con PDF pedidos. Pensado para cron: se puede repetir "
+        "sin riesgo, sólo rinde los pendientes y reintenta los que fallaron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", type=int, help="Id del colegio (por defecto, todos).")
+        parser.add_argument("--periodo", type=int, help="Id del período (por defecto, todos los cerrados).")
+        parser.add_argument("--base-url", default="http://localhost/")
+
+    def handle(self, *args, **opts):
+        base_url = opts["base_url"]
+        cierres = CierrePeriodo.objects.filter(cerrado=True, generar_pdf=True).select_related("anio", "periodo", "school")
+        if opts["school"]:
+            cierres = cierres.filter(school_id=opts["school"])
+        if opts["periodo"]:
+            cierres = cierres.filter(periodo_id=opts["periodo"])
+
+        def render_pdf(ctx):
+            html = render_to_string("academico/boletin_estudiante_pdf.html", ctx)
+            return html_a_pdf(html, base_url=base_url, hojas=("boletin",))
+
+        # Mismo logo y sello que el cierre desde la web (ver views._urls_logo_sello)
+        vivos = {
+            "colegio": None,
+            "logo_url": urljoin(base_url, static("img/logo.png")),
+            "sello_url": urljoin(base_url, static("img/sello.png")),
+        }
+
+        total_fallidos = 0
+        for cierre in cierres:
+            generados, fallidos = renderizar_pdfs_cierre(cierre, render_pdf, **vivos)
+            total_fallidos += fallidos
+            self.stdout.write(f"{cierre}: {generados} generados, {fallidos} fallidos")
+
+        if total_fallidos:
+            self.stdout.write(self.style.WARNING(f"{total_fallidos} PDF fallaron; vuelve a ejecutar para reintentar."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Listo."))
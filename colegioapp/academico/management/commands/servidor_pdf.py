@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from academico.servicio_pdf import PDF_SERVICIO_COLA, servir
+
+
+class Command(BaseCommand):
+    help = "Arranca el servicio persistente de render de PDF (socket Unix)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=getattr(settings, "PDF_SERVICIO_SOCKET", None),
+            help="Ruta del socket Unix (por defecto settings.PDF_SERVICIO_SOCKET).",
+        )
+        parser.add_argument("--workers", type=int, default=2, help="Procesos de render.")
+        parser.add_argument("--cola", type=int, default=PDF_SERVICIO_COLA, help="Máximo de peticiones en espera.")
+        parser.add_argument(
+            "--max-renders",
+            type=int,
+            default=500,
+            help="Renders por worker antes de reciclarlo (0 = sin límite).",
+        )
+
+    def handle(self, *args, **opts):
+        if not opts["socket"]:
+            raise CommandError("Indica --socket o define PDF_SERVICIO_SOCKET en settings.")
+
+        servir(
+            opts["socket"],
+            workers=opts["workers"],
+            cola=opts["cola"],
+            max_renders=opts["max_renders"],
+            stdout=self.stdout,
+        )
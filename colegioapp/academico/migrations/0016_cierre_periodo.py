@@ -0,0 +1,53 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:08
+
+import academico.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_school_sello'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('academico', '0015_asignaturacatalogo_school_asignaturaoferta_school_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierrePeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cerrado', models.BooleanField(default=True)),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True)),
+                ('fecha_reapertura', models.DateTimeField(blank=True, null=True)),
+                ('anio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academico.aniolectivo')),
+                ('cerrado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='academico.periodo')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.school')),
+            ],
+            options={
+                'verbose_name': 'Cierre de período',
+                'verbose_name_plural': 'Cierres de período',
+                'unique_together': {('school', 'anio', 'periodo')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BoletinSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datos', models.JSONField(decoder=academico.models._JSONDecimalDecoder, encoder=academico.models._JSONDecimalEncoder)),
+                ('pdf', models.FileField(blank=True, null=True, upload_to='boletines/')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='academico.cierreperiodo')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boletines_cerrados', to='academico.estudiante')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boletines_cerrados', to='academico.periodo')),
+            ],
+            options={
+                'verbose_name': 'Boletín cerrado',
+                'verbose_name_plural': 'Boletines cerrados',
+                'unique_together': {('estudiante', 'periodo')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('myapp', '0004_school_motor_pdf'),
+        ('academico', '0016_cierre_periodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperacionCaptura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op_id', models.CharField(max_length=64)),
+                ('tipo', models.CharField(max_length=20)),
+                ('aplicada', models.DateTimeField(auto_now_add=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.school')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operaciones_captura', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Operación de captura',
+                'verbose_name_plural': 'Operaciones de captura',
+                'unique_together': {('usuario', 'op_id')},
+            },
+        ),
+    ]
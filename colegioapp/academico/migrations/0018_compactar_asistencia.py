@@ -0,0 +1,49 @@
+from django.db import migrations
+
+LOTE = 5000
+
+
+def compactar(apps, schema_editor):
+    """Borra las filas "presente" sin observación: la presencia la da el pase de lista."""
+    AsistenciaDetalle = apps.get_model("academico", "AsistenciaDetalle")
+    presentes = AsistenciaDetalle.objects.filter(estado="P", observacion="")
+    while True:
+        ids = list(presentes.values_list("id", flat=True)[:LOTE])
+        if not ids:
+            break
+        AsistenciaDetalle.objects.filter(pk__in=ids).delete()
+
+
+def expandir(apps, schema_editor):
+    """Vuelve a crear una fila "P" por estudiante del curso en cada pase sin fila."""
+    PaseLista = apps.get_model("academico", "PaseLista")
+    AsistenciaDetalle = apps.get_model("academico", "AsistenciaDetalle")
+    Estudiante = apps.get_model("academico", "Estudiante")
+
+    por_curso = {}
+    for est_id, curso_id in Estudiante.objects.filter(curso__isnull=False).values_list("id", "curso_id"):
+        por_curso.setdefault(curso_id, []).append(est_id)
+
+    for pase_id, curso_id in PaseLista.objects.values_list("id", "curso_id").iterator():
+        con_fila = set(
+            AsistenciaDetalle.objects.filter(pase_id=pase_id).values_list("estudiante_id", flat=True)
+        )
+        AsistenciaDetalle.objects.bulk_create(
+            [
+                AsistenciaDetalle(pase_id=pase_id, estudiante_id=est_id, estado="P", observacion="")
+                for est_id in por_curso.get(curso_id, [])
+                if est_id not in con_fila
+            ],
+            batch_size=LOTE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0017_operacion_captura'),
+    ]
+
+    operations = [
+        migrations.RunPython(compactar, expandir),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+
+def llenar_contadores(apps, schema_editor):
+    AsistenciaDetalle = apps.get_model("academico", "AsistenciaDetalle")
+    ContadorAsistencia = apps.get_model("academico", "ContadorAsistencia")
+    totales = (
+        AsistenciaDetalle.objects
+        .exclude(estado="P")
+        .values("estudiante_id", "pase__anio_id", "pase__periodo_id")
+        .annotate(
+            fallas=Count("id", filter=Q(estado="A")),
+            tardanzas=Count("id", filter=Q(estado="T")),
+            justificadas=Count("id", filter=Q(estado="J")),
+        )
+    )
+    ContadorAsistencia.objects.bulk_create(
+        [
+            ContadorAsistencia(
+                estudiante_id=t["estudiante_id"],
+                anio_id=t["pase__anio_id"],
+                periodo_id=t["pase__periodo_id"],
+                fallas=t["fallas"],
+                tardanzas=t["tardanzas"],
+                justificadas=t["justificadas"],
+            )
+            for t in totales
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0018_compactar_asistencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorAsistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fallas', models.PositiveIntegerField(default=0)),
+                ('tardanzas', models.PositiveIntegerField(default=0)),
+                ('justificadas', models.PositiveIntegerField(default=0)),
+                ('anio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academico.aniolectivo')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores_asistencia', to='academico.estudiante')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academico.periodo')),
+            ],
+            options={
+                'verbose_name': 'Contador de asistencia',
+                'verbose_name_plural': 'Contadores de asistencia',
+                'unique_together': {('estudiante', 'anio', 'periodo')},
+            },
+        ),
+        migrations.RunPython(llenar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:50
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def calcular_deuda_bloqueante(apps, schema_editor):
+    """Primer vencimiento impago de un concepto que bloquea el boletín, más un día."""
+    CuentaPorCobrar = apps.get_model("cartera", "CuentaPorCobrar")
+    Estudiante = apps.get_model("academico", "Estudiante")
+
+    vencimientos = (
+        CuentaPorCobrar.objects
+        .filter(
+            pagada=False,
+            saldo_pendiente__gt=0,
+            concepto__bloquea_boletin=True,
+            fecha_vencimiento__isnull=False,
+        )
+        .values("estudiante_id")
+        .annotate(primero=Min("fecha_vencimiento"))
+        .values_list("estudiante_id", "primero")
+    )
+    por_fecha = {}
+    for est_id, primero in vencimientos:
+        por_fecha.setdefault(primero + timedelta(days=1), []).append(est_id)
+    for desde, ids in por_fecha.items():
+        Estudiante.objects.filter(pk__in=ids).update(deuda_bloqueante_desde=desde)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0019_contador_asistencia'),
+        ('cartera', '0004_cuenta_unica_por_mes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='deuda_bloqueante_desde',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calcular_deuda_bloqueante, migrations.RunPython.noop),
+    ]
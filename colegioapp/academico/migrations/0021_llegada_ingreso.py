@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-19 12:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+        ('academico', '0020_deuda_bloqueante_desde'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LlegadaIngreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('momento', models.DateTimeField()),
+                ('tarde', models.BooleanField(default=False)),
+                ('guardada', models.BooleanField(db_index=True, default=False)),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academico.curso')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='llegadas', to='academico.estudiante')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academico.periodo')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.school')),
+            ],
+            options={
+                'verbose_name': 'Llegada por portería',
+                'verbose_name_plural': 'Llegadas por portería',
+                'unique_together': {('estudiante', 'fecha')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0021_llegada_ingreso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierreperiodo',
+            name='generar_pdf',
+            field=models.BooleanField(default=False),
+        ),
+    ]
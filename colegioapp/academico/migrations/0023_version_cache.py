@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-19 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0022_cierre_generar_pdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=60, unique=True)),
+                ('version', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Versión de caché',
+                'verbose_name_plural': 'Versiones de caché',
+            },
+        ),
+    ]
@@ -1,3 +1,6 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
@@ -51,6 +54,9 @@ class Estudiante(models.Model):
     acudiente = models.CharField(max_length=100, blank=True, null=True)
     user = models.OneToOneField(User, null=True, blank=True, on_delete=models.SET_NULL)
     foto = models.ImageField(upload_to='estudiantes/', null=True, blank=True)
+    # Día desde el que una deuda vencida bloquea el boletín (vacío = al día).
+    # Lo mantiene cartera al guardar cuentas y pagos (cartera/utils.py).
+    deuda_bloqueante_desde = models.DateField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos}"
@@ -233,7 +239,9 @@ class PaseLista(models.Model):
 
 class AsistenciaDetalle(models.Model):
     """
-    Detalle de asistencia por estudiante.
+    Detalle de asistencia por estudiante. Sólo se guardan las excepciones
+    (ausencia, excusa, tardanza, o una observación): un estudiante del curso
+    sin fila en el pase de lista estuvo presente.
     """
     PRESENTE = "P"
     AUSENTE = "A"
@@ -402,4 +410,153 @@ class SaberSer(models.Model):
     fecha_registro = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ("estudiante", "periodo", "asignatura_oferta")
\ No newline at end of file
+        unique_together = ("estudiante", "periodo", "asignatura_oferta")
+
+class _JSONDecimalEncoder(DjangoJSONEncoder):
+    """Decimal -> número JSON (no string), para que al leerlo vuelva a ser Decimal."""
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+class _JSONDecimalDecoder(json.JSONDecoder):
+    """Números con decimales -> Decimal a 2 cifras (notas, pesos y promedios)."""
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("parse_float", lambda s: Decimal(s).quantize(Decimal("0.01")))
+        super().__init__(*args, **kwargs)
+
+
+class CierrePeriodo(models.Model):
+    """
+    Cierre de un período para un colegio. Mientras está cerrado, los boletines
+    se leen de BoletinSnapshot; al reabrirlo se borran los snapshots.
+    """
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    anio = models.ForeignKey(AnioLectivo, on_delete=models.CASCADE)
+    periodo = models.ForeignKey(Periodo, on_delete=models.CASCADE, related_name="cierres")
+    cerrado = models.BooleanField(default=True)
+    cerrado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_cierre = models.DateTimeField(null=True, blank=True)
+    fecha_reapertura = models.DateTimeField(null=True, blank=True)
+    # Se pidieron los PDF: los genera renderizar_boletines_cerrados (cron)
+    generar_pdf = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("school", "anio", "periodo")
+        verbose_name = "Cierre de período"
+        verbose_name_plural = "Cierres de período"
+
+    def __str__(self):
+        estado = "cerrado" if self.cerrado else "abierto"
+        return f"{self.school} - {self.periodo} ({estado})"
+
+
+class BoletinSnapshot(models.Model):
+    """
+    Boletín congelado al cerrar el período: el contexto ya calculado (JSON) y,
+    opcionalmente, el PDF. No se modifica; si el período se reabre, se borra.
+    """
+    cierre = models.ForeignKey(CierrePeriodo, on_delete=models.CASCADE, related_name="snapshots")
+    estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name="boletines_cerrados")
+    periodo = models.ForeignKey(Periodo, on_delete=models.CASCADE, related_name="boletines_cerrados")
+    datos = models.JSONField(encoder=_JSONDecimalEncoder, decoder=_JSONDecimalDecoder)
+    pdf = models.FileField(upload_to="boletines/", null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("estudiante", "periodo")
+        verbose_name = "Boletín cerrado"
+        verbose_name_plural = "Boletines cerrados"
+
+    def __str__(self):
+        return f"{self.estudiante} - {self.periodo}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Un boletín cerrado no se modifica: reabre el período.")
+        super().save(*args, **kwargs)
+
+
+class OperacionCaptura(models.Model):
+    """
+    Operación de captura sin conexión ya aplicada (asistencia o notas). El id
+    lo genera el navegador; si reenvía la misma operación, no se aplica dos veces.
+    """
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="operaciones_captura")
+    op_id = models.CharField(max_length=64)
+    tipo = models.CharField(max_length=20)
+    aplicada = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("usuario", "op_id")
+        verbose_name = "Operación de captura"
+        verbose_name_plural = "Operaciones de captura"
+
+    def __str__(self):
+        return f"{self.usuario} - {self.tipo} {self.op_id}"
+
+
+class ContadorAsistencia(models.Model):
+    """
+    Fallas, tardanzas y excusas de un estudiante en un período. Se actualiza
+    en la misma transacción que guarda el pase de lista (utils_asistencia), así
+    boletines y portal leen una fila en lugar de contar AsistenciaDetalle.
+    """
+    estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name="contadores_asistencia")
+    anio = models.ForeignKey(AnioLectivo, on_delete=models.CASCADE)
+    periodo = models.ForeignKey(Periodo, on_delete=models.CASCADE)
+    fallas = models.PositiveIntegerField(default=0)
+    tardanzas = models.PositiveIntegerField(default=0)
+    justificadas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("estudiante", "anio", "periodo")
+        verbose_name = "Contador de asistencia"
+        verbose_name_plural = "Contadores de asistencia"
+
+    def __str__(self):
+        return f"{self.estudiante} - {self.periodo}: {self.fallas} fallas, {self.tardanzas} tardanzas"
+
+
+class LlegadaIngreso(models.Model):
+    """
+    Primera lectura del día de un estudiante en el kiosko de portería (ver
+    utils_ingreso). Es la cola que se pasa por lotes al pase de lista; la
+    restricción única descarta las lecturas repetidas, las atienda el
+    proceso que las atienda.
+    """
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name="llegadas")
+    curso = models.ForeignKey(Curso, on_delete=models.CASCADE)
+    periodo = models.ForeignKey(Periodo, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    momento = models.DateTimeField()
+    tarde = models.BooleanField(default=False)
+    guardada = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        unique_together = ("estudiante", "fecha")
+        verbose_name = "Llegada por portería"
+        verbose_name_plural = "Llegadas por portería"
+
+    def __str__(self):
+        return f"{self.estudiante} - {self.momento:%Y-%m-%d %H:%M}"
+
+
+class VersionCache(models.Model):
+    """
+    Versión de lo cacheado de un curso, un estudiante o de los datos comunes
+    (ver utils_cache). Vive en la base para que todos los procesos de la app
+    vean el mismo número aunque cada uno tenga su propia caché.
+    """
+    clave = models.CharField(max_length=60, unique=True)
+    version = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Versión de caché"
+        verbose_name_plural = "Versiones de caché"
+
+    def __str__(self):
+        return f"{self.clave} = {self.version}"
@@ -0,0 +1,201 @@
+"""
+Servicio de render de PDF persistente.
+
+Un proceso padre abre un socket Unix y reparte las conexiones entre varios
+procesos hijos que ya tienen cargados WeasyPrint, la configuración de fuentes
+y las hojas de estilo de los PDF (ver utils_pdf.precalentar). Django envía el
+HTML ya renderizado y recibe los bytes del PDF.
+
+La cola es acotada: el backlog del socket es ``PDF_SERVICIO_COLA``. Cuando se
+llena, el cliente no espera indefinidamente: ``renderizar_remoto`` lanza
+ServicioPDFNoDisponible y utils_pdf.html_a_pdf decide si renderiza en local.
+
+Protocolo (todo con prefijo de longitud de 4 bytes, big-endian):
+    petición:  [cabecera JSON] [HTML utf-8]
+    respuesta: 1 byte de estado (b"0" ok / b"1" error) + [PDF o mensaje]
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import time
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PDF_SERVICIO_COLA = getattr(settings, "PDF_SERVICIO_COLA", 32)
+PDF_SERVICIO_TIMEOUT = getattr(settings, "PDF_SERVICIO_TIMEOUT", 60)
+PDF_SERVICIO_TIMEOUT_CONEXION = getattr(settings, "PDF_SERVICIO_TIMEOUT_CONEXION", 2)
+
+_LONGITUD = struct.Struct(">I")
+OK = b"0"
+ERROR = b"1"
+
+
+class ServicioPDFNoDisponible(Exception):
+    """El servicio no está corriendo, está saturado o no respondió a tiempo."""
+
+
+class ErrorRenderPDF(Exception):
+    """El servicio respondió, pero WeasyPrint falló con ese HTML."""
+
+
+# ----------------- utilidades de socket -----------------
+
+def _recibir_exacto(conn, n):
+    partes = []
+    faltan = n
+    while faltan:
+        chunk = conn.recv(min(faltan, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Conexión cerrada antes de tiempo.")
+        partes.append(chunk)
+        faltan -= len(chunk)
+    return b"".join(partes)
+
+
+def _enviar_bloque(conn, data):
+    conn.sendall(_LONGITUD.pack(len(data)) + data)
+
+
+def _recibir_bloque(conn):
+    (n,) = _LONGITUD.unpack(_recibir_exacto(conn, _LONGITUD.size))
+    return _recibir_exacto(conn, n)
+
+
+# ----------------- cliente -----------------
+
+def renderizar_remoto(html_string, base_url=None, hojas=(), ruta_socket=None):
+    """Envía el HTML al servicio y devuelve los bytes del PDF."""
+    ruta_socket = ruta_socket or settings.PDF_SERVICIO_SOCKET
+    if not hasattr(socket, "AF_UNIX"):
+        raise ServicioPDFNoDisponible("Este sistema no soporta sockets Unix.")
+
+    cabecera = json.dumps({"base_url": base_url, "hojas": list(hojas)}).encode("utf-8")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # conectar falla rápido si la cola del servicio está llena
+        sock.settimeout(PDF_SERVICIO_TIMEOUT_CONEXION)
+        try:
+            sock.connect(ruta_socket)
+        except OSError as exc:
+            raise ServicioPDFNoDisponible(f"sin conexión con {ruta_socket}: {exc}") from exc
+
+        sock.settimeout(PDF_SERVICIO_TIMEOUT)
+        try:
+            _enviar_bloque(sock, cabecera)
+            _enviar_bloque(sock, html_string.encode("utf-8"))
+            estado = _recibir_exacto(sock, 1)
+            cuerpo = _recibir_bloque(sock)
+        except (OSError, ConnectionError) as exc:
+            raise ServicioPDFNoDisponible(f"el servicio no respondió: {exc}") from exc
+    finally:
+        sock.close()
+
+    if estado != OK:
+        raise ErrorRenderPDF(cuerpo.decode("utf-8", "replace"))
+    return cuerpo
+
+
+# ----------------- servidor -----------------
+
+def _atender(conn):
+    from academico.utils_pdf import renderizar_local
+
+    conn.settimeout(PDF_SERVICIO_TIMEOUT)
+    try:
+        cabecera = json.loads(_recibir_bloque(conn).decode("utf-8"))
+        html_string = _recibir_bloque(conn).decode("utf-8")
+    except (OSError, ConnectionError, ValueError) as exc:
+        logger.warning("Petición de PDF inválida: %s", exc)
+        return
+
+    try:
+        pdf_bytes = renderizar_local(
+            html_string,
+            base_url=cabecera.get("base_url"),
+            hojas=cabecera.get("hojas") or (),
+        )
+    except Exception as exc:  # el worker sigue vivo aunque un HTML falle
+        logger.exception("Error renderizando PDF")
+        respuesta = ERROR, str(exc).encode("utf-8")
+    else:
+        respuesta = OK, pdf_bytes
+
+    try:
+        conn.sendall(respuesta[0])
+        _enviar_bloque(conn, respuesta[1])
+    except OSError as exc:
+        logger.warning("El cliente se desconectó antes de recibir el PDF: %s", exc)
+
+
+def _bucle_worker(servidor, max_renders):
+    from academico.utils_pdf import precalentar
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # el fork hereda conexiones de BD del padre: que cada hijo abra las suyas
+    connections.close_all()
+    precalentar()
+
+    atendidas = 0
+    while not max_renders or atendidas < max_renders:
+        conn, _ = servidor.accept()
+        try:
+            _atender(conn)
+        finally:
+            conn.close()
+        atendidas += 1
+
+
+def servir(ruta_socket, workers=2, cola=PDF_SERVICIO_COLA, max_renders=0, stdout=None):
+    """
+    Arranca el servicio y bloquea hasta recibir SIGTERM/SIGINT.
+    Los workers que terminan (por max_renders o por un fallo) se reemplazan.
+    """
+    if os.path.exists(ruta_socket):
+        os.unlink(ruta_socket)
+
+    servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    servidor.bind(ruta_socket)
+    os.chmod(ruta_socket, 0o660)
+    servidor.listen(cola)
+
+    # fork: los hijos heredan Django ya configurado y el socket abierto
+    contexto = get_context("fork")
+
+    def _lanzar():
+        p = contexto.Process(target=_bucle_worker, args=(servidor, max_renders), daemon=True)
+        p.start()
+        return p
+
+    procesos = [_lanzar() for _ in range(workers)]
+    if stdout:
+        stdout.write(f"Servicio PDF en {ruta_socket} · {workers} workers · cola {cola}")
+
+    detener = []
+    signal.signal(signal.SIGTERM, lambda *a: detener.append(True))
+    signal.signal(signal.SIGINT, lambda *a: detener.append(True))
+
+    try:
+        while not detener:
+            for i, p in enumerate(procesos):
+                if not p.is_alive():
+                    p.join()
+                    procesos[i] = _lanzar()
+            time.sleep(0.5)
+    finally:
+        for p in procesos:
+            p.terminate()
+        for p in procesos:
+            p.join(timeout=5)
+        servidor.close()
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User, Group
-from .models import Docente
+from myapp.models import School
+from .models import (
+    AnioLectivo, AsignaturaOferta, AsistenciaDetalle, CalificacionLogro, Curso, Docente, Estudiante,
+    Logro, ObservacionBoletin, Observador, PaseLista, Periodo, SaberSer,
+)
+from .utils_asistencia import estudiantes_contados, recontar_al_confirmar
+from .utils_cache import (
+    curso_de_logro, curso_de_oferta, invalidar_datos_estudiante, invalidar_datos_generales,
+    invalidar_notas_curso,
+)
 
 
 @receiver(post_save, sender=Docente)
@@ -70,4 +79,133 @@ def crear_usuario_para_docente(sender, instance, created, **kwargs):
             cambiado = True
 
         if cambiado:
-            user.save()
\ No newline at end of file
+            user.save()
+
+
+# ----------------- contadores de asistencia (ver academico/utils_asistencia.py) -----------------
+# El pase de lista actualiza los contadores al guardarse; aquí se cubre lo
+# que pasa por fuera: borrar un pase (o su curso) y moverlo de período.
+
+@receiver(pre_save, sender=PaseLista)
+def recordar_periodo_pase(sender, instance, **kwargs):
+    instance._periodo_anterior = (
+        PaseLista.objects.filter(pk=instance.pk).values_list("anio_id", "periodo_id").first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=PaseLista)
+def recontar_pase_movido(sender, instance, **kwargs):
+    anterior = getattr(instance, "_periodo_anterior", None)
+    if anterior and anterior != (instance.anio_id, instance.periodo_id):
+        ids = estudiantes_contados(instance)
+        recontar_al_confirmar(*anterior, ids)
+        recontar_al_confirmar(instance.anio_id, instance.periodo_id, ids)
+
+
+@receiver(pre_delete, sender=PaseLista)
+def recordar_estudiantes_pase(sender, instance, **kwargs):
+    # en post_delete el detalle ya se borró en cascada
+    instance._estudiantes_contados = estudiantes_contados(instance)
+
+
+@receiver(post_delete, sender=PaseLista)
+def recontar_pase_borrado(sender, instance, **kwargs):
+    recontar_al_confirmar(
+        instance.anio_id, instance.periodo_id, getattr(instance, "_estudiantes_contados", []),
+    )
+
+
+# ----------------- caché de boletines y portal (ver academico/utils_cache.py) -----------------
+
+@receiver([post_save, post_delete], sender=CalificacionLogro)
+def invalidar_cache_por_calificacion(sender, instance, **kwargs):
+    invalidar_notas_curso(curso_de_logro(instance.logro_id))
+    invalidar_datos_estudiante(instance.estudiante_id)
+
+
+@receiver([post_save, post_delete], sender=SaberSer)
+def invalidar_cache_por_saber_ser(sender, instance, **kwargs):
+    invalidar_notas_curso(curso_de_oferta(instance.asignatura_oferta_id))
+    invalidar_datos_estudiante(instance.estudiante_id)
+
+
+@receiver([post_save, post_delete], sender=Logro)
+def invalidar_cache_por_logro(sender, instance, **kwargs):
+    invalidar_notas_curso(curso_de_oferta(instance.oferta_id))
+
+
+@receiver(pre_save, sender=AsignaturaOferta)
+def recordar_curso_oferta(sender, instance, **kwargs):
+    # si la oferta pasa a otro curso, el que deja también debe invalidarse
+    instance._curso_anterior_id = curso_de_oferta(instance.pk) if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=AsignaturaOferta)
+def invalidar_cache_por_oferta(sender, instance, **kwargs):
+    invalidar_notas_curso(instance.curso_id)
+    anterior = getattr(instance, "_curso_anterior_id", None)
+    if anterior != instance.curso_id:
+        invalidar_notas_curso(anterior)
+
+
+@receiver(pre_save, sender=Estudiante)
+def recordar_curso_estudiante(sender, instance, **kwargs):
+    # si cambia de curso, el curso que deja también debe invalidarse
+    instance._curso_anterior_id = (
+        Estudiante.objects.filter(pk=instance.pk).values_list("curso_id", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Estudiante)
+def invalidar_cache_por_estudiante(sender, instance, **kwargs):
+    invalidar_notas_curso(instance.curso_id)
+    anterior = getattr(instance, "_curso_anterior_id", None)
+    if anterior != instance.curso_id:
+        invalidar_notas_curso(anterior)
+    invalidar_datos_estudiante(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Observador)
+@receiver([post_save, post_delete], sender=ObservacionBoletin)
+@receiver([post_save, post_delete], sender=AsistenciaDetalle)
+def invalidar_cache_datos_estudiante(sender, instance, **kwargs):
+    invalidar_datos_estudiante(instance.estudiante_id)
+
+
+@receiver([post_save, post_delete], sender=Curso)
+def invalidar_cache_por_curso(sender, instance, **kwargs):
+    invalidar_notas_curso(instance.id)
+
+
+# Comunes a todos los boletines: fechas y nombres de años y períodos, logo y
+# sello del colegio, nombres de docentes (director de curso) y del rector.
+@receiver([post_save, post_delete], sender=AnioLectivo)
+@receiver([post_save, post_delete], sender=Periodo)
+@receiver([post_save, post_delete], sender=School)
+@receiver([post_save, post_delete], sender=Docente)
+def invalidar_cache_datos_generales(sender, instance, **kwargs):
+    invalidar_datos_generales()
+
+
+@receiver(post_save, sender=User)
+def invalidar_cache_por_rector(sender, instance, update_fields=None, **kwargs):
+    # el inicio de sesión sólo guarda last_login: no cambia ninguna firma
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    if instance.groups.filter(name="Rector").exists():
+        invalidar_datos_generales()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_cache_por_grupo(sender, instance, action, pk_set=None, **kwargs):
+    # sólo importa quién entra o sale del grupo Rector
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Group):
+        es_rector = instance.name == "Rector"
+    else:
+        es_rector = pk_set is None or Group.objects.filter(pk__in=pk_set, name="Rector").exists()
+    if es_rector:
+        invalidar_datos_generales()
@@ -0,0 +1,169 @@
+/*
+ * Autoguardado de planillas de notas.
+ *
+ * Uso: <form data-autosave="URL" data-actividad="5"> (o data-oferta + data-periodo)
+ * con inputs que tengan data-estudiante y, según la planilla, data-dimension
+ * o data-logro. Sólo se envían las celdas que cambiaron, en lotes cada
+ * DEMORA_MS después de la última tecla; los errores vuelven por celda.
+ *
+ * Si la página carga offline_captura.js, cada lote se guarda primero en la
+ * cola del navegador y se sincroniza desde ahí: sin red no se pierde nada.
+ */
+(function () {
+  'use strict';
+
+  const DEMORA_MS = 800;
+  const CLAVES = ['actividad', 'logro', 'oferta', 'periodo', 'dimension'];
+
+  function iniciar(form) {
+    const url = form.dataset.autosave;
+    const csrf = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    const estado = form.querySelector('[data-autosave-estado]');
+    const pendientes = new Map();   // name del input -> input
+    let temporizador = null;
+    let enVuelo = false;
+
+    function mostrarEstado(texto, clase) {
+      if (!estado) return;
+      estado.textContent = texto;
+      estado.className = 'autosave-estado ' + (clase || '');
+    }
+
+    function cambioDe(input) {
+      const cambio = {
+        celda: input.name,
+        estudiante: Number(input.dataset.estudiante),
+        valor: input.value,
+      };
+      CLAVES.forEach(function (k) {
+        const v = input.dataset[k] || form.dataset[k];
+        if (v) cambio[k] = v;
+      });
+      return cambio;
+    }
+
+    function aplicarResultado(inputs, errores, logros) {
+      const conError = new Map();
+      errores.forEach(function (e) { conError.set(e.celda, e.error); });
+
+      inputs.forEach(function (input) {
+        input.classList.remove('celda-pendiente');
+        if (conError.has(input.name)) {
+          input.classList.add('celda-error');
+          input.title = conError.get(input.name);
+        } else if (!pendientes.has(input.name)) {
+          input.classList.remove('celda-error');
+          input.title = '';
+        }
+      });
+
+      logros.forEach(function (l) {
+        const celda = form.querySelector(
+          '[data-nota-logro="' + l.logro + '"][data-estudiante="' + l.estudiante + '"]'
+        );
+        if (celda) celda.textContent = l.nota === null ? '—' : l.nota;
+      });
+
+      if (errores.length) {
+        mostrarEstado(errores.length + ' celda(s) con error', 'error');
+      } else {
+        mostrarEstado('Cambios guardados', 'ok');
+      }
+    }
+
+    // ---- con cola sin conexión: el lote se guarda en el navegador y se sincroniza ----
+    const enCola = new Map();   // id de operación -> inputs
+
+    function encolar() {
+      clearTimeout(temporizador);
+      if (pendientes.size === 0) return;
+
+      const inputs = Array.from(pendientes.values());
+      pendientes.clear();
+      window.ColaCaptura.encolar({ tipo: 'notas', cambios: inputs.map(cambioDe) })
+        .then(function (id) { enCola.set(id, inputs); });
+    }
+
+    if (window.ColaCaptura) {
+      document.addEventListener('captura:sincronizada', function (e) {
+        const data = e.detail;
+        data.procesadas.forEach(function (id) {
+          const inputs = enCola.get(id);
+          if (!inputs) return;
+          enCola.delete(id);
+          aplicarResultado(
+            inputs,
+            data.errores.filter(function (err) { return err.op === id; }),
+            data.logros
+          );
+        });
+      });
+      document.addEventListener('captura:sin-conexion', function (e) {
+        mostrarEstado(
+          'Sin conexión: ' + e.detail.pendientes + ' lote(s) guardados en este equipo',
+          'pendiente'
+        );
+      });
+    }
+
+    // ---- sin cola: envío directo a notas_autosave ----
+    function enviar(keepalive) {
+      clearTimeout(temporizador);
+      if (window.ColaCaptura) return encolar();
+      if (enVuelo || pendientes.size === 0) return;
+
+      const inputs = Array.from(pendientes.values());
+      pendientes.clear();
+      enVuelo = true;
+      mostrarEstado('Guardando…', 'guardando');
+
+      fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        keepalive: !!keepalive,
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf },
+        body: JSON.stringify({ cambios: inputs.map(cambioDe) }),
+      })
+        .then(function (r) {
+          return r.json().then(function (data) {
+            if (!r.ok) throw new Error(data.error || r.status);
+            return data;
+          });
+        })
+        .then(function (data) {
+          aplicarResultado(inputs, data.errores, data.logros);
+        })
+        .catch(function () {
+          // se reintentan con el próximo lote
+          inputs.forEach(function (input) {
+            if (!pendientes.has(input.name)) pendientes.set(input.name, input);
+          });
+          mostrarEstado('Sin conexión: los cambios se reintentarán', 'error');
+        })
+        .finally(function () {
+          enVuelo = false;
+          if (pendientes.size) temporizador = setTimeout(enviar, DEMORA_MS);
+        });
+    }
+
+    form.querySelectorAll('input[data-estudiante]').forEach(function (input) {
+      input.addEventListener('input', function () {
+        pendientes.set(input.name, input);
+        input.classList.add('celda-pendiente');
+        mostrarEstado('Cambios sin guardar', 'pendiente');
+        clearTimeout(temporizador);
+        temporizador = setTimeout(enviar, DEMORA_MS);
+      });
+    });
+
+    // Al salir de la página (o esconderla) se manda lo que falte
+    window.addEventListener('pagehide', function () { enviar(true); });
+    document.addEventListener('visibilitychange', function () {
+      if (document.visibilityState === 'hidden') enviar(true);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('form[data-autosave]').forEach(iniciar);
+  });
+})();
@@ -0,0 +1,169 @@
+/*
+ * Cola de captura sin conexión (asistencia y planillas de notas).
+ *
+ * Uso: <script src="offline_captura.js" data-sync="URL" data-sw="URL"
+ *      data-usuario="ID" defer></script>
+ *
+ * Cada envío se guarda primero en IndexedDB como una operación con id propio
+ * y después se manda al servidor (captura_sincronizar) junto con todo lo que
+ * esté pendiente. Si no hay red, la cola espera al evento "online" o al
+ * siguiente intento. El servidor reconoce los ids ya aplicados, así que un
+ * reenvío no duplica nada.
+ *
+ * Eventos en document:
+ *   captura:sincronizada  detail = respuesta del servidor + {pendientes}
+ *   captura:sin-conexion  detail = {pendientes}
+ */
+(function () {
+  'use strict';
+
+  const script = document.currentScript;
+  const URL_SYNC = script.dataset.sync;
+  const URL_SW = script.dataset.sw;
+  const USUARIO = script.dataset.usuario || '';
+
+  const BD = 'colegio-captura';
+  const ALMACEN = 'operaciones';
+  const LOTE_MAX = 200;          // = SYNC_MAX_OPERACIONES en el servidor
+  const INTERVALO_MS = 30000;
+
+  let bd = null;
+  let sincronizando = null;
+
+  function abrir() {
+    if (!bd) {
+      bd = new Promise(function (resolve, reject) {
+        const req = indexedDB.open(BD, 1);
+        req.onupgradeneeded = function () {
+          req.result.createObjectStore(ALMACEN, { keyPath: 'id' });
+        };
+        req.onsuccess = function () { resolve(req.result); };
+        req.onerror = function () { reject(req.error); };
+      });
+    }
+    return bd;
+  }
+
+  function transaccion(modo, fn) {
+    return abrir().then(function (db) {
+      return new Promise(function (resolve, reject) {
+        const tx = db.transaction(ALMACEN, modo);
+        const resultado = fn(tx.objectStore(ALMACEN));
+        tx.oncomplete = function () { resolve(resultado && resultado.result); };
+        tx.onerror = function () { reject(tx.error); };
+      });
+    });
+  }
+
+  function nuevoId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+  }
+
+  function csrf() {
+    const input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (input) return input.value;
+    const m = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return m ? decodeURIComponent(m[1]) : '';
+  }
+
+  // Operaciones del usuario actual, en el orden en que se capturaron
+  function pendientes() {
+    return transaccion('readonly', function (almacen) { return almacen.getAll(); })
+      .then(function (ops) {
+        return ops
+          .filter(function (op) { return op.usuario === USUARIO; })
+          .sort(function (a, b) { return a.orden - b.orden; });
+      });
+  }
+
+  function emitir(nombre, detalle) {
+    document.dispatchEvent(new CustomEvent(nombre, { detail: detalle }));
+  }
+
+  function enviarLote() {
+    return pendientes().then(function (ops) {
+      if (ops.length === 0) return 0;
+      const lote = ops.slice(0, LOTE_MAX);
+
+      return fetch(URL_SYNC, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf() },
+        body: JSON.stringify({
+          operaciones: lote.map(function (op) { return op.datos; }),
+        }),
+      })
+        .then(function (r) {
+          return r.json().then(function (data) {
+            if (!r.ok) throw new Error(data.error || r.status);
+            return data;
+          });
+        })
+        .then(function (data) {
+          return transaccion('readwrite', function (almacen) {
+            data.procesadas.forEach(function (id) { almacen.delete(id); });
+          }).then(function () {
+            const quedan = ops.length - data.procesadas.length;
+            emitir('captura:sincronizada', Object.assign({ pendientes: quedan }, data));
+            return data.procesadas.length ? quedan : 0;
+          });
+        });
+    });
+  }
+
+  function sincronizar() {
+    if (sincronizando) return sincronizando;
+    if (!navigator.onLine) {
+      return pendientes().then(function (ops) {
+        if (ops.length) emitir('captura:sin-conexion', { pendientes: ops.length });
+      });
+    }
+
+    function seguir(quedan) {
+      // lotes de LOTE_MAX hasta vaciar la cola
+      return quedan > 0 ? enviarLote().then(seguir) : null;
+    }
+
+    sincronizando = enviarLote()
+      .then(seguir)
+      .catch(function () {
+        return pendientes().then(function (ops) {
+          emitir('captura:sin-conexion', { pendientes: ops.length });
+        });
+      })
+      .finally(function () { sincronizando = null; });
+    return sincronizando;
+  }
+
+  /*
+   * Guarda una operación ({tipo: "notas", cambios} o {tipo: "asistencia", ...})
+   * y lanza la sincronización. Devuelve una promesa con el id de la operación.
+   */
+  function encolar(datos) {
+    const id = nuevoId();
+    const op = {
+      id: id,
+      usuario: USUARIO,
+      orden: Date.now() + Math.random(),
+      datos: Object.assign({ id: id }, datos),
+    };
+    return transaccion('readwrite', function (almacen) { almacen.put(op); })
+      .then(function () {
+        sincronizar();
+        return id;
+      });
+  }
+
+  if (!window.indexedDB || !URL_SYNC) return;
+
+  window.ColaCaptura = { encolar: encolar, sincronizar: sincronizar, pendientes: pendientes };
+
+  window.addEventListener('online', sincronizar);
+  setInterval(sincronizar, INTERVALO_MS);
+  document.addEventListener('DOMContentLoaded', sincronizar);
+
+  if ('serviceWorker' in navigator && URL_SW) {
+    navigator.serviceWorker.register(URL_SW).catch(function () { /* sin caché de páginas */ });
+  }
+})();
@@ -0,0 +1,95 @@
+{% load static %}/*
+ * Service worker de las páginas de captura (asistencia y planillas de notas).
+ *
+ * Las páginas se piden a la red y se guarda una copia; sin conexión se sirve
+ * la última copia. Los scripts de captura salen de la caché y se refrescan
+ * en segundo plano. Los POST no pasan por aquí: sin red, lo capturado queda
+ * en la cola de offline_captura.js.
+ */
+'use strict';
+
+const CACHE = 'captura-v1';
+
+const ESTATICOS = [
+  '{% static "academico/js/offline_captura.js" %}',
+  '{% static "academico/js/autosave_notas.js" %}',
+];
+
+const PAGINAS = [
+  /\/asistencia\/tomar\/$/,
+  /\/notas\/capturar\/$/,
+  /\/actividad\/\d+\/notas\/$/,
+  /\/oferta\/\d+\/periodo\/\d+\/saber-ser\/$/,
+];
+
+self.addEventListener('install', function (event) {
+  event.waitUntil(
+    caches.open(CACHE)
+      .then(function (cache) { return cache.addAll(ESTATICOS); })
+      .then(function () { return self.skipWaiting(); })
+  );
+});
+
+self.addEventListener('activate', function (event) {
+  event.waitUntil(
+    caches.keys()
+      .then(function (claves) {
+        return Promise.all(
+          claves.filter(function (c) { return c !== CACHE; })
+            .map(function (c) { return caches.delete(c); })
+        );
+      })
+      .then(function () { return self.clients.claim(); })
+  );
+});
+
+function redPrimero(request) {
+  return fetch(request)
+    .then(function (respuesta) {
+      // no guardar redirecciones (p. ej. al login) ni errores
+      if (respuesta.ok && !respuesta.redirected) {
+        const copia = respuesta.clone();
+        caches.open(CACHE).then(function (cache) { cache.put(request, copia); });
+      }
+      return respuesta;
+    })
+    .catch(function () {
+      return caches.match(request, { ignoreVary: true }).then(function (guardada) {
+        return guardada || new Response(
+          '<h1>Sin conexión</h1><p>Abre esta planilla una vez con conexión para poder usarla sin red.</p>',
+          { status: 503, headers: { 'Content-Type': 'text/html; charset=utf-8' } }
+        );
+      });
+    });
+}
+
+// Copia guardada al instante; con red se refresca para la próxima vez
+function cachePrimero(request) {
+  return caches.open(CACHE).then(function (cache) {
+    return cache.match(request).then(function (guardada) {
+      const red = fetch(request).then(function (respuesta) {
+        if (respuesta.ok) cache.put(request, respuesta.clone());
+        return respuesta;
+      });
+      if (guardada) {
+        red.catch(function () { /* sin red: queda la copia */ });
+        return guardada;
+      }
+      return red;
+    });
+  });
+}
+
+self.addEventListener('fetch', function (event) {
+  const request = event.request;
+  if (request.method !== 'GET') return;
+
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (ESTATICOS.indexOf(url.pathname) !== -1) {
+    event.respondWith(cachePrimero(request));
+  } else if (request.mode === 'navigate' && PAGINAS.some(function (re) { return re.test(url.pathname); })) {
+    event.respondWith(redPrimero(request));
+  }
+});
@@ -1,3 +1,47 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from academico.utils_boletin import contexto_boletin_ejemplo
+from academico.utils_pdf import _cache_imagenes, renderizar_local
+from academico.utils_pdf_rapido import boletines_pdf_rapido
+
+# Tope de un boletín típico (logo + sello + 12 asignaturas con 4 logros)
+PDF_BOLETIN_MAX_KB = 200
+
+
+class TamanoBoletinPDFTests(SimpleTestCase):
+    """Control de regresión de tamaño: un boletín típico con cada motor."""
+
+    def setUp(self):
+        self.ctx = contexto_boletin_ejemplo(12)
+
+    def test_weasyprint(self):
+        html = render_to_string("academico/boletin_estudiante_pdf.html", self.ctx)
+        pdf = renderizar_local(html, base_url="http://localhost/", hojas=["boletin"])
+        self.assertLessEqual(len(pdf) / 1024, PDF_BOLETIN_MAX_KB)
+
+    def test_reportlab(self):
+        buffer = io.BytesIO()
+        boletines_pdf_rapido([self.ctx], buffer)
+        self.assertLessEqual(len(buffer.getvalue()) / 1024, PDF_BOLETIN_MAX_KB)
+
+
+class CacheImagenesPDFTests(SimpleTestCase):
+    """Recortar la caché de imágenes entre renders no debe romper el siguiente."""
+
+    def _render(self, ctx):
+        html = render_to_string("academico/boletin_estudiante_pdf.html", ctx)
+        return renderizar_local(html, base_url="http://localhost/", hojas=["boletin"])
+
+    def test_render_despues_de_recortar(self):
+        ctx = contexto_boletin_ejemplo(4)
+        self._render(ctx)
+        # un sobrante impar: antes cortaba entre la URL y los bytes de una imagen
+        with mock.patch.object(_cache_imagenes, "max_items", max(len(_cache_imagenes) - 1, 0)):
+            _cache_imagenes.entrar()
+            _cache_imagenes.salir()
+            self.assertLessEqual(len(_cache_imagenes), _cache_imagenes.max_items)
+        self._render(ctx)
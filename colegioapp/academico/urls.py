@@ -51,10 +51,14 @@ urlpatterns = [
     path("periodos/nuevo/", views.periodo_create, name="periodo_create"),
     path("periodos/<int:pk>/editar/", views.periodo_update, name="periodo_update"),
     path("periodos/<int:pk>/eliminar/", views.periodo_delete, name="periodo_delete"),
+    path("periodos/<int:pk>/cerrar/", views.periodo_cerrar, name="periodo_cerrar"),
+    path("periodos/<int:pk>/reabrir/", views.periodo_reabrir, name="periodo_reabrir"),
+    path("periodos/<int:pk>/actual/", views.periodo_actual, name="periodo_actual"),
 
     # Logros
     path("logros/", views.logros_list, name="logros"),
     path("logros/nuevo/", views.logro_create, name="logro_create"),
+    path("logros/bulk/", views.logro_bulk_create, name="logro_bulk_create"),
     path("logros/<int:pk>/editar/", views.logro_update, name="logro_update"),
     path("logros/<int:pk>/eliminar/", views.logro_delete, name="logro_delete"),
 
@@ -64,17 +68,32 @@ urlpatterns = [
     path("logro/<int:logro_id>/actividades/", views.actividades_list, name="actividades"),
     path("logro/<int:logro_id>/actividad/nueva/", views.actividad_create, name="actividad_create"),
     path("actividad/<int:actividad_id>/notas/", views.notas_actividades_capturar, name="actividad_notas"),
+    path("notas/autosave/", views.notas_autosave, name="notas_autosave"),
+    path("notas/importar/", views.notas_importar, name="notas_importar"),
+    path("notas/exportar/", views.notas_exportar, name="notas_exportar"),
+    path("notas/importar/confirmar/", views.notas_importar_confirmar, name="notas_importar_confirmar"),
+    path("captura/sincronizar/", views.captura_sincronizar, name="captura_sincronizar"),
+    path("captura/sw.js", views.captura_service_worker, name="captura_service_worker"),
     path("oferta/<int:oferta_id>/periodo/<int:periodo_id>/saber-ser/", views.saber_ser_capturar, name="saber_ser_capturar"),
 
     # Boletines
     path("boletines/selector/", views.boletin_selector, name="boletin_selector"),
     path("boletines/generar/", views.boletin_generar, name="boletin_generar"),
     path("boletines/estudiante/", views.boletin_estudiante, name="boletin_estudiante"),
+    path("boletines/estudiante/areas/", views.boletin_estudiante_area, name="boletin_estudiante_area"),
+    path("boletines/estudiante/puestos/", views.boletin_estudiante_puestos, name="boletin_estudiante_puestos"),
     path("boletines/masivos/", views.boletines_masivos, name="boletines_masivos"),
+    path("boletines/consolidado/", views.boletin_consolidado, name="boletin_consolidado"),
+    path("boletines/observaciones/", views.observaciones_curso, name="observaciones_curso"),
 
     #Asistencia
     path("asistencia/", views.asistencia_selector, name="asistencia_selector"),
     path("asistencia/tomar/", views.asistencia_tomar, name="asistencia_tomar"),
+    path("asistencia/matriz/", views.asistencia_matriz, name="asistencia_matriz"),
+    path("asistencia/alertas/", views.asistencia_alertas, name="asistencia_alertas"),
+    path("ingreso/", views.ingreso_kiosko, name="ingreso_kiosko"),
+    path("ingreso/registrar/", views.ingreso_registrar, name="ingreso_registrar"),
+    path("ingreso/vaciar/", views.ingreso_vaciar, name="ingreso_vaciar"),
 
     #anioelectivo
     path("anios-lectivos/", views.anios_lectivos_list, name="anios_lectivos"),
@@ -0,0 +1,306 @@
+"""
+Asistencia: guardado del pase de lista y contadores por estudiante y período.
+
+En AsistenciaDetalle sólo se guardan las excepciones (ver el modelo). Las
+fallas, tardanzas y excusas de cada (estudiante, año, período) se llevan en
+ContadorAsistencia, que se actualiza en la misma transacción que el pase de
+lista; boletines, portal y alertas leen de ahí.
+
+La matriz del curso (estudiantes × fechas) sale de una sola consulta
+agrupada por estudiante, con una columna condicional por pase de lista.
+"""
+import csv
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Max, Q, Sum, When
+
+from academico.models import AsistenciaDetalle, ContadorAsistencia, Estudiante, PaseLista, Periodo
+from academico.utils_notas import guardar_planilla
+
+ESTADOS_ASISTENCIA = {codigo for codigo, _ in AsistenciaDetalle.ESTADOS}
+
+# Porcentaje de fallas sobre los días con pase de lista a partir del cual se alerta
+ASISTENCIA_UMBRAL_FALLAS = getattr(settings, "ASISTENCIA_UMBRAL_FALLAS", 15)
+
+CAMPOS_CONTADOR = ["fallas", "tardanzas", "justificadas"]
+
+
+def es_excepcion(estado, observacion=""):
+    """Lo que se guarda en AsistenciaDetalle: todo menos "presente sin observación"."""
+    return estado != AsistenciaDetalle.PRESENTE or bool(observacion)
+
+
+def guardar_asistencia(pase, existentes, registros):
+    """
+    Guarda el pase de lista con operaciones por conjunto.
+    ``registros``: {estudiante_id: {"estado": "A", "observacion": ""}}.
+
+    Sólo quedan filas para las excepciones; marcar presente a alguien que
+    tenía falla borra su fila. Los contadores de quienes cambiaron de estado
+    se actualizan en la misma transacción.
+    """
+    cambiados = {
+        est_id
+        for est_id, valores in registros.items()
+        if valores["estado"] != (
+            existentes[est_id].estado if est_id in existentes else AsistenciaDetalle.PRESENTE
+        )
+    }
+    with transaction.atomic():
+        resultado = guardar_planilla(
+            AsistenciaDetalle,
+            {"pase_id": pase.id},
+            existentes,
+            {
+                est_id: (valores if es_excepcion(valores["estado"], valores["observacion"]) else None)
+                for est_id, valores in registros.items()
+            },
+            campos=["estado", "observacion"],
+            unicos=["pase", "estudiante"],
+        )
+        if cambiados:
+            actualizar_contadores(pase.anio_id, pase.periodo_id, cambiados)
+    return resultado
+
+
+def actualizar_contadores(anio_id, periodo_id, estudiantes_ids):
+    """Recuenta el período de ``estudiantes_ids`` (una consulta) y guarda sus contadores."""
+    totales = {
+        fila["estudiante_id"]: fila
+        for fila in (
+            AsistenciaDetalle.objects
+            .filter(
+                pase__anio_id=anio_id,
+                pase__periodo_id=periodo_id,
+                estudiante_id__in=estudiantes_ids,
+            )
+            .exclude(estado=AsistenciaDetalle.PRESENTE)
+            .values("estudiante_id")
+            .annotate(
+                fallas=Count("id", filter=Q(estado=AsistenciaDetalle.AUSENTE)),
+                tardanzas=Count("id", filter=Q(estado=AsistenciaDetalle.TARDANZA)),
+                justificadas=Count("id", filter=Q(estado=AsistenciaDetalle.JUSTIFICADA)),
+            )
+        )
+    }
+    existentes = {
+        c.estudiante_id: c
+        for c in ContadorAsistencia.objects.filter(
+            anio_id=anio_id, periodo_id=periodo_id, estudiante_id__in=estudiantes_ids,
+        )
+    }
+    return guardar_planilla(
+        ContadorAsistencia,
+        {"anio_id": anio_id, "periodo_id": periodo_id},
+        existentes,
+        {
+            est_id: {c: totales.get(est_id, {}).get(c, 0) for c in CAMPOS_CONTADOR}
+            for est_id in estudiantes_ids
+        },
+        campos=CAMPOS_CONTADOR,
+        unicos=["estudiante", "anio", "periodo"],
+    )
+
+
+def estudiantes_contados(pase):
+    """Ids de quienes tienen falla, tardanza o excusa en el pase (suman en los contadores)."""
+    return list(
+        AsistenciaDetalle.objects
+        .filter(pase=pase)
+        .exclude(estado=AsistenciaDetalle.PRESENTE)
+        .values_list("estudiante_id", flat=True)
+    )
+
+
+def recontar_al_confirmar(anio_id, periodo_id, estudiantes_ids):
+    """
+    Recuenta los contadores cuando la transacción actual se confirme (ver
+    academico/signals.py: borrar o mover un pase de lista). Si el período o
+    algún estudiante se borró en la misma operación, se omite.
+    """
+    def recontar():
+        if not Periodo.objects.filter(pk=periodo_id, anio_id=anio_id).exists():
+            return
+        ids = list(Estudiante.objects.filter(pk__in=estudiantes_ids).values_list("id", flat=True))
+        if ids:
+            actualizar_contadores(anio_id, periodo_id, ids)
+
+    if estudiantes_ids:
+        transaction.on_commit(recontar)
+
+
+def reconstruir_contadores(anio=None):
+    """Vuelve a calcular todos los contadores (o los de un año) desde AsistenciaDetalle."""
+    pases = PaseLista.objects.all()
+    if anio is not None:
+        pases = pases.filter(anio=anio)
+    grupos = set(pases.values_list("anio_id", "periodo_id").distinct())
+
+    with transaction.atomic():
+        contadores = ContadorAsistencia.objects.all()
+        if anio is not None:
+            contadores = contadores.filter(anio=anio)
+        contadores.delete()
+
+        total = 0
+        for anio_id, periodo_id in grupos:
+            ids = list(
+                AsistenciaDetalle.objects
+                .filter(pase__anio_id=anio_id, pase__periodo_id=periodo_id)
+                .exclude(estado=AsistenciaDetalle.PRESENTE)
+                .values_list("estudiante_id", flat=True)
+                .distinct()
+            )
+            if ids:
+                total += actualizar_contadores(anio_id, periodo_id, ids)["creados"]
+    return total
+
+
+# ----------------- lecturas -----------------
+
+def contadores_periodo(estudiantes_ids, anio, periodo):
+    """{estudiante_id: {"fallas", "tardanzas", "justificadas"}} del período (una consulta)."""
+    return {
+        fila["estudiante_id"]: fila
+        for fila in ContadorAsistencia.objects.filter(
+            estudiante_id__in=estudiantes_ids, anio=anio, periodo=periodo,
+        ).values("estudiante_id", *CAMPOS_CONTADOR)
+    }
+
+
+def totales_anio(estudiante, anio):
+    """Fallas, tardanzas y excusas del año (suma de los contadores de sus períodos)."""
+    totales = ContadorAsistencia.objects.filter(estudiante=estudiante, anio=anio).aggregate(
+        **{c: Sum(c) for c in CAMPOS_CONTADOR}
+    )
+    return {c: totales[c] or 0 for c in CAMPOS_CONTADOR}
+
+
+def alertas_inasistencia(school, anio, umbral=None, periodo=None, curso=None):
+    """
+    Estudiantes cuyo porcentaje de fallas (sobre los días con pase de lista de
+    su curso) supera ``umbral``. Con ``periodo`` se mide sólo ese período; si
+    no, el año. Dos consultas agrupadas: días por curso y contadores.
+    """
+    umbral = Decimal(str(ASISTENCIA_UMBRAL_FALLAS if umbral is None else umbral))
+
+    pases = PaseLista.objects.filter(school=school, anio=anio)
+    contadores = ContadorAsistencia.objects.filter(anio=anio, estudiante__school=school, fallas__gt=0)
+    if periodo is not None:
+        pases = pases.filter(periodo=periodo)
+        contadores = contadores.filter(periodo=periodo)
+    if curso is not None:
+        pases = pases.filter(curso=curso)
+        contadores = contadores.filter(estudiante__curso=curso)
+
+    dias = dict(pases.values("curso_id").annotate(n=Count("id")).values_list("curso_id", "n"))
+    filas = (
+        contadores
+        .values("estudiante_id", "estudiante__curso_id")
+        .annotate(fallas=Sum("fallas"), tardanzas=Sum("tardanzas"), justificadas=Sum("justificadas"))
+    )
+
+    alertas = []
+    for fila in filas:
+        total_dias = dias.get(fila["estudiante__curso_id"], 0)
+        if not total_dias:
+            continue
+        porcentaje = (Decimal(fila["fallas"]) * 100 / total_dias).quantize(Decimal("0.1"))
+        if porcentaje >= umbral:
+            alertas.append({**fila, "dias": total_dias, "porcentaje": porcentaje})
+
+    estudiantes = Estudiante.objects.select_related("curso").in_bulk([a["estudiante_id"] for a in alertas])
+    for alerta in alertas:
+        alerta["estudiante"] = estudiantes[alerta["estudiante_id"]]
+    alertas.sort(key=lambda a: (-a["porcentaje"], a["estudiante"].apellidos, a["estudiante"].nombres))
+    return alertas
+
+
+# ----------------- matriz del curso -----------------
+
+def matriz_asistencia(pases, columnas, estudiantes):
+    """
+    Matriz estudiantes × fechas del período.
+
+    ``pases``: queryset de los pases de lista del período (para los totales
+    del estudiante); ``columnas``: los pases que se muestran (la ventana de
+    fechas, o todos al exportar). Una consulta sobre el detalle, agrupada por
+    estudiante: Max(Case(When(pase=…))) da el estado de cada columna y
+    Count(filter=…) los totales. Sin fila = presente.
+
+    Devuelve (filas, totales_fecha):
+    filas = [{"estudiante", "celdas": ["A", "", …], "fallas", "tardanzas", "justificadas"}]
+    totales_fecha = [{"pase", "fallas", "tardanzas", "justificadas", "presentes"}]
+    """
+    estudiantes = list(estudiantes)
+    agrupado = {
+        fila["estudiante_id"]: fila
+        for fila in (
+            AsistenciaDetalle.objects
+            .filter(pase__in=pases, estudiante_id__in=[e.id for e in estudiantes])
+            .values("estudiante_id")
+            .annotate(
+                fallas=Count("id", filter=Q(estado=AsistenciaDetalle.AUSENTE)),
+                tardanzas=Count("id", filter=Q(estado=AsistenciaDetalle.TARDANZA)),
+                justificadas=Count("id", filter=Q(estado=AsistenciaDetalle.JUSTIFICADA)),
+                **{f"p{p.id}": Max(Case(When(pase_id=p.id, then="estado"))) for p in columnas},
+            )
+            .order_by()
+        )
+    }
+
+    totales_fecha = [
+        {"pase": p, "fallas": 0, "tardanzas": 0, "justificadas": 0, "presentes": len(estudiantes)}
+        for p in columnas
+    ]
+    campo_total = {
+        AsistenciaDetalle.AUSENTE: "fallas",
+        AsistenciaDetalle.TARDANZA: "tardanzas",
+        AsistenciaDetalle.JUSTIFICADA: "justificadas",
+    }
+
+    filas = []
+    for est in estudiantes:
+        fila = agrupado.get(est.id, {})
+        celdas = [fila.get(f"p{p.id}") or "" for p in columnas]
+        for total, estado in zip(totales_fecha, celdas):
+            if estado in campo_total:
+                total[campo_total[estado]] += 1
+                if estado != AsistenciaDetalle.TARDANZA:
+                    total["presentes"] -= 1
+        filas.append({
+            "estudiante": est,
+            "celdas": celdas,
+            **{c: fila.get(c, 0) for c in CAMPOS_CONTADOR},
+        })
+    return filas, totales_fecha
+
+
+class _Eco:
+    """Buffer de csv.writer que devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_asistencia(columnas, filas, totales_fecha):
+    """Líneas CSV de la matriz, para StreamingHttpResponse. Presente sin fila = "P"."""
+    escritor = csv.writer(_Eco())
+    yield "\ufeff"  # BOM: Excel abre el archivo como UTF-8
+    yield escritor.writerow(
+        ["Identificación", "Estudiante"]
+        + [p.fecha.isoformat() for p in columnas]
+        + ["Fallas", "Tardanzas", "Excusas"]
+    )
+    for fila in filas:
+        est = fila["estudiante"]
+        yield escritor.writerow(
+            [est.identificacion, f"{est.apellidos} {est.nombres}"]
+            + [c or AsistenciaDetalle.PRESENTE for c in fila["celdas"]]
+            + [fila[c] for c in CAMPOS_CONTADOR]
+        )
+    for etiqueta, campo in (("Fallas", "fallas"), ("Tardanzas", "tardanzas"),
+                            ("Excusas", "justificadas"), ("Presentes", "presentes")):
+        yield escritor.writerow(["", etiqueta] + [t[campo] for t in totales_fecha])
@@ -0,0 +1,630 @@
+"""
+Contexto del boletín (boletin_estudiante_pdf.html) para uno o varios
+estudiantes de un curso.
+
+Las notas, logros y Saber Ser de todo el curso se cargan una sola vez
+(``DatosNotasCurso``) y los promedios y puestos se calculan en memoria, así
+armar 40 boletines cuesta casi lo mismo en consultas que armar uno.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.templatetags.static import static
+from django.utils import timezone
+
+from academico.models import (
+    AsignaturaOferta,
+    BoletinSnapshot,
+    CalificacionLogro,
+    CierrePeriodo,
+    Curso,
+    Docente,
+    Estudiante,
+    Logro,
+    ObservacionBoletin,
+    Periodo,
+    SaberSer,
+)
+from academico.utils_asistencia import contadores_periodo
+from academico.utils_cache import invalidar_datos_estudiante, invalidar_notas_curso
+
+logger = logging.getLogger(__name__)
+
+SABER_SER_PESO = Decimal("0.10")  # 10%
+LOGROS_PESO    = Decimal("0.90")  # 90%
+
+CENTESIMA = Decimal("0.01")
+NOTA_APROBATORIA = Decimal("3.00")  # por debajo: "D", asignatura perdida
+
+
+def concepto_letra(n):
+    if n is None:
+        return "N.A."
+    n = Decimal(n)
+    if n >= Decimal("4.60"): return "S"
+    if n >= Decimal("4.00"): return "A"
+    if n >= Decimal("3.00"): return "B"
+    return "D"
+
+
+def _promedio(valores):
+    valores = [v for v in valores if v is not None]
+    if not valores:
+        return None
+    return (sum(valores) / len(valores)).quantize(CENTESIMA)
+
+
+def _puestos(lista):
+    """[(est_id, promedio)] -> {est_id: puesto}, con empates (misma nota = mismo puesto)."""
+    lista = sorted(lista, key=lambda x: x[1], reverse=True)
+    puestos = {}
+    puesto_actual = 0
+    ultimo_prom = None
+    for idx, (est_id, prom) in enumerate(lista, start=1):
+        if ultimo_prom is None or prom < ultimo_prom:
+            puesto_actual = idx
+        puestos[est_id] = puesto_actual
+        ultimo_prom = prom
+    return puestos
+
+
+class DatosNotasCurso:
+    """
+    Ofertas, logros, calificaciones y Saber Ser de un curso en un año,
+    cargados con un número fijo de consultas.
+
+    Los cálculos replican los de academico.utils / academico.views:
+    - ``promedio_asignatura`` con Saber Ser = logros 90% + Saber Ser 10%.
+    - los puestos (ranking) usan sólo logros, como ranking_curso_periodo.
+    """
+
+    def __init__(self, anio, curso, periodos_extra=(), estudiantes=None):
+        self.anio = anio
+        self.curso = curso
+
+        self.ofertas = list(
+            AsignaturaOferta.objects
+            .select_related("asignatura", "docente")
+            .filter(anio=anio, curso=curso)
+            .order_by("asignatura__area", "asignatura__nombre")
+        )
+        self.periodos_anio = list(
+            Periodo.objects.filter(anio=anio).order_by("numero")[:3]
+        )
+        # El ranking considera a todo el curso, no sólo a los boletines pedidos.
+        # Con ``estudiantes`` sólo se cargan sus notas: sirve para promedios,
+        # pero entonces los puestos no son los del curso.
+        if estudiantes is None:
+            self.estudiantes_ids = list(
+                Estudiante.objects.filter(curso=curso).values_list("id", flat=True)
+            )
+        else:
+            self.estudiantes_ids = [e.id for e in estudiantes]
+
+        periodos_ids = {p.id for p in self.periodos_anio} | {p.id for p in periodos_extra}
+
+        self.logros = defaultdict(list)  # (oferta_id, periodo_id) -> [Logro]
+        logros = (
+            Logro.objects
+            .filter(oferta__in=self.ofertas, periodo_id__in=periodos_ids)
+            .order_by("titulo")
+        )
+        for lg in logros:
+            self.logros[(lg.oferta_id, lg.periodo_id)].append(lg)
+
+        self.notas = {}  # (estudiante_id, logro_id) -> nota
+        cals = (
+            CalificacionLogro.objects
+            .filter(
+                logro__oferta__in=self.ofertas,
+                logro__periodo_id__in=periodos_ids,
+                estudiante_id__in=self.estudiantes_ids,
+            )
+            .values_list("estudiante_id", "logro_id", "nota")
+        )
+        for est_id, logro_id, nota in cals:
+            self.notas[(est_id, logro_id)] = nota
+
+        self.saber_ser = {}  # (estudiante_id, oferta_id, periodo_id) -> nota
+        ss_qs = (
+            SaberSer.objects
+            .filter(
+                anio=anio,
+                asignatura_oferta__in=self.ofertas,
+                periodo_id__in=periodos_ids,
+                estudiante_id__in=self.estudiantes_ids,
+                nota__isnull=False,
+            )
+            .values_list("estudiante_id", "asignatura_oferta_id", "periodo_id", "nota")
+        )
+        for est_id, oferta_id, periodo_id, nota in ss_qs:
+            self.saber_ser[(est_id, oferta_id, periodo_id)] = nota
+
+    # ---------- promedios ----------
+
+    def logros_de(self, oferta, periodo):
+        return self.logros.get((oferta.id, periodo.id), [])
+
+    def nota_logros(self, est_id, oferta, periodo):
+        """Promedio ponderado de los logros con nota (None si no hay ninguna)."""
+        suma_pesada = Decimal("0")
+        suma_pesos = Decimal("0")
+        for lg in self.logros_de(oferta, periodo):
+            nota = self.notas.get((est_id, lg.id))
+            if nota is not None:
+                peso_rel = lg.peso / Decimal("100")
+                suma_pesada += Decimal(nota) * peso_rel
+                suma_pesos += peso_rel
+        if suma_pesos > 0:
+            return (suma_pesada / suma_pesos).quantize(CENTESIMA)
+        return None
+
+    def promedio_asignatura(self, est_id, oferta, periodo):
+        """Nota de la asignatura en el período: logros 90% + Saber Ser 10% (si existe)."""
+        nota_logros = self.nota_logros(est_id, oferta, periodo)
+        if nota_logros is None:
+            return None
+        ss = self.saber_ser.get((est_id, oferta.id, periodo.id))
+        if ss is not None:
+            return (nota_logros * LOGROS_PESO + Decimal(ss) * SABER_SER_PESO).quantize(CENTESIMA)
+        return nota_logros
+
+    def promedio_general(self, est_id, periodo):
+        """Promedio de todas las asignaturas (sólo logros), base del ranking."""
+        return _promedio(self.nota_logros(est_id, of, periodo) for of in self.ofertas)
+
+    # ---------- puestos ----------
+
+    def puestos_periodo(self, periodo):
+        lista = []
+        for est_id in self.estudiantes_ids:
+            prom = self.promedio_general(est_id, periodo)
+            if prom is not None:
+                lista.append((est_id, prom))
+        return _puestos(lista)
+
+    def puestos_anual(self):
+        lista = []
+        for est_id in self.estudiantes_ids:
+            prom = _promedio(self.promedio_general(est_id, per) for per in self.periodos_anio)
+            if prom is not None:
+                lista.append((est_id, prom))
+        return _puestos(lista)
+
+
+def resumen_estudiante(datos, est_id):
+    """Consolidado por asignatura (p1, p2, p3, final), promedios por trimestre y promedio anual."""
+    resumen_asignaturas = []
+    for of in datos.ofertas:
+        fila_res = {"asignatura": of.asignatura.nombre, "p1": None, "p2": None, "p3": None}
+        for idx, per in enumerate(datos.periodos_anio, start=1):
+            fila_res[f"p{idx}"] = datos.promedio_asignatura(est_id, of, per)
+
+        prom_final = _promedio(fila_res[f"p{i}"] for i in (1, 2, 3))
+        fila_res["prom_final"] = prom_final
+        fila_res["letra_final"] = concepto_letra(prom_final)
+        resumen_asignaturas.append(fila_res)
+
+    promedios_trimestre = [
+        _promedio(datos.promedio_asignatura(est_id, of, per) for of in datos.ofertas)
+        for per in datos.periodos_anio
+    ]
+    return resumen_asignaturas, promedios_trimestre, _promedio(promedios_trimestre)
+
+
+def areas_estudiante(datos, est_id, periodo, area=None):
+    """Detalle por logros del período, agrupado por área (sólo ``area`` si se indica)."""
+    areas_dict = defaultdict(list)
+    for of in datos.ofertas:
+        nombre_area = of.asignatura.area or "Otras áreas"
+        if area is not None and nombre_area != area:
+            continue
+        detalle = [
+            {"titulo": lg.titulo, "peso": lg.peso, "nota": datos.notas.get((est_id, lg.id))}
+            for lg in datos.logros_de(of, periodo)
+        ]
+        promedio = datos.nota_logros(est_id, of, periodo)
+        areas_dict[nombre_area].append({
+            "asignatura": of.asignatura.nombre,
+            "docente": f"{of.docente.apellidos} {of.docente.nombres}" if of.docente else "—",
+            "promedio": promedio,
+            "letra": concepto_letra(promedio),
+            "detalle": detalle,
+        })
+
+    areas = [{"nombre": nombre, "filas": filas} for nombre, filas in areas_dict.items()]
+    areas.sort(key=lambda a: a["nombre"])
+    return areas
+
+
+def puestos_curso(datos):
+    """{"periodos": [{est_id: puesto} por trimestre], "anual": {est_id: puesto}} de todo el curso."""
+    return {
+        "periodos": [datos.puestos_periodo(per) for per in datos.periodos_anio],
+        "anual": datos.puestos_anual(),
+    }
+
+
+def consolidado_curso(anio, curso):
+    """
+    Consolidado del curso para el consejo académico: cada estudiante × cada
+    asignatura × P1/P2/P3 y final, con promedios, puesto anual y número de
+    asignaturas perdidas (final por debajo de NOTA_APROBATORIA).
+
+    Usa una sola carga de DatosNotasCurso y devuelve sólo tipos simples, para
+    poder cachearlo con la versión de notas del curso.
+    """
+    datos = DatosNotasCurso(anio, curso)
+    puestos = puestos_curso(datos)
+    estudiantes = (
+        Estudiante.objects
+        .filter(pk__in=datos.estudiantes_ids)
+        .order_by("apellidos", "nombres")
+        .values("id", "identificacion", "apellidos", "nombres")
+    )
+
+    filas = []
+    finales = defaultdict(list)  # índice de asignatura -> notas finales del curso
+    for est in estudiantes:
+        resumen, promedios_trimestre, promedio_anual = resumen_estudiante(datos, est["id"])
+        notas = []
+        for idx, fila in enumerate(resumen):
+            final = fila["prom_final"]
+            if final is not None:
+                finales[idx].append(final)
+            notas.append({
+                "periodos": [fila["p1"], fila["p2"], fila["p3"]][:len(datos.periodos_anio)],
+                "final": final,
+                "perdida": final is not None and final < NOTA_APROBATORIA,
+            })
+        filas.append({
+            "id": est["id"],
+            "identificacion": est["identificacion"],
+            "nombre": f"{est['apellidos']} {est['nombres']}",
+            "notas": notas,
+            "promedios": promedios_trimestre,
+            "promedio": promedio_anual,
+            "puestos": [p.get(est["id"]) for p in puestos["periodos"]],
+            "puesto": puestos["anual"].get(est["id"]),
+            "perdidas": sum(1 for n in notas if n["perdida"]),
+        })
+
+    return {
+        "periodos": [p.nombre for p in datos.periodos_anio],
+        "asignaturas": [of.asignatura.nombre for of in datos.ofertas],
+        "filas": filas,
+        "promedios_asignatura": [_promedio(finales[i]) for i in range(len(datos.ofertas))],
+        "con_perdidas": sum(1 for f in filas if f["perdidas"]),
+    }
+
+
+def nombre_docente_curso(curso):
+    docente_curso = Docente.objects.filter(curso_asignado=curso).first()
+    if docente_curso:
+        return f"{docente_curso.nombres} {docente_curso.apellidos}".upper()
+    return "DOCENTE"
+
+
+def nombre_rector():
+    rector_user = (
+        User.objects
+        .filter(is_active=True, groups__name="Rector")
+        .select_related("docente")
+        .first()
+    )
+    if not rector_user:
+        return "RECTOR(A)"
+    if hasattr(rector_user, "docente"):
+        return f"{rector_user.docente.nombres} {rector_user.docente.apellidos}".upper()
+    return (rector_user.get_full_name() or rector_user.username).upper()
+
+
+def contextos_boletin(anio, curso, periodo, estudiantes, colegio=None, logo_url=None, sello_url=None):
+    """
+    Genera ``(estudiante, ctx)`` para cada estudiante, con el mismo contexto
+    que espera academico/boletin_estudiante_pdf.html.
+    """
+    estudiantes = list(estudiantes)
+    datos = DatosNotasCurso(anio, curso, periodos_extra=[periodo])
+    ids = [e.id for e in estudiantes]
+
+    # ---- comunes al curso ----
+    puestos = puestos_curso(datos)
+    docente_nombre = nombre_docente_curso(curso)
+    rector_nombre = nombre_rector()
+
+    observaciones = {
+        o.estudiante_id: o
+        for o in ObservacionBoletin.objects.filter(estudiante_id__in=ids, periodo=periodo)
+    }
+
+    asistencia = contadores_periodo(ids, anio, periodo)
+
+    for est in estudiantes:
+        resumen_asignaturas, promedios_trimestre, promedio_anual = resumen_estudiante(datos, est.id)
+        puestos_est = [p.get(est.id) for p in puestos["periodos"]] + [None, None, None]
+        areas = areas_estudiante(datos, est.id, periodo)
+
+        asis = asistencia.get(est.id, {})
+
+        yield est, {
+            "anio": anio,
+            "curso": curso,
+            "periodo": periodo,
+            "estudiante": est,
+            "areas": areas,
+            "obs_general": observaciones.get(est.id),
+            "total_fallas_periodo": asis.get("fallas", 0),
+            "total_tardanzas_periodo": asis.get("tardanzas", 0),
+            "resumen_asignaturas": resumen_asignaturas,
+            "resumen_por_asig": {r["asignatura"]: r for r in resumen_asignaturas},
+            "promedios_trimestre": promedios_trimestre,
+            "promedio_anual": promedio_anual,
+            "docente_nombre": docente_nombre,
+            "rector_nombre": rector_nombre,
+            "logo_url": logo_url,
+            "sello_url": sello_url,
+            "puesto_p1": puestos_est[0],
+            "puesto_p2": puestos_est[1],
+            "puesto_p3": puestos_est[2],
+            "puesto_final": puestos["anual"].get(est.id),
+            "colegio": colegio,
+        }
+
+
+def contexto_boletin_ejemplo(n_asignaturas=12):
+    """Boletín típico con datos inventados (no toca la base de datos), para medir tiempos y tamaño."""
+    resumen = {}
+    filas = []
+    for i in range(n_asignaturas):
+        nombre = f"Asignatura {i + 1}"
+        nota = Decimal("3.50") + Decimal(i % 15) / 10
+        resumen[nombre] = {"p1": nota, "p2": nota, "p3": None, "prom_final": nota}
+        filas.append({
+            "asignatura": nombre,
+            "detalle": [{"titulo": f"Logro {j + 1} de {nombre}", "peso": 25, "nota": nota} for j in range(4)],
+        })
+
+    areas = [
+        {"nombre": f"Área {k + 1}", "filas": filas[k::4]}
+        for k in range(4)
+    ]
+    return {
+        "anio": SimpleNamespace(nombre="2025"),
+        "curso": SimpleNamespace(grado="5", nombre="A"),
+        "periodo": SimpleNamespace(nombre="Periodo 1"),
+        "estudiante": SimpleNamespace(
+            nombres="ANA MARÍA", apellidos="PÉREZ GÓMEZ", identificacion="1000000000", foto=None,
+        ),
+        "areas": areas,
+        "resumen_por_asig": resumen,
+        "obs_general": {"texto": "Buen desempeño durante el período."},
+        "total_fallas_periodo": 2,
+        "total_tardanzas_periodo": 1,
+        "promedios_trimestre": [Decimal("4.10"), Decimal("4.20"), None],
+        "promedio_anual": Decimal("4.15"),
+        "docente_nombre": "DOCENTE DE PRUEBA",
+        "rector_nombre": "RECTOR DE PRUEBA",
+        "logo_url": static("img/logo.png"),
+        "sello_url": static("img/sello.PNG"),
+    }
+
+
+def contexto_boletin(anio, curso, periodo, estudiante, **kwargs):
+    """Contexto del boletín de un solo estudiante."""
+    _, ctx = next(contextos_boletin(anio, curso, periodo, [estudiante], **kwargs))
+    return ctx
+
+
+# ----------------- Cierre de período (snapshots) -----------------
+
+# Lo que se congela del contexto; anio, curso, periodo, estudiante, colegio,
+# logo y sello se agregan en vivo al leer el snapshot.
+CLAVES_SNAPSHOT = (
+    "areas",
+    "resumen_asignaturas",
+    "promedios_trimestre",
+    "promedio_anual",
+    "total_fallas_periodo",
+    "total_tardanzas_periodo",
+    "docente_nombre",
+    "rector_nombre",
+    "puesto_p1",
+    "puesto_p2",
+    "puesto_p3",
+    "puesto_final",
+)
+
+
+def _datos_snapshot(ctx):
+    datos = {clave: ctx[clave] for clave in CLAVES_SNAPSHOT}
+    obs = ctx["obs_general"]
+    datos["obs_general"] = {"texto": obs.texto} if obs else None
+    return datos
+
+
+def contexto_desde_snapshot(snapshot, **vivos):
+    """Contexto del boletín a partir del snapshot + los objetos vivos (anio, curso, ...)."""
+    ctx = dict(snapshot.datos)
+    ctx["resumen_por_asig"] = {r["asignatura"]: r for r in ctx["resumen_asignaturas"]}
+    ctx.update(vivos)
+    return ctx
+
+
+def snapshot_boletin(estudiante, periodo):
+    """Snapshot del boletín si el período está cerrado (una consulta por índice único)."""
+    return BoletinSnapshot.objects.filter(estudiante=estudiante, periodo=periodo).first()
+
+
+def periodo_cerrado(school, periodo):
+    return CierrePeriodo.objects.filter(school=school, periodo=periodo, cerrado=True).exists()
+
+
+def cerrar_periodo(school, anio, periodo, usuario=None, **kwargs_ctx):
+    """
+    Cierra el período para el colegio: calcula el boletín de cada estudiante
+    una sola vez y lo guarda como BoletinSnapshot.
+
+    Sólo escribe en la base (los PDF se generan después, fuera de esta
+    transacción, con ``renderizar_pdfs_cierre``). ``kwargs_ctx`` (colegio,
+    logo_url, sello_url) se pasan a contextos_boletin. Devuelve
+    (cierre, número de boletines congelados).
+    """
+    with transaction.atomic():
+        cierre, _ = CierrePeriodo.objects.select_for_update().get_or_create(
+            school=school, anio=anio, periodo=periodo,
+        )
+        if cierre.cerrado and cierre.snapshots.exists():
+            return cierre, 0
+
+        cierre.snapshots.all().delete()
+
+        cursos = (
+            Curso.objects
+            .filter(school=school, ofertas__anio=anio)
+            .distinct()
+            .order_by("grado", "nombre")
+        )
+        nuevos = []
+        for curso in cursos:
+            estudiantes = (
+                Estudiante.objects
+                .filter(curso=curso, school=school)
+                .order_by("apellidos", "nombres")
+            )
+            for est, ctx in contextos_boletin(anio, curso, periodo, estudiantes, **kwargs_ctx):
+                nuevos.append(BoletinSnapshot(
+                    cierre=cierre,
+                    estudiante=est,
+                    periodo=periodo,
+                    datos=_datos_snapshot(ctx),
+                ))
+
+        BoletinSnapshot.objects.bulk_create(nuevos, batch_size=200)
+        # bulk_create no dispara señales: el portal y los fragmentos deben ver el cierre
+        cursos_ids = [c.id for c in cursos]
+        transaction.on_commit(lambda: [invalidar_notas_curso(c) for c in cursos_ids])
+
+        cierre.cerrado = True
+        cierre.cerrado_por = usuario
+        cierre.fecha_cierre = timezone.now()
+        cierre.save(update_fields=["cerrado", "cerrado_por", "fecha_cierre"])
+
+    return cierre, len(nuevos)
+
+
+def renderizar_pdfs_cierre(cierre, render_pdf, **vivos):
+    """
+    Genera el PDF de los boletines del cierre que todavía no lo tienen.
+
+    ``render_pdf(ctx) -> bytes``; ``vivos`` (colegio, logo_url, sello_url) se
+    agregan al contexto del snapshot. Cada PDF se guarda por separado, así que
+    se puede volver a llamar tras un fallo: sólo rinde los que faltan. Si el
+    período se reabre mientras tanto, el archivo recién escrito se borra.
+    Devuelve (generados, fallidos).
+    """
+    storage = BoletinSnapshot._meta.get_field("pdf").storage
+    sin_pdf = Q(pdf="") | Q(pdf__isnull=True)
+    pendientes = (
+        cierre.snapshots
+        .filter(sin_pdf)
+        .select_related("estudiante__curso", "periodo")
+        .order_by("id")
+    )
+    generados = fallidos = 0
+    for snap in pendientes.iterator(chunk_size=200):
+        est = snap.estudiante
+        ctx = contexto_desde_snapshot(
+            snap, anio=cierre.anio, curso=est.curso, periodo=snap.periodo, estudiante=est, **vivos
+        )
+        try:
+            contenido = render_pdf(ctx)
+        except Exception:
+            logger.exception("No se pudo generar el PDF del boletín %s (cierre %s).", snap.pk, cierre.pk)
+            fallidos += 1
+            continue
+
+        nombre = f"{cierre.anio.nombre}/P{snap.periodo.numero}/boletin_{est.identificacion}.pdf"
+        snap.pdf.save(nombre, ContentFile(contenido), save=False)
+        # BoletinSnapshot.save() no permite modificar: se marca con update()
+        if BoletinSnapshot.objects.filter(sin_pdf, pk=snap.pk).update(pdf=snap.pdf.name):
+            generados += 1
+        else:
+            storage.delete(snap.pdf.name)
+
+    return generados, fallidos
+
+
+def reabrir_periodo(school, anio, periodo):
+    """Reabre el período: borra los snapshots (y sus PDF) para volver al cálculo en vivo."""
+    with transaction.atomic():
+        cierre = (
+            CierrePeriodo.objects
+            .select_for_update()
+            .filter(school=school, anio=anio, periodo=periodo)
+            .first()
+        )
+        if not cierre:
+            return None
+
+        pdfs = [p for p in cierre.snapshots.values_list("pdf", flat=True) if p]
+        cursos_ids = set(cierre.snapshots.values_list("estudiante__curso_id", flat=True))
+        cierre.snapshots.all().delete()
+        cierre.cerrado = False
+        cierre.generar_pdf = False
+        cierre.fecha_reapertura = timezone.now()
+        cierre.save(update_fields=["cerrado", "generar_pdf", "fecha_reapertura"])
+
+        storage = BoletinSnapshot._meta.get_field("pdf").storage
+        transaction.on_commit(lambda: [storage.delete(nombre) for nombre in pdfs])
+        transaction.on_commit(lambda: [invalidar_notas_curso(c) for c in cursos_ids])
+
+    return cierre
+
+
+def guardar_observaciones(periodo, existentes, textos, docente=None):
+    """
+    Guarda las observaciones del período de varios estudiantes a la vez.
+
+    ``existentes``: {estudiante_id: ObservacionBoletin} ya cargadas;
+    ``textos``: {estudiante_id: texto}, un texto vacío borra la observación.
+    Sólo se escriben las que cambian: un bulk_create con update_conflicts
+    (upsert) y un delete. Las notas y puestos no se tocan.
+    """
+    upsert, borrar = [], []
+    for est_id, texto in textos.items():
+        texto = (texto or "").strip()
+        actual = existentes.get(est_id)
+        if not texto:
+            if actual is not None:
+                borrar.append(actual)
+        elif actual is None or actual.texto != texto:
+            upsert.append(ObservacionBoletin(
+                estudiante_id=est_id, periodo=periodo, docente=docente, texto=texto,
+            ))
+
+    with transaction.atomic():
+        if borrar:
+            ObservacionBoletin.objects.filter(pk__in=[o.pk for o in borrar]).delete()
+        if upsert:
+            # MySQL resuelve el conflicto con cualquier índice único: no acepta unique_fields
+            con_objetivo = connection.features.supports_update_conflicts_with_target
+            ObservacionBoletin.objects.bulk_create(
+                upsert,
+                update_conflicts=True,
+                update_fields=["texto", "docente", "fecha_actualizacion"],
+                unique_fields=["estudiante", "periodo"] if con_objetivo else None,
+            )
+
+        # bulk_create no dispara señales: invalidar a mano
+        tocados = {o.estudiante_id for o in upsert + borrar}
+        if tocados:
+            transaction.on_commit(lambda: [invalidar_datos_estudiante(i) for i in tocados])
+
+    return {"guardadas": len(upsert), "borradas": len(borrar)}
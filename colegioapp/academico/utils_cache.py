@@ -0,0 +1,152 @@
+"""
+Versiones de caché de las notas de un curso y de los datos de un estudiante.
+
+Cada curso tiene un número de versión guardado en la caché de Django. Los
+cambios en notas, logros, Saber Ser u ofertas del curso lo renuevan (ver
+academico/signals.py), así las entradas viejas dejan de leerse sin tener que
+borrarlas una por una.
+
+Cada estudiante tiene además su propia versión (notas, observaciones,
+asistencia, cuentas y pagos; ver también cartera/signals.py). Lo que es
+común a todos (años y períodos, logo y sello del colegio, docentes, rector)
+comparte una versión general. Con las tres se arma el ETag / Last-Modified
+del portal del estudiante.
+
+Las versiones son marcas de tiempo (``time.time_ns()`` del último cambio,
+o la anterior + 1 si el reloj quedó atrás) y viven en la base
+(VersionCache): así todos los procesos de la app ven el mismo número y
+dejan de usar lo viejo aunque cada uno tenga su propia caché ``default``.
+Se renuevan en la misma transacción que el cambio.
+
+Las escrituras masivas (``update()``, ``bulk_create``...) no disparan
+señales: quien las haga debe llamar a ``invalidar_notas_curso`` /
+``invalidar_datos_estudiante``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from academico.models import VersionCache
+
+# Tiempo máximo de vida de fragmentos y cálculos cacheados (segundos)
+BOLETIN_CACHE_TIMEOUT = getattr(settings, "BOLETIN_CACHE_TIMEOUT", 60 * 60)
+
+
+def _versiones(*claves):
+    """Versión de cada clave en una sola consulta; las que no existen se crean."""
+    actuales = dict(
+        VersionCache.objects.filter(clave__in=claves).values_list("clave", "version")
+    )
+    for clave in claves:
+        if clave not in actuales:
+            vc, _ = VersionCache.objects.get_or_create(clave=clave, defaults={"version": time.time_ns()})
+            actuales[clave] = vc.version
+    return [actuales[clave] for clave in claves]
+
+
+def _version(clave):
+    return _versiones(clave)[0]
+
+
+def _renovar(clave):
+    ahora = time.time_ns()
+    nueva = Greatest(F("version") + 1, Value(ahora))
+    if VersionCache.objects.filter(clave=clave).update(version=nueva):
+        return
+    _, creada = VersionCache.objects.get_or_create(clave=clave, defaults={"version": ahora})
+    if not creada:
+        # otro proceso la creó entre el update y el get_or_create
+        VersionCache.objects.filter(clave=clave).update(version=nueva)
+
+
+def _clave_version(curso_id):
+    return f"notas-curso:{curso_id}:version"
+
+
+def version_notas_curso(curso_id):
+    """Versión vigente de las notas del curso (se crea si todavía no existe)."""
+    return _version(_clave_version(curso_id))
+
+
+def invalidar_notas_curso(curso_id):
+    """Renueva la versión: todo lo cacheado para el curso queda obsoleto."""
+    if curso_id:
+        _renovar(_clave_version(curso_id))
+
+
+def _clave_estudiante(estudiante_id):
+    return f"datos-estudiante:{estudiante_id}:version"
+
+
+_CLAVE_GENERAL = "datos-generales:version"
+
+
+def version_datos_estudiante(estudiante_id):
+    return _version(_clave_estudiante(estudiante_id))
+
+
+def invalidar_datos_estudiante(estudiante_id):
+    if estudiante_id:
+        _renovar(_clave_estudiante(estudiante_id))
+
+
+def version_general():
+    return _version(_CLAVE_GENERAL)
+
+
+def invalidar_datos_generales():
+    """Renueva la versión común a todos los estudiantes (períodos, colegio, firmas)."""
+    _renovar(_CLAVE_GENERAL)
+
+
+def version_portal(estudiante, *partes):
+    """
+    (etag, last_modified) de lo que el estudiante ve en el portal: sus datos,
+    las notas de su curso, los datos generales y ``partes`` (vista,
+    período...). ``last_modified`` es un timestamp en segundos, como lo espera
+    get_conditional_response. Las tres versiones se leen de la base en una
+    consulta, así cualquier proceso responde 304 sólo si nada cambió.
+    """
+    claves = [_clave_estudiante(estudiante.id), _CLAVE_GENERAL]
+    if estudiante.curso_id:
+        claves.append(_clave_version(estudiante.curso_id))
+    v_est, v_general, v_curso = (*_versiones(*claves), 0)[:3]
+    base = ":".join(str(p) for p in (estudiante.id, v_est, v_curso, v_general, *partes))
+    etag = '"%s"' % hashlib.sha1(base.encode("utf-8")).hexdigest()
+    return etag, max(v_est, v_curso, v_general) // 1_000_000_000
+
+
+def clave_notas_curso(curso_id, *partes):
+    """Clave de caché atada a la versión actual de las notas del curso."""
+    sufijo = ":".join(str(p) for p in partes)
+    return f"notas-curso:{curso_id}:{version_notas_curso(curso_id)}:{sufijo}"
+
+
+# ----------------- curso de un logro / una oferta -----------------
+# Las señales sólo conocen ids. No se guardan en memoria: un logro o una
+# oferta pueden pasar a otro curso y el mapa quedaría viejo en los demás
+# procesos.
+
+def curso_de_oferta(oferta_id):
+    from academico.models import AsignaturaOferta
+
+    return (
+        AsignaturaOferta.objects
+        .filter(pk=oferta_id)
+        .values_list("curso_id", flat=True)
+        .first()
+    )
+
+
+def curso_de_logro(logro_id):
+    from academico.models import Logro
+
+    return (
+        Logro.objects
+        .filter(pk=logro_id)
+        .values_list("oferta__curso_id", flat=True)
+        .first()
+    )
@@ -0,0 +1,204 @@
+"""
+Sincronización de la captura sin conexión (asistencia y planillas de notas).
+
+El navegador guarda cada envío como una operación con un id propio en una cola
+(IndexedDB, ver static/academico/js/offline_captura.js) y la manda cuando hay
+red. Un lote puede traer operaciones de muchas planillas y fechas:
+
+    {"id": "…", "tipo": "notas", "cambios": [...]}        (como notas_autosave)
+    {"id": "…", "tipo": "asistencia", "anio": 1, "curso": 4, "periodo": 2,
+     "fecha": "2026-03-02", "registros": [{"estudiante": 12, "estado": "A",
+     "observacion": ""}]}
+
+Todo el lote se aplica en una transacción, con consultas por planilla y no por
+celda. Los ids ya aplicados (OperacionCaptura) se saltan, así un reenvío tras
+un corte de red no duplica nada.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from academico.models import (
+    AsistenciaDetalle, Curso, Docente, Estudiante, OperacionCaptura, PaseLista, Periodo,
+)
+from academico.utils_asistencia import ESTADOS_ASISTENCIA, guardar_asistencia
+from academico.utils_notas import _entero, aplicar_cambios_notas
+
+
+def errores_de_formato(operaciones):
+    """
+    Revisa la forma del lote antes de aplicarlo: cada operación debe ser un
+    objeto y sus "cambios" / "registros", listas. Devuelve la lista de errores.
+    """
+    errores = []
+    for i, op in enumerate(operaciones):
+        if not isinstance(op, dict):
+            errores.append({"op": None, "indice": i, "error": "La operación debe ser un objeto."})
+            continue
+        for campo in ("cambios", "registros"):
+            if op.get(campo) is not None and not isinstance(op[campo], list):
+                errores.append({
+                    "op": op.get("id"),
+                    "indice": i,
+                    "error": f"'{campo}' debe ser una lista.",
+                })
+    return errores
+
+
+def _registros_asistencia(op, errores):
+    """Valida el formato de una operación de asistencia -> (clave, {est_id: valores})."""
+    anio_id, curso_id, periodo_id = _entero(op.get("anio")), _entero(op.get("curso")), _entero(op.get("periodo"))
+    try:
+        fecha = date.fromisoformat(str(op.get("fecha")))
+    except ValueError:
+        fecha = None
+    if not (anio_id and curso_id and periodo_id and fecha):
+        errores.append({"op": op["id"], "estudiante": None, "error": "Faltan año, curso, período o fecha."})
+        return None, {}
+
+    registros = {}
+    for reg in op.get("registros") or []:
+        est_id = _entero(reg.get("estudiante")) if isinstance(reg, dict) else None
+        estado = str(reg.get("estado") or "").strip() if est_id else ""
+        if not est_id or estado not in ESTADOS_ASISTENCIA:
+            errores.append({
+                "op": op["id"],
+                "estudiante": est_id,
+                "error": "Registro de asistencia inválido.",
+            })
+            continue
+        registros[est_id] = {
+            "estado": estado,
+            "observacion": str(reg.get("observacion") or "").strip()[:255],
+        }
+    return (anio_id, curso_id, periodo_id, fecha), registros
+
+
+def _aplicar_asistencia(school, usuario, ops, errores):
+    """ops: [(op, clave, registros)] en el orden en que se capturaron."""
+    cursos = set(
+        Curso.objects.filter(pk__in={c for _, (_, c, _, _), _ in ops}, school=school)
+        .values_list("id", flat=True)
+    )
+    periodos = dict(
+        Periodo.objects.filter(pk__in={p for _, (_, _, p, _), _ in ops}).values_list("id", "anio_id")
+    )
+    cursos_est = dict(
+        Estudiante.objects.filter(
+            school=school, pk__in={e for _, _, regs in ops for e in regs},
+        ).values_list("id", "curso_id")
+    )
+
+    # Última captura de cada estudiante por pase (curso, fecha)
+    por_pase = defaultdict(dict)
+    datos_pase = {}
+    for op, (anio_id, curso_id, periodo_id, fecha), registros in ops:
+        if curso_id not in cursos or periodos.get(periodo_id) != anio_id:
+            errores.append({"op": op["id"], "estudiante": None, "error": "Curso o período no encontrados."})
+            continue
+        datos_pase.setdefault((curso_id, fecha), (anio_id, periodo_id))
+        for est_id, valores in registros.items():
+            if cursos_est.get(est_id) != curso_id:
+                errores.append({
+                    "op": op["id"],
+                    "estudiante": est_id,
+                    "error": "El estudiante no pertenece a este curso.",
+                })
+                continue
+            por_pase[(curso_id, fecha)][est_id] = valores
+
+    if not por_pase:
+        return
+
+    pases = {
+        (p.curso_id, p.fecha): p
+        for p in PaseLista.objects.filter(
+            school=school,
+            curso_id__in={c for c, _ in por_pase},
+            fecha__in={f for _, f in por_pase},
+        )
+    }
+    faltantes = [clave for clave in por_pase if clave not in pases]
+    if faltantes:
+        docente = Docente.objects.filter(usuario=usuario, school=school).first()
+        for curso_id, fecha in faltantes:
+            anio_id, periodo_id = datos_pase[(curso_id, fecha)]
+            pases[(curso_id, fecha)] = PaseLista.objects.create(
+                school=school, anio_id=anio_id, curso_id=curso_id,
+                periodo_id=periodo_id, fecha=fecha, docente=docente,
+            )
+
+    existentes = defaultdict(dict)
+    for det in AsistenciaDetalle.objects.filter(pase__in=[pases[c] for c in por_pase]):
+        existentes[det.pase_id][det.estudiante_id] = det
+    for clave, registros in por_pase.items():
+        pase = pases[clave]
+        guardar_asistencia(pase, existentes[pase.id], registros)
+
+
+def aplicar_operaciones(school, usuario, operaciones):
+    """
+    Aplica un lote de operaciones capturadas sin conexión, en una transacción.
+
+    Devuelve {"procesadas": [ids], "repetidas": [ids], "errores": [...],
+    "logros": [...]}. "procesadas" incluye las repetidas y las que tuvieron
+    errores de validación (reenviarlas no cambiaría el resultado): el navegador
+    las saca de la cola. Si la transacción falla, no se marca ninguna.
+    """
+    errores = []
+    validas, vistos = [], set()
+    for op in operaciones:
+        op_id = op.get("id") if isinstance(op, dict) else None
+        if not isinstance(op_id, str) or not 0 < len(op_id) <= 64:
+            errores.append({"op": None, "estudiante": None, "error": "Operación sin id válido."})
+            continue
+        if op_id in vistos:
+            continue
+        vistos.add(op_id)
+        validas.append(op)
+
+    with transaction.atomic():
+        # Un lote a la vez por usuario: dos pestañas que reenvían lo mismo no lo aplican dos veces
+        User.objects.select_for_update().filter(pk=usuario.pk).first()
+        aplicadas = set(
+            OperacionCaptura.objects
+            .filter(usuario=usuario, op_id__in=vistos)
+            .values_list("op_id", flat=True)
+        ) if vistos else set()
+
+        cambios, asistencia, nuevas = [], [], []
+        for op in validas:
+            if op["id"] in aplicadas:
+                continue
+            tipo = op.get("tipo")
+            if tipo == "notas":
+                cambios += [
+                    {**cambio, "op": op["id"]}
+                    for cambio in (op.get("cambios") or [])
+                    if isinstance(cambio, dict)
+                ]
+            elif tipo == "asistencia":
+                clave, registros = _registros_asistencia(op, errores)
+                if clave:
+                    asistencia.append((op, clave, registros))
+            else:
+                errores.append({"op": op["id"], "estudiante": None, "error": "Tipo de operación desconocido."})
+            nuevas.append(OperacionCaptura(
+                school=school, usuario=usuario, op_id=op["id"], tipo=str(tipo or "")[:20],
+            ))
+
+        resultado_notas = aplicar_cambios_notas(school, cambios) if cambios else {"errores": [], "logros": []}
+        errores += resultado_notas["errores"]
+        if asistencia:
+            _aplicar_asistencia(school, usuario, asistencia, errores)
+
+        OperacionCaptura.objects.bulk_create(nuevas)
+
+    return {
+        "procesadas": [op["id"] for op in validas],
+        "repetidas": [op["id"] for op in validas if op["id"] in aplicadas],
+        "errores": errores,
+        "logros": resultado_notas["logros"],
+    }
@@ -0,0 +1,237 @@
+"""
+Ingreso por portería: registro de llegadas desde un kiosko (lector de
+código de barras o QR con el número de identificación).
+
+Cada lectura se resuelve contra un índice en memoria de los estudiantes del
+colegio y se anota en la cola LlegadaIngreso: una fila por estudiante y día,
+así una lectura repetida se reconoce aunque la atienda otro proceso, y lo que
+el kiosko ya confirmó no se pierde si un proceso se reinicia. La cola se pasa
+al pase de lista por lotes (INGRESO_LOTE llegadas o INGRESO_ESPERA segundos
+desde la más antigua, o cuando el kiosko queda quieto); cualquier proceso
+puede hacerlo, y los lotes se toman con skip_locked para no repetirse. Se
+crea el pase de lista del día de cada curso, en el período actual del
+colegio (School.periodo_actual), y quien llegó después de
+School.hora_limite_ingreso queda con tardanza. Sin período actual, o si ya
+se cerró, el kiosko rechaza la lectura.
+
+Como en AsistenciaDetalle sólo se guardan excepciones, una llegada a tiempo
+no escribe fila: basta con que exista el pase de lista. Las ausencias las
+sigue marcando el docente en asistencia_tomar.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from academico.models import AsistenciaDetalle, Estudiante, LlegadaIngreso, PaseLista, Periodo
+from academico.utils_asistencia import guardar_asistencia
+
+logger = logging.getLogger(__name__)
+
+INGRESO_LOTE = getattr(settings, "INGRESO_LOTE", 50)
+INGRESO_ESPERA = getattr(settings, "INGRESO_ESPERA", 2)  # segundos
+INGRESO_INDICE_TTL = getattr(settings, "INGRESO_INDICE_TTL", 5 * 60)  # segundos
+
+# school_id -> (expira, {identificacion: ficha}); sólo lectura, cada proceso tiene el suyo
+_indices = {}
+
+
+def _cargar_fichas(school, **filtros):
+    return {
+        fila["identificacion"].strip(): {
+            "id": fila["id"],
+            "nombre": f'{fila["apellidos"]} {fila["nombres"]}',
+            "curso_id": fila["curso_id"],
+            "curso": f'{fila["curso__grado"]} - {fila["curso__nombre"]}' if fila["curso_id"] else "",
+        }
+        for fila in Estudiante.objects.filter(school=school, **filtros).values(
+            "id", "identificacion", "nombres", "apellidos", "curso_id", "curso__grado", "curso__nombre",
+        )
+    }
+
+
+def _ficha(school, codigo):
+    """Estudiante por identificación, desde el índice del colegio (se recarga cada INGRESO_INDICE_TTL)."""
+    ahora = time.monotonic()
+    expira, indice = _indices.get(school.id, (0, None))
+    if indice is None or expira < ahora:
+        indice = _cargar_fichas(school)
+        _indices[school.id] = (ahora + INGRESO_INDICE_TTL, indice)
+
+    ficha = indice.get(codigo)
+    if ficha is None:
+        # matriculado después de cargar el índice
+        ficha = _cargar_fichas(school, identificacion=codigo).get(codigo)
+        if ficha is not None:
+            indice[codigo] = ficha
+    return ficha
+
+
+def registrar_llegada(school, codigo, momento=None):
+    """
+    Registra una lectura del kiosko. Devuelve lo que muestra la pantalla:
+    {"ok", "estudiante", "curso", "estado" ("P" o "T"), "hora", "repetido"}
+    o {"ok": False, "error"}.
+    """
+    codigo = (codigo or "").strip()
+    if not codigo:
+        return {"ok": False, "error": "Lectura vacía."}
+
+    ficha = _ficha(school, codigo)
+    if ficha is None:
+        return {"ok": False, "error": f"No hay un estudiante con identificación {codigo}."}
+    if not ficha["curso_id"]:
+        return {"ok": False, "error": f"{ficha['nombre']} no tiene curso asignado."}
+
+    periodo = periodo_ingreso(school)
+    if periodo is None:
+        return {"ok": False, "error": "El colegio no tiene un período actual abierto: márcalo en Períodos."}
+
+    momento = momento or timezone.now()
+    limite = school.hora_limite_ingreso
+    tarde = bool(limite and momento.time() > limite)
+
+    llegada, creada = LlegadaIngreso.objects.get_or_create(
+        estudiante_id=ficha["id"],
+        fecha=momento.date(),
+        defaults={
+            "school": school,
+            "curso_id": ficha["curso_id"],
+            "periodo": periodo,
+            "momento": momento,
+            "tarde": tarde,
+        },
+    )
+    respuesta = {
+        "ok": True,
+        "estudiante": ficha["nombre"],
+        "curso": ficha["curso"],
+        # vale la primera lectura del día
+        "estado": AsistenciaDetalle.TARDANZA if llegada.tarde else AsistenciaDetalle.PRESENTE,
+        "hora": llegada.momento.strftime("%H:%M"),
+        "repetido": not creada,
+    }
+    if not creada:
+        return respuesta
+
+    cola = LlegadaIngreso.objects.filter(guardada=False).aggregate(n=Count("id"), primera=Min("momento"))
+    if cola["n"] >= INGRESO_LOTE or (
+        cola["primera"] and cola["primera"] <= timezone.now() - timedelta(seconds=INGRESO_ESPERA)
+    ):
+        vaciar_cola()
+    return respuesta
+
+
+def pendientes(school=None):
+    """Llegadas que aún no pasan al pase de lista."""
+    cola = LlegadaIngreso.objects.filter(guardada=False)
+    if school is not None:
+        cola = cola.filter(school=school)
+    return cola.count()
+
+
+def vaciar_cola():
+    """
+    Pasa a los pases de lista las llegadas pendientes, de a INGRESO_LOTE.
+    Cada lote se bloquea con skip_locked: si otro proceso está guardando
+    uno, éste sigue con las demás. Si un lote falla, queda en la cola para
+    el siguiente intento. Devuelve cuántas se guardaron.
+    """
+    guardadas = 0
+    while True:
+        lote = []
+        try:
+            with transaction.atomic():
+                lote = list(
+                    LlegadaIngreso.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(guardada=False)
+                    .order_by("id")[:INGRESO_LOTE]
+                )
+                if not lote:
+                    return guardadas
+                guardar_llegadas(lote)
+                LlegadaIngreso.objects.filter(pk__in=[llegada.pk for llegada in lote]).update(guardada=True)
+        except Exception:
+            logger.exception("No se pudieron guardar %s llegadas; quedan en la cola.", len(lote))
+            return guardadas
+        guardadas += len(lote)
+
+
+def periodo_ingreso(school):
+    """School.periodo_actual si sigue abierto para el colegio; si no, None."""
+    if not school.periodo_actual_id:
+        return None
+    return (
+        Periodo.objects.filter(pk=school.periodo_actual_id)
+        .exclude(cierres__school=school, cierres__cerrado=True)
+        .first()
+    )
+
+
+def guardar_llegadas(llegadas):
+    """
+    Escribe un lote de LlegadaIngreso: pases de lista del día por curso (los
+    que falten, en un bulk_create) y tardanzas con guardar_asistencia. Una
+    llegada a tiempo no cambia una fila que ya exista (el docente pudo marcar
+    algo después); una tardía reemplaza una ausencia pero no una excusa.
+    """
+    por_dia = defaultdict(list)
+    for llegada in llegadas:
+        por_dia[(llegada.school_id, llegada.fecha)].append(llegada)
+    anios = dict(
+        Periodo.objects.filter(pk__in={llegada.periodo_id for llegada in llegadas}).values_list("id", "anio_id")
+    )
+
+    with transaction.atomic():
+        for (school_id, fecha), grupo in por_dia.items():
+            # período con que se leyó cada curso (el actual del colegio en ese momento)
+            periodos = {llegada.curso_id: llegada.periodo_id for llegada in grupo}
+
+            pases = {p.curso_id: p for p in PaseLista.objects.filter(curso_id__in=periodos, fecha=fecha)}
+            faltan = periodos.keys() - pases.keys()
+            if faltan:
+                PaseLista.objects.bulk_create(
+                    [
+                        PaseLista(
+                            school_id=school_id, anio_id=anios[periodos[c]], curso_id=c,
+                            periodo_id=periodos[c], fecha=fecha,
+                        )
+                        for c in faltan
+                    ],
+                    ignore_conflicts=True,
+                )
+                pases = {p.curso_id: p for p in PaseLista.objects.filter(curso_id__in=periodos, fecha=fecha)}
+
+            tardes = [
+                (llegada.estudiante_id, llegada.curso_id, llegada.momento)
+                for llegada in grupo if llegada.tarde
+            ]
+            if not tardes:
+                continue
+
+            existentes = defaultdict(dict)
+            for det in AsistenciaDetalle.objects.filter(
+                pase__in=[pases[c] for _, c, _ in tardes],
+                estudiante_id__in=[est_id for est_id, _, _ in tardes],
+            ):
+                existentes[det.pase_id][det.estudiante_id] = det
+
+            por_pase = defaultdict(dict)
+            for est_id, curso_id, momento in tardes:
+                pase = pases[curso_id]
+                actual = existentes[pase.id].get(est_id)
+                if actual and actual.estado not in (AsistenciaDetalle.AUSENTE, AsistenciaDetalle.PRESENTE):
+                    continue
+                por_pase[pase][est_id] = {
+                    "estado": AsistenciaDetalle.TARDANZA,
+                    "observacion": (actual.observacion if actual else "") or f"Llegó a las {momento:%H:%M}",
+                }
+
+            for pase, registros in por_pase.items():
+                guardar_asistencia(pase, existentes[pase.id], registros)
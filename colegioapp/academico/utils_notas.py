@@ -1,45 +1,416 @@
+from collections import defaultdict
 from decimal import Decimal
-from academico.models import Actividad, CalificacionActividad, CalificacionLogro, Logro
 
-def recalcular_nota_logro_desde_actividades(estudiante, logro):
-    if logro.tipo != Logro.TIPO_HACER:
-        return
+from django.db import connection, transaction
+from django.db.models import Q
+
+from academico.models import (
+    Actividad, AsignaturaOferta, CalificacionActividad, CalificacionLogro, CierrePeriodo,
+    Estudiante, Logro, Periodo, SaberSer,
+)
+from academico.utils_cache import invalidar_datos_estudiante, invalidar_notas_curso
+
+PLANILLA_BATCH = 500
+
+
+def guardar_planilla(modelo, fijos, existentes, nuevos, campos, unicos, curso_id=None):
+    """
+    Guarda una planilla (una fila por estudiante) con operaciones por conjunto.
+
+    - ``fijos``: campos comunes a todas las filas, p. ej. {"actividad_id": 3}.
+    - ``existentes``: {estudiante_id: instancia} ya cargados por la vista.
+    - ``nuevos``: {estudiante_id: {campo: valor}} o {estudiante_id: None} para
+      borrar la fila. Los estudiantes que no aparecen no se tocan.
+    - ``campos``: campos de valor que se comparan y actualizan.
+    - ``unicos``: campos del unique_together, para el upsert.
 
-    actividades = Actividad.objects.filter(logro=logro)
-    if not actividades.exists():
-        CalificacionLogro.objects.filter(estudiante=estudiante, logro=logro).delete()
-        return
+    Inserta con bulk_create(update_conflicts=True) (si otra petición creó la
+    fila entre la lectura y la escritura, se actualiza), actualiza con
+    bulk_update y borra con un solo delete, todo en una transacción.
+    Devuelve {"creados": n, "actualizados": n, "borrados": n}.
+    """
+    crear, actualizar, borrar = [], [], []
+    for est_id, valores in nuevos.items():
+        actual = existentes.get(est_id)
+        if valores is None:
+            if actual is not None:
+                borrar.append(actual.pk)
+            continue
+        if actual is None:
+            crear.append(modelo(estudiante_id=est_id, **fijos, **valores))
+        elif any(getattr(actual, c) != valores.get(c) for c in campos):
+            for c in campos:
+                setattr(actual, c, valores.get(c))
+            actualizar.append(actual)
 
-    cals = CalificacionActividad.objects.filter(
-        actividad__in=actividades,
-        estudiante=estudiante,
-    ).select_related("actividad")
+    with transaction.atomic():
+        if borrar:
+            modelo.objects.filter(pk__in=borrar).delete()
+        if actualizar:
+            modelo.objects.bulk_update(actualizar, campos, batch_size=PLANILLA_BATCH)
+        if crear:
+            # MySQL resuelve el conflicto con cualquier índice único: no acepta unique_fields
+            con_objetivo = connection.features.supports_update_conflicts_with_target
+            modelo.objects.bulk_create(
+                crear,
+                batch_size=PLANILLA_BATCH,
+                update_conflicts=True,
+                update_fields=campos,
+                unique_fields=unicos if con_objetivo else None,
+            )
 
-    if not cals.exists():
-        CalificacionLogro.objects.filter(estudiante=estudiante, logro=logro).delete()
-        return
+        # bulk_create/bulk_update no disparan señales: invalidar a mano
+        tocados = {o.estudiante_id for o in crear + actualizar} | {
+            est_id for est_id, valores in nuevos.items() if valores is None and est_id in existentes
+        }
+        if tocados:
+            transaction.on_commit(lambda: _invalidar(tocados, curso_id))
 
-    pesos = [c.actividad.peso for c in cals if c.actividad.peso]
+    return {"creados": len(crear), "actualizados": len(actualizar), "borrados": len(borrar)}
+
+
+def _invalidar(estudiantes_ids, curso_id):
+    for est_id in estudiantes_ids:
+        invalidar_datos_estudiante(est_id)
+    invalidar_notas_curso(curso_id)
+
+
+def _nota_desde_actividades(cals):
+    """cals: [(peso_actividad, nota)] de un estudiante en un logro."""
+    pesos = [peso for peso, _ in cals if peso]
     suma_pesos = sum(pesos) if pesos else Decimal("0")
-    nota_final = None
 
     if suma_pesos == Decimal("100"):
         suma_pesada = Decimal("0")
-        for c in cals:
-            if c.nota is not None:
-                peso_rel = c.actividad.peso / Decimal("100")
-                suma_pesada += Decimal(c.nota) * peso_rel
-        nota_final = suma_pesada
-    else:
-        notas = [c.nota for c in cals if c.nota is not None]
-        if notas:
-            nota_final = (sum(notas) / len(notas)).quantize(Decimal("0.01"))
-
-    if nota_final is None:
-        CalificacionLogro.objects.filter(estudiante=estudiante, logro=logro).delete()
-    else:
-        CalificacionLogro.objects.update_or_create(
-            estudiante=estudiante,
-            logro=logro,
-            defaults={"nota": nota_final},
-        )
\ No newline at end of file
+        for peso, nota in cals:
+            if nota is not None:
+                suma_pesada += Decimal(nota) * (peso / Decimal("100"))
+        # el campo guarda 2 decimales: redondear aquí deja estable la comparación
+        return suma_pesada.quantize(Decimal("0.01"))
+
+    notas = [nota for _, nota in cals if nota is not None]
+    if notas:
+        return (sum(notas) / len(notas)).quantize(Decimal("0.01"))
+    return None
+
+
+def recalcular_notas_logro(logro, estudiantes_ids, curso_id=None):
+    """
+    Nota del logro (CalificacionLogro) a partir de sus actividades para varios
+    estudiantes a la vez: tres lecturas y una escritura por conjunto.
+    """
+    if logro.tipo != Logro.TIPO_HACER:
+        return None
+
+    estudiantes_ids = list(estudiantes_ids)
+    pesos = dict(Actividad.objects.filter(logro=logro).values_list("id", "peso"))
+
+    por_estudiante = {est_id: [] for est_id in estudiantes_ids}
+    if pesos:
+        cals = CalificacionActividad.objects.filter(
+            actividad_id__in=pesos,
+            estudiante_id__in=estudiantes_ids,
+        ).values_list("estudiante_id", "actividad_id", "nota")
+        for est_id, actividad_id, nota in cals:
+            por_estudiante[est_id].append((pesos[actividad_id], nota))
+
+    existentes = {
+        c.estudiante_id: c
+        for c in CalificacionLogro.objects.filter(logro=logro, estudiante_id__in=estudiantes_ids)
+    }
+
+    nuevos = {}
+    for est_id, cals in por_estudiante.items():
+        # sin actividades o sin notas de actividades: el logro queda sin nota
+        nota_final = _nota_desde_actividades(cals) if cals else None
+        nuevos[est_id] = None if nota_final is None else {"nota": nota_final}
+
+    return guardar_planilla(
+        CalificacionLogro,
+        {"logro_id": logro.id},
+        existentes,
+        nuevos,
+        campos=["nota"],
+        unicos=["estudiante", "logro"],
+        curso_id=curso_id,
+    )
+
+
+def recalcular_nota_logro_desde_actividades(estudiante, logro):
+    recalcular_notas_logro(logro, [estudiante.id], curso_id=estudiante.curso_id)
+
+
+# ----------------- Autoguardado por celdas (ver views.notas_autosave) -----------------
+
+# Dimensiones de Saber Ser: prefijo del input en la planilla -> campo del modelo
+DIMENSIONES_SABER_SER = {
+    "comp": "nota_comportamiento",
+    "resp": "nota_responsabilidad",
+    "auto": "nota_autoevaluacion",
+}
+
+NOTA_MINIMA = Decimal("0")
+NOTA_MAXIMA = Decimal("5")
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_nota(raw):
+    """(valor, error): '' borra la nota (None), '4,5' -> Decimal('4.5')."""
+    raw = str(raw if raw is not None else "").strip()
+    if not raw:
+        return None, None
+    try:
+        valor = Decimal(raw.replace(",", "."))
+    except Exception:
+        return None, "No es un número."
+    if not valor.is_finite() or not (NOTA_MINIMA <= valor <= NOTA_MAXIMA):
+        return None, "La nota debe estar entre 0.00 y 5.00."
+    return valor.quantize(Decimal("0.01")), None
+
+
+def aplicar_cambios_notas(school, cambios):
+    """
+    Aplica sólo las celdas modificadas de una planilla. Cada cambio es un dict:
+
+        {"celda": "nota_12", "estudiante": 12, "actividad": 5, "valor": "4.5"}
+        {"celda": "...", "estudiante": 12, "logro": 9, "valor": ""}            (logros sin actividades)
+        {"celda": "comp_12", "estudiante": 12, "oferta": 3, "periodo": 2, "dimension": "comp", "valor": "4"}
+
+    Valor vacío = borrar la nota. Las consultas dependen de cuántas planillas
+    toca el lote, no del tamaño del curso. Devuelve {"guardados": [celdas],
+    "errores": [{"celda", "estudiante", "error"}], "logros": [notas de logro
+    recalculadas]}. Si el cambio trae "op" (sincronización sin conexión), el
+    error lo repite.
+    """
+    errores = []
+
+    def _error(cambio, mensaje):
+        error = {
+            "celda": cambio.get("celda"),
+            "estudiante": cambio.get("estudiante"),
+            "error": mensaje,
+        }
+        if "op" in cambio:
+            error["op"] = cambio["op"]
+        errores.append(error)
+
+    # ---- 1. validar formato ----
+    validos = []  # (tipo, clave, est_id, campo, valor, cambio)
+    for cambio in cambios:
+        if not isinstance(cambio, dict):
+            errores.append({"celda": None, "estudiante": None, "error": "Cambio inválido."})
+            continue
+        est_id = _entero(cambio.get("estudiante"))
+        if est_id is None:
+            _error(cambio, "Estudiante inválido.")
+            continue
+        valor, error = _parse_nota(cambio.get("valor"))
+        if error:
+            _error(cambio, error)
+            continue
+
+        if cambio.get("actividad") is not None:
+            tipo, clave, campo = "actividad", _entero(cambio["actividad"]), "nota"
+        elif cambio.get("logro") is not None:
+            tipo, clave, campo = "logro", _entero(cambio["logro"]), "nota"
+        elif cambio.get("dimension") in DIMENSIONES_SABER_SER:
+            oferta_id, periodo_id = _entero(cambio.get("oferta")), _entero(cambio.get("periodo"))
+            tipo = "saber_ser"
+            clave = (oferta_id, periodo_id) if oferta_id and periodo_id else None
+            campo = DIMENSIONES_SABER_SER[cambio["dimension"]]
+        else:
+            _error(cambio, "Celda desconocida.")
+            continue
+
+        if clave is None:
+            _error(cambio, "Celda desconocida.")
+            continue
+        validos.append((tipo, clave, est_id, campo, valor, cambio))
+
+    # ---- 2. cargar lo referenciado (una consulta por tipo) ----
+    ids = defaultdict(set)
+    for tipo, clave, est_id, *_ in validos:
+        ids["estudiante"].add(est_id)
+        if tipo == "saber_ser":
+            ids["oferta"].add(clave[0])
+            ids["periodo"].add(clave[1])
+        else:
+            ids[tipo].add(clave)
+
+    actividades = {
+        a.id: a
+        for a in Actividad.objects.select_related("logro__oferta").filter(
+            pk__in=ids["actividad"], logro__school=school,
+        )
+    } if ids["actividad"] else {}
+    logros = {
+        lg.id: lg
+        for lg in Logro.objects.select_related("oferta").filter(pk__in=ids["logro"], school=school)
+    } if ids["logro"] else {}
+    ofertas = {
+        o.id: o for o in AsignaturaOferta.objects.filter(pk__in=ids["oferta"], school=school)
+    } if ids["oferta"] else {}
+    periodos = dict(
+        Periodo.objects.filter(pk__in=ids["periodo"]).values_list("id", "anio_id")
+    ) if ids["periodo"] else {}
+    cursos_est = dict(
+        Estudiante.objects.filter(pk__in=ids["estudiante"], school=school).values_list("id", "curso_id")
+    ) if ids["estudiante"] else {}
+
+    periodos_tocados = set(periodos)
+    periodos_tocados |= {a.logro.periodo_id for a in actividades.values()}
+    periodos_tocados |= {lg.periodo_id for lg in logros.values()}
+    cerrados = set(
+        CierrePeriodo.objects
+        .filter(school=school, cerrado=True, periodo_id__in=periodos_tocados)
+        .values_list("periodo_id", flat=True)
+    ) if periodos_tocados else set()
+
+    # ---- 3. validar pertenencia y agrupar por planilla ----
+    grupos = defaultdict(dict)   # (tipo, clave) -> {est_id: {campo: valor}}
+    cursos = {}                  # (tipo, clave) -> curso_id
+    celdas = defaultdict(list)   # (tipo, clave) -> [celda]
+    for tipo, clave, est_id, campo, valor, cambio in validos:
+        if tipo == "actividad":
+            act = actividades.get(clave)
+            if act is None:
+                _error(cambio, "Actividad no encontrada.")
+                continue
+            curso_id, periodo_id = act.logro.oferta.curso_id, act.logro.periodo_id
+        elif tipo == "logro":
+            lg = logros.get(clave)
+            if lg is None:
+                _error(cambio, "Logro no encontrado.")
+                continue
+            if lg.tipo == Logro.TIPO_HACER:
+                _error(cambio, "La nota de este logro se calcula con sus actividades.")
+                continue
+            curso_id, periodo_id = lg.oferta.curso_id, lg.periodo_id
+        else:
+            oferta = ofertas.get(clave[0])
+            if oferta is None or periodos.get(clave[1]) != oferta.anio_id:
+                _error(cambio, "Asignatura o período no encontrados.")
+                continue
+            curso_id, periodo_id = oferta.curso_id, clave[1]
+
+        if cursos_est.get(est_id) != curso_id:
+            _error(cambio, "El estudiante no pertenece a este curso.")
+            continue
+        if periodo_id in cerrados:
+            _error(cambio, "El período está cerrado: reábrelo para modificar notas.")
+            continue
+
+        grupos[(tipo, clave)].setdefault(est_id, {})[campo] = valor
+        cursos[(tipo, clave)] = curso_id
+        celdas[(tipo, clave)].append(cambio.get("celda"))
+
+    # ---- 4. escribir: una planilla por grupo, todo en una transacción ----
+    def _claves(tipo):
+        return [clave for (t, clave) in grupos if t == tipo]
+
+    estudiantes_ids = {est_id for filas in grupos.values() for est_id in filas}
+    recalculos = defaultdict(set)  # logro -> {est_id}
+    guardados = []
+
+    with transaction.atomic():
+        if _claves("actividad"):
+            existentes = defaultdict(dict)
+            for c in CalificacionActividad.objects.filter(
+                actividad_id__in=_claves("actividad"), estudiante_id__in=estudiantes_ids,
+            ):
+                existentes[c.actividad_id][c.estudiante_id] = c
+            for act_id in _claves("actividad"):
+                filas = grupos[("actividad", act_id)]
+                guardar_planilla(
+                    CalificacionActividad,
+                    {"actividad_id": act_id},
+                    existentes[act_id],
+                    {est_id: (None if v["nota"] is None else v) for est_id, v in filas.items()},
+                    campos=["nota"],
+                    unicos=["actividad", "estudiante"],
+                )
+                recalculos[actividades[act_id].logro] |= set(filas)
+                guardados += celdas[("actividad", act_id)]
+
+        if _claves("logro"):
+            existentes = defaultdict(dict)
+            for c in CalificacionLogro.objects.filter(
+                logro_id__in=_claves("logro"), estudiante_id__in=estudiantes_ids,
+            ):
+                existentes[c.logro_id][c.estudiante_id] = c
+            for logro_id in _claves("logro"):
+                filas = grupos[("logro", logro_id)]
+                guardar_planilla(
+                    CalificacionLogro,
+                    {"logro_id": logro_id},
+                    existentes[logro_id],
+                    {est_id: (None if v["nota"] is None else v) for est_id, v in filas.items()},
+                    campos=["nota"],
+                    unicos=["estudiante", "logro"],
+                    curso_id=cursos[("logro", logro_id)],
+                )
+                guardados += celdas[("logro", logro_id)]
+
+        if _claves("saber_ser"):
+            claves_ss = _claves("saber_ser")
+            existentes = defaultdict(dict)
+            for ss in SaberSer.objects.filter(
+                asignatura_oferta_id__in={o for o, _ in claves_ss},
+                periodo_id__in={p for _, p in claves_ss},
+                estudiante_id__in=estudiantes_ids,
+            ):
+                existentes[(ss.asignatura_oferta_id, ss.periodo_id)][ss.estudiante_id] = ss
+            campos_ss = list(DIMENSIONES_SABER_SER.values())
+            for clave in claves_ss:
+                oferta = ofertas[clave[0]]
+                nuevos = {}
+                for est_id, parche in grupos[("saber_ser", clave)].items():
+                    actual = existentes[clave].get(est_id)
+                    dims = {c: (getattr(actual, c) if actual else None) for c in campos_ss}
+                    dims.update(parche)
+                    # las tres dimensiones vacías -> se borra el registro, como en la planilla
+                    if all(v is None for v in dims.values()):
+                        nuevos[est_id] = None
+                    else:
+                        nuevos[est_id] = {"anio_id": oferta.anio_id, **dims}
+                guardar_planilla(
+                    SaberSer,
+                    {"asignatura_oferta_id": clave[0], "periodo_id": clave[1]},
+                    existentes[clave],
+                    nuevos,
+                    campos=["anio_id", *campos_ss],
+                    unicos=["estudiante", "periodo", "asignatura_oferta"],
+                    curso_id=oferta.curso_id,
+                )
+                guardados += celdas[("saber_ser", clave)]
+
+        for logro, ests in recalculos.items():
+            recalcular_notas_logro(logro, ests, curso_id=logro.oferta.curso_id)
+
+    # Notas de logro que cambiaron por las actividades, para refrescar la grilla
+    logros_recalculados = []
+    if recalculos:
+        filtro = Q()
+        for logro, ests in recalculos.items():
+            filtro |= Q(logro=logro, estudiante_id__in=ests)
+        notas = dict(
+            ((est_id, logro_id), nota)
+            for est_id, logro_id, nota in CalificacionLogro.objects.filter(filtro)
+            .values_list("estudiante_id", "logro_id", "nota")
+        )
+        for logro, ests in recalculos.items():
+            for est_id in sorted(ests):
+                nota = notas.get((est_id, logro.id))
+                logros_recalculados.append({
+                    "estudiante": est_id,
+                    "logro": logro.id,
+                    "nota": None if nota is None else str(nota),
+                })
+
+    return {"guardados": guardados, "errores": errores, "logros": logros_recalculados}
@@ -0,0 +1,380 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlparse, unquote
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from PIL import Image
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
+
+logger = logging.getLogger(__name__)
+
+# Límites de la caché en memoria (por proceso / worker)
+PDF_CACHE_MAX_BYTES = getattr(settings, "PDF_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+PDF_CACHE_MAX_IMAGENES = getattr(settings, "PDF_CACHE_MAX_IMAGENES", 256)
+
+# Imágenes de los PDF (logo, sello, fotos): se embeben copias a resolución de
+# impresión, no los archivos originales subidos.
+PDF_IMAGEN_MAX_PX = getattr(settings, "PDF_IMAGEN_MAX_PX", 500)  # ~4 cm a 300 dpi
+PDF_JPEG_CALIDAD = getattr(settings, "PDF_JPEG_CALIDAD", 85)
+PDF_DERIVADOS_DIR = getattr(
+    settings, "PDF_DERIVADOS_DIR", os.path.join(settings.MEDIA_ROOT, "pdf_derivados")
+)
+
+# Hojas de estilo de los PDF (rutas dentro de static/). Se parsean una sola
+# vez por proceso y se reutilizan en cada render.
+HOJAS_PDF = {
+    "boletin": "academico/pdf/boletin.css",
+    "consolidado": "academico/pdf/consolidado.css",
+    "certificado_estudiantil": "administrativo/pdf/certificado_estudiantil.css",
+    "certificado_notas": "administrativo/pdf/certificado_notas.css",
+}
+
+
+class _CacheArchivos:
+    """
+    Caché LRU de archivos locales (logo, sello, fotos, CSS) acotada por bytes.
+    La clave incluye mtime y tamaño: si el archivo cambia en disco, se relee.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def leer(self, ruta):
+        st = os.stat(ruta)
+        clave = (ruta, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                return self._datos[clave]
+
+        with open(ruta, "rb") as fh:
+            data = fh.read()
+
+        if len(data) > self.max_bytes:
+            return data
+
+        with self._lock:
+            if clave not in self._datos:
+                self._datos[clave] = data
+                self._total += len(data)
+            while self._total > self.max_bytes and self._datos:
+                _, viejo = self._datos.popitem(last=False)
+                self._total -= len(viejo)
+        return data
+
+
+class _CacheImagenes(dict):
+    """
+    Caché de imágenes ya decodificadas por WeasyPrint (parámetro ``cache``).
+
+    WeasyPrint guarda aquí referencias que usa hasta terminar de escribir el
+    PDF, así que no se puede expulsar nada a mitad de un render: se vacía
+    cuando ya no queda ningún render en curso en el proceso y pasó del tope.
+    Se vacía entera porque cada imagen ocupa dos claves (``url`` y los bytes
+    decodificados en ``'<id>-source-<dpi>'``): quitar una sin la otra deja
+    una imagen cuyos datos ya no están y el siguiente render falla.
+
+    Las URLs que apuntan al mismo archivo local (file://, /media/..., o
+    http://host/media/...) comparten clave: la imagen se decodifica una vez
+    y queda un solo objeto en el PDF aunque se use en varios lugares.
+    """
+
+    def __init__(self, max_items):
+        super().__init__()
+        self.max_items = max_items
+        self._activos = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, url):
+        return super().__contains__(_clave_imagen(url))
+
+    def __getitem__(self, url):
+        return super().__getitem__(_clave_imagen(url))
+
+    def __setitem__(self, url, valor):
+        super().__setitem__(_clave_imagen(url), valor)
+
+    def get(self, url, default=None):
+        return super().get(_clave_imagen(url), default)
+
+    def entrar(self):
+        with self._lock:
+            self._activos += 1
+
+    def salir(self):
+        with self._lock:
+            self._activos -= 1
+            if self._activos:
+                return
+            if len(self) > self.max_items:
+                self.clear()
+
+
+_cache_archivos = _CacheArchivos(PDF_CACHE_MAX_BYTES)
+_cache_imagenes = _CacheImagenes(PDF_CACHE_MAX_IMAGENES)
+
+
+def _hosts_locales():
+    return {h.lstrip(".").lower() for h in settings.ALLOWED_HOSTS}
+
+
+def _es_host_local(host):
+    if not host:
+        return True
+    hosts = _hosts_locales()
+    if "*" in hosts:
+        return True
+    host = host.lower()
+    return host in hosts or any(host.endswith("." + h) for h in hosts)
+
+
+def _dentro_de(base, rel):
+    """Une base + rel y evita salir del directorio (../)."""
+    base = os.path.realpath(base)
+    ruta = os.path.realpath(os.path.join(base, rel))
+    if ruta == base or not ruta.startswith(base + os.sep):
+        return None
+    return ruta
+
+
+def _buscar_static(rel):
+    """Ruta en disco de un archivo estático (finders en desarrollo, STATIC_ROOT en producción)."""
+    try:
+        ruta = finders.find(rel)
+    except SuspiciousFileOperation:
+        return None
+    if not ruta and getattr(settings, "STATIC_ROOT", None):
+        ruta = _dentro_de(settings.STATIC_ROOT, rel)
+    return ruta
+
+
+def ruta_local_de_url(url):
+    """
+    Traduce una URL de /static/ o /media/ (o un file://) a la ruta del archivo
+    en disco. Devuelve None si la URL no corresponde a un archivo local.
+    """
+    partes = urlparse(url)
+
+    if partes.scheme == "file":
+        ruta = unquote(partes.path)
+        # file:///E:/colegio/... en Windows
+        if os.name == "nt" and ruta.startswith("/") and ruta[2:3] == ":":
+            ruta = ruta[1:]
+        return ruta if os.path.isfile(ruta) else None
+
+    if partes.scheme not in ("http", "https", ""):
+        return None
+    if not _es_host_local(partes.hostname):
+        return None
+
+    path = unquote(partes.path)
+    ruta = None
+
+    media_url = settings.MEDIA_URL or ""
+    static_url = settings.STATIC_URL or ""
+
+    if media_url and path.startswith(media_url):
+        ruta = _dentro_de(settings.MEDIA_ROOT, path[len(media_url):])
+
+    elif static_url and path.startswith(static_url):
+        ruta = _buscar_static(path[len(static_url):])
+
+    if ruta and os.path.isfile(ruta):
+        return ruta
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _clave_imagen(url):
+    if not isinstance(url, str):
+        return url
+    ruta = ruta_local_de_url(url)
+    return ("archivo", os.path.realpath(ruta)) if ruta else url
+
+
+def _ruta_derivado(ruta, st):
+    clave = f"{os.path.realpath(ruta)}|{st.st_mtime_ns}|{st.st_size}|{PDF_IMAGEN_MAX_PX}|{PDF_JPEG_CALIDAD}"
+    return os.path.join(PDF_DERIVADOS_DIR, hashlib.sha1(clave.encode("utf-8")).hexdigest())
+
+
+def derivado_impresion(ruta):
+    """
+    Copia de la imagen ``ruta`` reducida a PDF_IMAGEN_MAX_PX de lado (JPEG si
+    no tiene transparencia, PNG con paleta si la tiene). Se genera una vez y
+    se guarda en PDF_DERIVADOS_DIR; si el original cambia, cambia la clave.
+    Devuelve la ruta original si no es una imagen que Pillow entienda o si
+    la copia no sale más liviana.
+    """
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return ruta
+    base = _ruta_derivado(ruta, st)
+
+    for ext in (".jpg", ".png"):
+        if os.path.exists(base + ext):
+            return base + ext
+    if os.path.exists(base + ".orig"):
+        return ruta
+
+    try:
+        with Image.open(ruta) as im:
+            im.load()
+            alfa = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+            im.thumbnail((PDF_IMAGEN_MAX_PX, PDF_IMAGEN_MAX_PX), Image.Resampling.LANCZOS)
+            if alfa:
+                # logos y sellos: paleta de 256 colores con transparencia
+                im = im.convert("RGBA").quantize(256, method=Image.Quantize.FASTOCTREE)
+                ext, opciones = ".png", {"format": "PNG", "optimize": True}
+            else:
+                im = im.convert("RGB")
+                ext, opciones = ".jpg", {"format": "JPEG", "quality": PDF_JPEG_CALIDAD, "optimize": True}
+
+            os.makedirs(PDF_DERIVADOS_DIR, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=PDF_DERIVADOS_DIR, suffix=ext)
+            with os.fdopen(fd, "wb") as fh:
+                im.save(fh, **opciones)
+            os.chmod(tmp, 0o644)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.info("Sin derivado de impresión para %s: %s", ruta, exc)
+        return ruta
+
+    if os.path.getsize(tmp) >= st.st_size:
+        # el original ya era liviano: se deja marcado para no reintentar
+        os.replace(tmp, base + ".orig")
+        return ruta
+
+    os.replace(tmp, base + ext)
+    return base + ext
+
+
+def url_fetcher_local(url, timeout=10, ssl_context=None):
+    """
+    url_fetcher para WeasyPrint: los recursos propios (/static/, /media/,
+    file://) se leen del disco en vez de pedirlos por HTTP al mismo servidor.
+    Lo demás se delega al fetcher por defecto.
+    """
+    ruta = ruta_local_de_url(url)
+    if ruta is None:
+        return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+
+    mime_type, _ = mimetypes.guess_type(ruta)
+    if mime_type is None or (mime_type.startswith("image/") and mime_type != "image/svg+xml"):
+        ruta = derivado_impresion(ruta)
+        mime_type, _ = mimetypes.guess_type(ruta)
+    return {
+        "string": _cache_archivos.leer(ruta),
+        "mime_type": mime_type,
+        "redirected_url": url,
+        "filename": os.path.basename(ruta),
+    }
+
+
+# Estado "caliente" del proceso: configuración de fuentes y CSS ya parseado
+_font_config = None
+_hojas = {}
+_lock_estado = threading.Lock()
+
+
+def _configuracion_fuentes():
+    global _font_config
+    with _lock_estado:
+        if _font_config is None:
+            _font_config = FontConfiguration()
+        return _font_config
+
+
+def _ruta_static(rel):
+    ruta = _buscar_static(rel)
+    if not ruta or not os.path.isfile(ruta):
+        raise FileNotFoundError(f"No se encontró la hoja de estilos '{rel}'.")
+    return ruta
+
+
+def hoja_css(nombre):
+    """CSS ya parseado de HOJAS_PDF (se vuelve a leer solo si cambió en disco)."""
+    ruta = _ruta_static(HOJAS_PDF[nombre])
+    mtime = os.stat(ruta).st_mtime_ns
+    font_config = _configuracion_fuentes()  # toma _lock_estado: antes del with
+    with _lock_estado:
+        actual = _hojas.get(nombre)
+        if actual and actual[0] == mtime:
+            return actual[1]
+
+        css = CSS(
+            filename=ruta,
+            url_fetcher=url_fetcher_local,
+            font_config=font_config,
+        )
+        _hojas[nombre] = (mtime, css)
+        return css
+
+
+def precalentar():
+    """Deja listas la configuración de fuentes y todas las hojas de HOJAS_PDF."""
+    _configuracion_fuentes()
+    for nombre in HOJAS_PDF:
+        hoja_css(nombre)
+
+
+def renderizar_local(html_string, base_url=None, hojas=(), destino=None):
+    """Render en este mismo proceso, reutilizando fuentes, CSS e imágenes."""
+    html = HTML(string=html_string, base_url=base_url, url_fetcher=url_fetcher_local)
+    _cache_imagenes.entrar()
+    try:
+        return html.write_pdf(
+            destino,
+            stylesheets=[hoja_css(h) for h in hojas],
+            font_config=_configuracion_fuentes(),
+            cache=_cache_imagenes,
+            # las imágenes ya llegan reducidas por url_fetcher_local; esto
+            # además las recomprime sin pérdida al incrustarlas
+            optimize_images=True,
+        )
+    finally:
+        _cache_imagenes.salir()
+
+
+def html_a_pdf(html_string, base_url=None, destino=None, hojas=()):
+    """
+    Renderiza HTML a PDF con el fetcher local, las hojas de estilo ``hojas``
+    (claves de HOJAS_PDF) y la caché de imágenes del worker.
+
+    Si está configurado ``PDF_SERVICIO_SOCKET`` el HTML se envía al servicio
+    de render persistente (ver academico/servicio_pdf.py); si no responde, se
+    renderiza aquí mismo salvo que ``PDF_SERVICIO_RESPALDO_LOCAL`` sea False
+    (entonces se propaga el error). Si el servicio responde pero falla con ese
+    HTML (ErrorRenderPDF) se propaga siempre: repetirlo aquí fallaría igual.
+
+    Si se pasa ``destino`` (archivo o HttpResponse) escribe allí y devuelve
+    None; si no, devuelve los bytes del PDF.
+    """
+    if getattr(settings, "PDF_SERVICIO_SOCKET", None):
+        from academico.servicio_pdf import ServicioPDFNoDisponible, renderizar_remoto
+
+        try:
+            pdf_bytes = renderizar_remoto(html_string, base_url=base_url, hojas=hojas)
+        except ServicioPDFNoDisponible as exc:
+            if not getattr(settings, "PDF_SERVICIO_RESPALDO_LOCAL", True):
+                raise
+            logger.warning("Servicio PDF no disponible (%s); se renderiza localmente.", exc)
+        else:
+            if destino is None:
+                return pdf_bytes
+            destino.write(pdf_bytes)
+            return None
+
+    return renderizar_local(html_string, base_url=base_url, hojas=hojas, destino=destino)
@@ -0,0 +1,406 @@
+"""
+Motor rápido de boletines en PDF (reportlab).
+
+Dibuja el boletín directamente sobre el canvas, página por página, a partir
+del mismo contexto que usa academico/boletin_estudiante_pdf.html (ver
+utils_boletin.contextos_boletin). No hay maquetación HTML/CSS ni "story" de
+flowables: cada boletín se pinta en cuanto llega su contexto y sus páginas
+quedan cerradas (comprimidas) antes de pasar al siguiente estudiante.
+
+Es el motor de los colegios con ``School.motor_pdf = "reportlab"``; el diseño
+es más sencillo que el de WeasyPrint pero con la misma información.
+"""
+import os
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+from academico.utils_pdf import derivado_impresion, ruta_local_de_url
+
+ANCHO, ALTO = A4
+MARGEN = 36
+ANCHO_UTIL = ANCHO - 2 * MARGEN
+
+FUENTE = "Helvetica"
+FUENTE_NEGRITA = "Helvetica-Bold"
+
+VERDE = colors.HexColor("#00796B")
+GRIS_AREA = colors.HexColor("#f2f2f2")
+AZUL_CLARO = colors.HexColor("#d7e3ff")
+
+# Columnas de la tabla de asignaturas: (título, ancho)
+COLUMNAS = [
+    ("ASIGNATURA", 120),
+    ("LOGROS DEL PERÍODO", ANCHO_UTIL - 120 - 5 * 37),
+    ("P1", 37),
+    ("P2", 37),
+    ("P3", 37),
+    ("PROM", 37),
+    ("DESEMP.", 37),
+]
+PAD = 3
+LEADING = 9
+# Alto libre para filas en una hoja de continuación (título + encabezado de tabla)
+ALTO_CONTINUACION = ALTO - 2 * MARGEN - 16 - 13
+
+
+def _fmt(valor, vacio="–"):
+    return vacio if valor is None or valor == "" else str(valor)
+
+
+def _ruta_imagen(url):
+    """Ruta en disco de logo/sello (URL absoluta de /static/ o /media/)."""
+    if not url:
+        return None
+    ruta = ruta_local_de_url(url)
+    return derivado_impresion(ruta) if ruta else None
+
+
+def _ruta_foto(estudiante):
+    foto = getattr(estudiante, "foto", None)
+    if not foto:
+        return None
+    try:
+        ruta = foto.path
+    except (AttributeError, NotImplementedError, ValueError):
+        return None
+    return derivado_impresion(ruta) if os.path.isfile(ruta) else None
+
+
+class _LienzoBoletines:
+    def __init__(self, destino):
+        self.c = canvas.Canvas(destino, pagesize=A4, pageCompression=1)
+        self.c.setTitle("Boletines")
+        self.y = ALTO - MARGEN
+        self._titulo_continuacion = ""
+
+    # ---------- utilidades ----------
+
+    def _texto(self, x, y, texto, tam=8, negrita=False, centro=None, derecha=None):
+        self.c.setFont(FUENTE_NEGRITA if negrita else FUENTE, tam)
+        if centro is not None:
+            self.c.drawCentredString(centro, y, texto)
+        elif derecha is not None:
+            self.c.drawRightString(derecha, y, texto)
+        else:
+            self.c.drawString(x, y, texto)
+
+    def _imagen(self, ruta, x, y, w, h):
+        if not ruta:
+            return
+        try:
+            self.c.drawImage(ruta, x, y, w, h, preserveAspectRatio=True, mask="auto")
+        except Exception:
+            # una imagen dañada no debe tumbar el lote completo
+            pass
+
+    def _nueva_pagina(self):
+        self.c.showPage()
+        self.y = ALTO - MARGEN
+        if self._titulo_continuacion:
+            self._texto(MARGEN, self.y - 8, self._titulo_continuacion, tam=8, negrita=True)
+            self.y -= 16
+
+    def _reservar(self, alto, encabezado_tabla=False):
+        """Salta de página si no cabe un bloque de ``alto`` puntos."""
+        if self.y - alto < MARGEN:
+            self._nueva_pagina()
+            if encabezado_tabla:
+                self._encabezado_tabla()
+
+    # ---------- secciones ----------
+
+    def _encabezado(self, ctx):
+        c = self.c
+        colegio = ctx.get("colegio")
+        top = self.y
+
+        self._imagen(_ruta_imagen(ctx.get("logo_url")), MARGEN, top - 62, 60, 60)
+
+        foto = _ruta_foto(ctx.get("estudiante"))
+        if foto:
+            self._imagen(foto, ANCHO - MARGEN - 52, top - 66, 52, 64)
+        else:
+            c.rect(ANCHO - MARGEN - 48, top - 66, 48, 64)
+            self._texto(0, top - 36, "Sin foto", tam=6, centro=ANCHO - MARGEN - 24)
+
+        centro = ANCHO / 2
+        nombre = getattr(colegio, "nombre", None) or "CENTRO EDUCATIVO GIN GABI"
+        lema = getattr(colegio, "lema", None) or "EDUCAMOS CON AMOR A QUIENES CONSTRUIRÁN EL MAÑANA"
+        resolucion = getattr(colegio, "resolucion", None) or "Resolución de aprobación N°1358 - 1240"
+        self._texto(0, top - 14, nombre, tam=12, negrita=True, centro=centro)
+        self._texto(0, top - 25, f'"{lema}"', tam=7, centro=centro)
+        self._texto(0, top - 34, resolucion, tam=6.5, centro=centro)
+
+        titulo = f"{_fmt(getattr(ctx.get('periodo'), 'nombre', ''), '')} – REGISTRO ESCOLAR VALORATIVO".upper()
+        c.setFont(FUENTE_NEGRITA, 9)
+        w = c.stringWidth(titulo, FUENTE_NEGRITA, 9)
+        c.setFillColor(colors.yellow)
+        c.rect(centro - w / 2 - 3, top - 51, w + 6, 12, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.drawCentredString(centro, top - 48, titulo)
+
+        c.setFillColor(VERDE)
+        c.rect(MARGEN, top - 74, ANCHO_UTIL, 3, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        self.y = top - 80
+
+    def _datos_estudiante(self, ctx):
+        est = ctx.get("estudiante")
+        curso = ctx.get("curso")
+        anio = ctx.get("anio")
+        alto = 28
+        top = self.y
+        self.c.rect(MARGEN, top - alto, ANCHO_UTIL, alto)
+
+        nombre = f"{_fmt(getattr(est, 'nombres', ''), '')} {_fmt(getattr(est, 'apellidos', ''), '')}".strip()
+        self._texto(MARGEN + 4, top - 11, "ESTUDIANTE:", tam=7, negrita=True)
+        self._texto(MARGEN + 56, top - 11, nombre.upper(), tam=8)
+        self._texto(MARGEN + 330, top - 11, "DOCUMENTO:", tam=7, negrita=True)
+        self._texto(MARGEN + 380, top - 11, _fmt(getattr(est, "identificacion", "")), tam=8)
+
+        grado = f"{_fmt(getattr(curso, 'grado', ''), '')} {_fmt(getattr(curso, 'nombre', ''), '')}".strip()
+        self._texto(MARGEN + 4, top - 23, "GRADO:", tam=7, negrita=True)
+        self._texto(MARGEN + 56, top - 23, grado, tam=8)
+        self._texto(MARGEN + 330, top - 23, "AÑO LECTIVO:", tam=7, negrita=True)
+        self._texto(MARGEN + 390, top - 23, _fmt(getattr(anio, "nombre", "")), tam=8)
+        self.y = top - alto - 8
+
+    def _encabezado_tabla(self):
+        c = self.c
+        alto = 13
+        top = self.y
+        c.setFillColor(VERDE)
+        c.rect(MARGEN, top - alto, ANCHO_UTIL, alto, stroke=0, fill=1)
+        c.setFillColor(colors.white)
+        x = MARGEN
+        for titulo, ancho in COLUMNAS:
+            self._texto(0, top - 9.5, titulo, tam=6.5, negrita=True, centro=x + ancho / 2)
+            x += ancho
+        c.setFillColor(colors.black)
+        self.y = top - alto
+
+    def _fila_area(self, nombre):
+        alto = 12
+        self._reservar(alto + 24, encabezado_tabla=True)
+        top = self.y
+        self.c.setFillColor(GRIS_AREA)
+        self.c.rect(MARGEN, top - alto, ANCHO_UTIL, alto, stroke=1, fill=1)
+        self.c.setFillColor(colors.black)
+        self._texto(MARGEN + PAD, top - 8.5, (nombre or "").upper(), tam=7, negrita=True)
+        self.y = top - alto
+
+    def _fila_asignatura(self, fila, resumen):
+        ancho_asig = COLUMNAS[0][1]
+        ancho_logros = COLUMNAS[1][1]
+
+        # (texto, negrita): nombre de la asignatura y, debajo, el docente
+        lineas_asig = [
+            (linea, True)
+            for linea in simpleSplit(fila["asignatura"], FUENTE_NEGRITA, 7, ancho_asig - 2 * PAD)
+        ]
+        docente = fila.get("docente")
+        if docente:
+            lineas_asig += [(linea, False) for linea in simpleSplit(docente, FUENTE, 6, ancho_asig - 2 * PAD)]
+
+        # (texto, nota): la nota va en el primer renglón de cada logro
+        lineas_logros = []
+        for d in fila.get("detalle") or []:
+            texto = f"{d['titulo']} ({_fmt(d.get('peso'))}%)"
+            lineas = simpleSplit(texto, FUENTE, 6.5, ancho_logros - 2 * PAD - 26) or [""]
+            lineas_logros.append((lineas[0], _fmt(d.get("nota"))))
+            lineas_logros += [(linea, "") for linea in lineas[1:]]
+        if not lineas_logros:
+            lineas_logros.append(("Sin logros configurados para este período.", ""))
+
+        resumen = resumen or {}
+        valores = [
+            _fmt(resumen.get("p1")),
+            _fmt(resumen.get("p2")),
+            _fmt(resumen.get("p3")),
+            _fmt(resumen.get("prom_final")),
+            _fmt(resumen.get("letra_final") or fila.get("letra")),
+        ]
+
+        alto = max(len(lineas_asig), len(lineas_logros)) * LEADING + 2 * PAD
+        if alto <= ALTO_CONTINUACION:
+            # cabe en una hoja: nunca se parte
+            self._reservar(alto, encabezado_tabla=True)
+            self._tramo_asignatura(lineas_asig, lineas_logros, valores)
+            return
+
+        # Más alta que una hoja (muchos logros): los logros siguen en las
+        # hojas siguientes, repitiendo el nombre de la asignatura.
+        asig = lineas_asig
+        por_hoja = int((ALTO_CONTINUACION - 2 * PAD) // LEADING)
+        while lineas_logros:
+            caben = int((self.y - MARGEN - 2 * PAD) // LEADING)
+            if caben < min(max(len(asig), min(len(lineas_logros), 3)), por_hoja):
+                self._nueva_pagina()
+                self._encabezado_tabla()
+                continue
+            tramo, lineas_logros = lineas_logros[:caben], lineas_logros[caben:]
+            self._tramo_asignatura(asig[:caben], tramo, valores)
+            asig = [(f"{fila['asignatura']} (cont.)", True)]
+
+    def _tramo_asignatura(self, lineas_asig, lineas_logros, valores):
+        """Dibuja una fila de asignatura (o el tramo que cabe en esta hoja)."""
+        c = self.c
+        ancho_asig = COLUMNAS[0][1]
+        ancho_logros = COLUMNAS[1][1]
+        alto = max(len(lineas_asig), len(lineas_logros)) * LEADING + 2 * PAD
+        top = self.y
+
+        # bordes de la fila
+        c.rect(MARGEN, top - alto, ANCHO_UTIL, alto)
+        x = MARGEN
+        for _, ancho in COLUMNAS[:-1]:
+            x += ancho
+            c.line(x, top, x, top - alto)
+
+        # asignatura + docente
+        y = top - PAD - 7
+        for linea, negrita in lineas_asig:
+            self._texto(MARGEN + PAD, y, linea, tam=7 if negrita else 6, negrita=negrita)
+            y -= LEADING
+
+        # logros con su nota a la derecha
+        x_logros = MARGEN + ancho_asig
+        y = top - PAD - 7
+        for linea, nota in lineas_logros:
+            if nota:
+                self._texto(0, y, nota, tam=7, negrita=True, derecha=x_logros + ancho_logros - PAD)
+            self._texto(x_logros + PAD, y, linea, tam=6.5)
+            y -= LEADING
+
+        # consolidado del trimestre
+        x = x_logros + ancho_logros
+        y_centro = top - alto / 2 - 2.5
+        c.setFillColor(AZUL_CLARO)
+        c.rect(x + 3 * COLUMNAS[2][1], top - alto, COLUMNAS[5][1], alto, stroke=1, fill=1)
+        c.setFillColor(colors.black)
+        for (_, ancho), valor in zip(COLUMNAS[2:], valores):
+            self._texto(0, y_centro, valor, tam=7.5, negrita=True, centro=x + ancho / 2)
+            x += ancho
+
+        self.y = top - alto
+
+    def _observacion_y_asistencia(self, ctx):
+        obs = ctx.get("obs_general")
+        texto = obs.get("texto") if isinstance(obs, dict) else getattr(obs, "texto", None)
+        lineas = simpleSplit(texto or "Sin observaciones.", FUENTE, 7, ANCHO_UTIL - 2 * PAD)
+        alto = 14 + len(lineas) * LEADING + 18
+        self._reservar(alto + 8)
+        self.y -= 8
+        top = self.y
+
+        self._texto(MARGEN, top - 9, "OBSERVACIONES GENERALES", tam=8, negrita=True)
+        y = top - 20
+        for linea in lineas:
+            self._texto(MARGEN + PAD, y, linea, tam=7)
+            y -= LEADING
+
+        y -= 4
+        self._texto(MARGEN, y, "INASISTENCIAS DEL PERÍODO:", tam=7, negrita=True)
+        self._texto(MARGEN + 118, y, _fmt(ctx.get("total_fallas_periodo"), "0"), tam=7)
+        self._texto(MARGEN + 160, y, "TARDANZAS:", tam=7, negrita=True)
+        self._texto(MARGEN + 210, y, _fmt(ctx.get("total_tardanzas_periodo"), "0"), tam=7)
+        self.y = y - 8
+
+    def _promedios(self, ctx):
+        c = self.c
+        alto = 3 * 12
+        self._reservar(alto + 20)
+        top = self.y
+        self._texto(MARGEN, top - 9, "PROMEDIOS GENERALES", tam=8, negrita=True)
+        top -= 14
+
+        proms = list(ctx.get("promedios_trimestre") or []) + [None, None, None]
+        grupos = [
+            ("1 Trimestre", proms[0], ctx.get("puesto_p1")),
+            ("2 Trimestre", proms[1], ctx.get("puesto_p2")),
+            ("3 Trimestre", proms[2], ctx.get("puesto_p3")),
+            ("Acumulado final", ctx.get("promedio_anual"), ctx.get("puesto_final")),
+        ]
+        ancho_grupo = ANCHO_UTIL / 4
+        c.setFillColor(GRIS_AREA)
+        c.rect(MARGEN, top - 24, ANCHO_UTIL, 24, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.rect(MARGEN, top - alto, ANCHO_UTIL, alto)
+        c.line(MARGEN, top - 12, MARGEN + ANCHO_UTIL, top - 12)
+        c.line(MARGEN, top - 24, MARGEN + ANCHO_UTIL, top - 24)
+
+        for i, (titulo, prom, puesto) in enumerate(grupos):
+            x = MARGEN + i * ancho_grupo
+            mitad = ancho_grupo / 2
+            if i:
+                c.line(x, top, x, top - alto)
+            c.line(x + mitad, top - 12, x + mitad, top - alto)
+            self._texto(0, top - 9, titulo, tam=7, negrita=True, centro=x + mitad)
+            self._texto(0, top - 21, "Promedio", tam=6.5, negrita=True, centro=x + mitad / 2)
+            self._texto(0, top - 21, "Puesto", tam=6.5, negrita=True, centro=x + mitad * 1.5)
+            self._texto(0, top - 33, _fmt(prom, "N.A."), tam=7.5, centro=x + mitad / 2)
+            self._texto(0, top - 33, _fmt(puesto, "N.A."), tam=7.5, centro=x + mitad * 1.5)
+
+        self.y = top - alto - 10
+
+    def _firmas(self, ctx):
+        c = self.c
+        alto = 70
+        self._reservar(alto)
+        base = self.y - alto + 14
+        ancho_firma = ANCHO_UTIL * 0.4
+
+        for x0, nombre, cargo in (
+            (MARGEN, ctx.get("docente_nombre") or "DOCENTE", "DOCENTE"),
+            (MARGEN + ANCHO_UTIL - ancho_firma, ctx.get("rector_nombre") or "RECTOR(A)", "RECTOR(A)"),
+        ):
+            centro = x0 + ancho_firma / 2
+            self._texto(0, base + 4, nombre, tam=7.5, negrita=True, centro=centro)
+            c.line(x0 + 10, base, x0 + ancho_firma - 10, base)
+            self._texto(0, base - 9, cargo, tam=6.5, centro=centro)
+
+        self._imagen(_ruta_imagen(ctx.get("sello_url")), ANCHO / 2 - 28, base - 10, 56, 56)
+        self.y = base - 20
+
+    # ---------- boletín completo ----------
+
+    def boletin(self, ctx):
+        est = ctx.get("estudiante")
+        nombre = f"{_fmt(getattr(est, 'apellidos', ''), '')} {_fmt(getattr(est, 'nombres', ''), '')}".strip()
+        self._titulo_continuacion = f"Boletín de {nombre} (continuación)"
+
+        self._encabezado(ctx)
+        self._datos_estudiante(ctx)
+        self._encabezado_tabla()
+
+        resumen_por_asig = ctx.get("resumen_por_asig") or {}
+        for area in ctx.get("areas") or []:
+            self._fila_area(area["nombre"])
+            for fila in area["filas"]:
+                self._fila_asignatura(fila, resumen_por_asig.get(fila["asignatura"]))
+
+        self._observacion_y_asistencia(ctx)
+        self._promedios(ctx)
+        self._firmas(ctx)
+
+        # cada estudiante cierra sus páginas y el siguiente empieza en hoja nueva
+        self.c.showPage()
+        self.y = ALTO - MARGEN
+
+    def guardar(self):
+        self.c.save()
+
+
+def boletines_pdf_rapido(contextos, destino):
+    """
+    Dibuja un boletín por cada contexto de ``contextos`` (iterable; puede ser
+    un generador) y escribe el PDF en ``destino`` (archivo, BytesIO o
+    HttpResponse).
+    """
+    lienzo = _LienzoBoletines(destino)
+    for ctx in contextos:
+        lienzo.boletin(ctx)
+    lienzo.guardar()
@@ -0,0 +1,371 @@
+"""
+Planillas de notas en Excel (.xlsx).
+
+Formato: una fila de encabezados con "Identificación" y "Estudiante" y luego
+una columna por actividad o por logro de nota directa, identificada por un
+código al final del encabezado: "Taller 1 [A12]" (actividad 12), "Saber ser
+[L9]" (logro 9). Debajo, una fila por estudiante. Las filas anteriores al
+encabezado (títulos) se ignoran, igual que las columnas sin código.
+
+La lectura usa openpyxl en modo read_only (recorre las filas sin cargar el
+libro en memoria) y la escritura en modo write_only (las filas van directo al
+archivo). La exportación escribe este mismo formato, así que se puede editar
+y volver a importar.
+
+También escribe el consolidado del curso (escribir_consolidado_xlsx) y la
+matriz de asistencia (escribir_asistencia_xlsx).
+"""
+import re
+from collections import defaultdict
+from decimal import Decimal
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from academico.models import CalificacionActividad, CalificacionLogro, Logro
+from academico.utils_notas import _parse_nota
+
+COLUMNA_IDENTIFICACION = "Identificación"
+COLUMNA_ESTUDIANTE = "Estudiante"
+
+# Filas que se revisan buscando el encabezado
+FILAS_ENCABEZADO = 10
+
+_CODIGO = re.compile(r"\[([AL])(\d+)\]\s*$")
+
+
+def codigo_actividad(actividad):
+    return f"{actividad.titulo} [A{actividad.id}]"
+
+
+def codigo_logro(logro):
+    return f"{logro.titulo} [L{logro.id}]"
+
+
+def _texto(valor):
+    """Celda a texto: 1012345678.0 -> '1012345678'."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _es_identificacion(valor):
+    texto = _texto(valor).lower()
+    return texto in ("identificación", "identificacion")
+
+
+def leer_notas_xlsx(archivo, estudiantes, actividades, logros):
+    """
+    Lee la planilla y la compara con lo guardado.
+
+    ``actividades``: actividades (con su logro) que el archivo puede traer;
+    ``logros``: logros de la planilla. Las columnas de logros HACER (nota
+    calculada, como en la exportación) se ignoran. Las celdas vacías no se
+    tocan.
+
+    Devuelve {"cambios": [formato de aplicar_cambios_notas], "diferencias":
+    [...], "errores": [{"fila", "columna", "error"}], "avisos": [...],
+    "sin_cambio": n}.
+    """
+    por_identificacion = {e.identificacion.strip(): e for e in estudiantes}
+    actividades = {a.id: a for a in actividades}
+    logros = {lg.id: lg for lg in logros}
+
+    resultado = {"cambios": [], "diferencias": [], "errores": [], "avisos": [], "sin_cambio": 0}
+    errores, avisos = resultado["errores"], resultado["avisos"]
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+
+        # ---- encabezado ----
+        encabezado = None
+        for numero, fila in enumerate(filas, start=1):
+            if fila and any(_es_identificacion(v) for v in fila):
+                encabezado = fila
+                break
+            if numero >= FILAS_ENCABEZADO:
+                break
+        if encabezado is None:
+            errores.append({"fila": None, "columna": None, "error": f'No se encontró la columna "{COLUMNA_IDENTIFICACION}".'})
+            return resultado
+
+        col_id = next(i for i, v in enumerate(encabezado) if _es_identificacion(v))
+        columnas = []   # (índice, tipo, objeto, título)
+        for i, titulo in enumerate(encabezado):
+            m = _CODIGO.search(_texto(titulo))
+            if not m:
+                continue
+            tipo, obj_id = m.group(1), int(m.group(2))
+            if tipo == "A" and obj_id in actividades:
+                columnas.append((i, "actividad", actividades[obj_id], _texto(titulo)))
+            elif tipo == "L" and obj_id in logros:
+                if logros[obj_id].tipo == Logro.TIPO_HACER:
+                    avisos.append(f'"{_texto(titulo)}": nota calculada con las actividades, se ignora.')
+                else:
+                    columnas.append((i, "logro", logros[obj_id], _texto(titulo)))
+            else:
+                avisos.append(f'"{_texto(titulo)}" no pertenece a esta planilla, se ignora.')
+        if not columnas:
+            errores.append({"fila": None, "columna": None, "error": "El archivo no tiene columnas de actividades o logros de esta planilla."})
+            return resultado
+
+        # ---- filas de estudiantes ----
+        leidas = []     # (fila, estudiante, tipo, objeto, título, valor)
+        vistos = {}
+        for numero, fila in enumerate(filas, start=numero + 1):
+            if not fila or col_id >= len(fila):
+                continue
+            identificacion = _texto(fila[col_id])
+            if not identificacion:
+                continue
+            est = por_identificacion.get(identificacion)
+            if est is None:
+                errores.append({"fila": numero, "columna": COLUMNA_IDENTIFICACION, "error": f"{identificacion}: no es estudiante de este curso."})
+                continue
+            if est.id in vistos:
+                errores.append({"fila": numero, "columna": COLUMNA_IDENTIFICACION, "error": f"{identificacion}: repetido (ya está en la fila {vistos[est.id]})."})
+                continue
+            vistos[est.id] = numero
+
+            for i, tipo, obj, titulo in columnas:
+                raw = fila[i] if i < len(fila) else None
+                if _texto(raw) == "":
+                    continue
+                valor, error = _parse_nota(raw)
+                if error:
+                    errores.append({"fila": numero, "columna": titulo, "error": error})
+                    continue
+                leidas.append((numero, est, tipo, obj, titulo, valor))
+    finally:
+        libro.close()
+
+    # ---- comparar con lo guardado (una consulta por tabla) ----
+    ids_est = {est.id for _, est, *_ in leidas}
+    actuales = {}
+    ids_act = {obj.id for _, _, tipo, obj, *_ in leidas if tipo == "actividad"}
+    if ids_act:
+        for act_id, est_id, nota in CalificacionActividad.objects.filter(
+            actividad_id__in=ids_act, estudiante_id__in=ids_est,
+        ).values_list("actividad_id", "estudiante_id", "nota"):
+            actuales[("actividad", act_id, est_id)] = nota
+    ids_logro = {obj.id for _, _, tipo, obj, *_ in leidas if tipo == "logro"}
+    if ids_logro:
+        for logro_id, est_id, nota in CalificacionLogro.objects.filter(
+            logro_id__in=ids_logro, estudiante_id__in=ids_est,
+        ).values_list("logro_id", "estudiante_id", "nota"):
+            actuales[("logro", logro_id, est_id)] = nota
+
+    for numero, est, tipo, obj, titulo, valor in leidas:
+        antes = actuales.get((tipo, obj.id, est.id))
+        if antes is not None and Decimal(antes) == valor:
+            resultado["sin_cambio"] += 1
+            continue
+        resultado["cambios"].append({
+            "celda": f"{tipo}_{obj.id}_{est.id}",
+            "estudiante": est.id,
+            tipo: obj.id,
+            "valor": str(valor),
+        })
+        resultado["diferencias"].append({
+            "fila": numero,
+            "estudiante": f"{est.apellidos} {est.nombres}",
+            "identificacion": est.identificacion,
+            "columna": titulo,
+            "antes": antes,
+            "despues": valor,
+        })
+    return resultado
+
+
+# ----------------- exportación -----------------
+
+_NEGRITA = Font(bold=True)
+_TITULO = Font(bold=True, size=13)
+_FONDO_ENCABEZADO = PatternFill("solid", fgColor="E2E8F0")
+_FONDO_CALCULADA = PatternFill("solid", fgColor="F1F5F9")
+_AJUSTAR = Alignment(wrap_text=True, vertical="top")
+
+
+def _celda(hoja, valor, font=None, fill=None, formato=None, alineacion=None):
+    celda = WriteOnlyCell(hoja, value=valor)
+    if font:
+        celda.font = font
+    if fill:
+        celda.fill = fill
+    if alineacion:
+        celda.alignment = alineacion
+    if formato:
+        celda.number_format = formato
+    return celda
+
+
+def escribir_notas_xlsx(destino, titulo, estudiantes, logros, actividades, plantilla=False):
+    """
+    Escribe la planilla (estudiantes × logros × actividades) en ``destino``.
+
+    Las notas se leen con dos consultas (actividades y logros) sin importar el
+    tamaño de la planilla. Con ``plantilla=True`` sale sólo la estructura:
+    estudiantes y columnas importables, sin notas ni columnas calculadas.
+    """
+    por_logro = defaultdict(list)
+    for act in actividades:
+        por_logro[act.logro_id].append(act)
+
+    # columnas: (encabezado, tipo, objeto, calculada)
+    columnas = []
+    for logro in logros:
+        if logro.tipo == Logro.TIPO_HACER:
+            for act in por_logro[logro.id]:
+                columnas.append((codigo_actividad(act), "actividad", act, False))
+            if not plantilla:
+                columnas.append((f"Nota {codigo_logro(logro)}", "logro", logro, True))
+        else:
+            columnas.append((codigo_logro(logro), "logro", logro, False))
+
+    notas = {}
+    if not plantilla:
+        ids_est = [e.id for e in estudiantes]
+        for act_id, est_id, nota in CalificacionActividad.objects.filter(
+            actividad__in=actividades, estudiante_id__in=ids_est,
+        ).values_list("actividad_id", "estudiante_id", "nota"):
+            notas[("actividad", act_id, est_id)] = nota
+        for logro_id, est_id, nota in CalificacionLogro.objects.filter(
+            logro__in=logros, estudiante_id__in=ids_est,
+        ).values_list("logro_id", "estudiante_id", "nota"):
+            notas[("logro", logro_id, est_id)] = nota
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Notas")
+    hoja.column_dimensions["A"].width = 16
+    hoja.column_dimensions["B"].width = 34
+    for i in range(len(columnas)):
+        hoja.column_dimensions[get_column_letter(i + 3)].width = 18
+    hoja.freeze_panes = "C4"
+
+    hoja.append([_celda(hoja, titulo, font=_TITULO)])
+    hoja.append([_celda(
+        hoja,
+        "No cambies los encabezados: el código entre corchetes identifica la columna al importar.",
+        font=Font(italic=True, color="64748B"),
+    )])
+    hoja.append(
+        [_celda(hoja, COLUMNA_IDENTIFICACION, font=_NEGRITA, fill=_FONDO_ENCABEZADO),
+         _celda(hoja, COLUMNA_ESTUDIANTE, font=_NEGRITA, fill=_FONDO_ENCABEZADO)]
+        + [
+            _celda(hoja, encabezado, font=_NEGRITA, fill=_FONDO_ENCABEZADO, alineacion=_AJUSTAR)
+            for encabezado, *_ in columnas
+        ]
+    )
+
+    for est in estudiantes:
+        fila = [est.identificacion, f"{est.apellidos} {est.nombres}"]
+        for _, tipo, obj, calculada in columnas:
+            nota = notas.get((tipo, obj.id, est.id))
+            fila.append(_celda(
+                hoja,
+                float(nota) if nota is not None else None,
+                fill=_FONDO_CALCULADA if calculada else None,
+                formato="0.00",
+            ))
+        hoja.append(fila)
+
+    libro.save(destino)
+
+
+_FONDO_PERDIDA = PatternFill("solid", fgColor="FEE2E2")
+
+
+def escribir_consolidado_xlsx(destino, titulo, consolidado):
+    """Consolidado del curso (ver utils_boletin.consolidado_curso) en una hoja."""
+    periodos = consolidado["periodos"]
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Consolidado")
+    hoja.column_dimensions["A"].width = 5
+    hoja.column_dimensions["B"].width = 16
+    hoja.column_dimensions["C"].width = 34
+    hoja.freeze_panes = "D4"
+
+    def encabezado(valor):
+        return _celda(hoja, valor, font=_NEGRITA, fill=_FONDO_ENCABEZADO, alineacion=_AJUSTAR)
+
+    def nota(valor, fill=None):
+        return _celda(hoja, float(valor) if valor is not None else None, fill=fill, formato="0.00")
+
+    hoja.append([_celda(hoja, titulo, font=_TITULO)])
+
+    # dos filas de encabezado: asignatura y, debajo, sus períodos + final
+    fila_asig = [encabezado(""), encabezado(""), encabezado("")]
+    fila_per = [encabezado("#"), encabezado(COLUMNA_IDENTIFICACION), encabezado(COLUMNA_ESTUDIANTE)]
+    for asignatura in consolidado["asignaturas"]:
+        fila_asig += [encabezado(asignatura)] + [encabezado("") for _ in periodos]
+        fila_per += [encabezado(p) for p in periodos] + [encabezado("Final")]
+    fila_asig += [encabezado("Promedio")] + [encabezado("") for _ in periodos] + [encabezado(""), encabezado("")]
+    fila_per += [encabezado(p) for p in periodos] + [encabezado("Anual"), encabezado("Puesto"), encabezado("Perdidas")]
+    hoja.append(fila_asig)
+    hoja.append(fila_per)
+
+    for numero, fila in enumerate(consolidado["filas"], start=1):
+        celdas = [numero, fila["identificacion"], fila["nombre"]]
+        for n in fila["notas"]:
+            celdas += [nota(v) for v in n["periodos"]]
+            celdas.append(nota(n["final"], fill=_FONDO_PERDIDA if n["perdida"] else _FONDO_CALCULADA))
+        celdas += [nota(v) for v in fila["promedios"]]
+        celdas += [nota(fila["promedio"]), fila["puesto"], fila["perdidas"]]
+        hoja.append(celdas)
+
+    pie = [None, None, _celda(hoja, "Promedio del curso", font=_NEGRITA)]
+    for promedio in consolidado["promedios_asignatura"]:
+        pie += [None for _ in periodos] + [nota(promedio)]
+    hoja.append(pie)
+
+    libro.save(destino)
+
+
+_FONDO_ESTADO = {
+    "A": PatternFill("solid", fgColor="FEE2E2"),
+    "J": PatternFill("solid", fgColor="E0F2FE"),
+    "T": PatternFill("solid", fgColor="FEF3C7"),
+}
+
+
+def escribir_asistencia_xlsx(destino, titulo, columnas, filas, totales_fecha):
+    """Matriz de asistencia (ver utils_asistencia.matriz_asistencia) en una hoja."""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Asistencia")
+    hoja.column_dimensions["A"].width = 16
+    hoja.column_dimensions["B"].width = 34
+    for i in range(len(columnas)):
+        hoja.column_dimensions[get_column_letter(i + 3)].width = 7
+    hoja.freeze_panes = "C3"
+
+    def encabezado(valor):
+        return _celda(hoja, valor, font=_NEGRITA, fill=_FONDO_ENCABEZADO, alineacion=_AJUSTAR)
+
+    hoja.append([_celda(hoja, titulo, font=_TITULO)])
+    hoja.append(
+        [encabezado(COLUMNA_IDENTIFICACION), encabezado(COLUMNA_ESTUDIANTE)]
+        + [encabezado(p.fecha.strftime("%d/%m")) for p in columnas]
+        + [encabezado("Fallas"), encabezado("Tardanzas"), encabezado("Excusas")]
+    )
+
+    for fila in filas:
+        est = fila["estudiante"]
+        hoja.append(
+            [est.identificacion, f"{est.apellidos} {est.nombres}"]
+            + [_celda(hoja, c or "P", fill=_FONDO_ESTADO.get(c)) for c in fila["celdas"]]
+            + [fila["fallas"], fila["tardanzas"], fila["justificadas"]]
+        )
+
+    for etiqueta, campo in (("Fallas", "fallas"), ("Tardanzas", "tardanzas"),
+                            ("Excusas", "justificadas"), ("Presentes", "presentes")):
+        hoja.append(
+            [None, _celda(hoja, etiqueta, font=_NEGRITA)]
+            + [t[campo] for t in totales_fecha]
+        )
+
+    libro.save(destino)
@@ -4,49 +4,115 @@ from django.core.paginator import Paginator
 from urllib.parse import urlencode
 from django.db.models import Q, Prefetch, Sum, Avg, Count
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import slugify
 from django.contrib import messages
 from decimal import Decimal, InvalidOperation
-from django.http import HttpResponse
+from functools import wraps
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
-from weasyprint import HTML
 from django.templatetags.static import static
 from django.contrib.auth.models import User, Group
 from django.db import transaction
-from academico.utils_notas import recalcular_nota_logro_desde_actividades
+from academico.utils_notas import aplicar_cambios_notas, guardar_planilla, recalcular_notas_logro
+from academico.utils_asistencia import (
+    ASISTENCIA_UMBRAL_FALLAS, ESTADOS_ASISTENCIA, alertas_inasistencia, contadores_periodo,
+    csv_asistencia, guardar_asistencia, matriz_asistencia, totales_anio,
+)
+from academico.utils_captura import aplicar_operaciones, errores_de_formato
+from academico.utils_ingreso import pendientes, periodo_ingreso, registrar_llegada, vaciar_cola
+from academico.utils_xlsx import (
+    escribir_asistencia_xlsx, escribir_consolidado_xlsx, escribir_notas_xlsx, leer_notas_xlsx,
+)
+from academico.utils_pdf import html_a_pdf
+from academico.servicio_pdf import ErrorRenderPDF, ServicioPDFNoDisponible
+from academico.utils_pdf_rapido import boletines_pdf_rapido
+from academico.utils_boletin import (
+    DatosNotasCurso, areas_estudiante, cerrar_periodo, consolidado_curso, contexto_desde_snapshot,
+    contextos_boletin, guardar_observaciones, periodo_cerrado, puestos_curso, reabrir_periodo,
+    resumen_estudiante, snapshot_boletin,
+)
+from academico.utils_cache import BOLETIN_CACHE_TIMEOUT, clave_notas_curso, invalidar_notas_curso, version_portal
 from django.conf import settings
 from academico.utils import crear_usuario_estudiante, crear_usuario_docente
 import os
-from cartera.utils import estudiante_tiene_deuda_bloqueante, resumen_cartera_para_boletin
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+from cartera.utils import (
+    estado_cartera_estudiantes, estudiante_tiene_deuda_bloqueante, resumen_cartera_para_boletin,
+)
 from datetime import date
 from .models import (
     Estudiante, Curso, Docente, AnioLectivo, Periodo,
     Logro, AsignaturaOferta, AsignaturaCatalogo, CalificacionLogro, Observador, ObservacionBoletin, PaseLista,
-    AsistenciaDetalle, BloqueHorario, Actividad, CalificacionActividad, SaberSer
+    AsistenciaDetalle, BloqueHorario, Actividad, CalificacionActividad, SaberSer,
+    BoletinSnapshot, CierrePeriodo,
 )
 from .forms import (
     EstudianteForm, DocenteForm, CursoForm,
     AsignaturaCatalogoForm, AsignaturaOfertaForm, OfertaBulkForm,
-    PeriodoForm, LogroForm, AnioLectivoForm
+    PeriodoForm, LogroForm, LogroBulkForm, AnioLectivoForm
 )
 from django.contrib.auth.decorators import login_required, user_passes_test
-from academico.utils import ranking_curso_periodo, ranking_curso_anual, _promedio_asignatura_periodo
-from collections import defaultdict
+from academico.utils import _promedio_asignatura_periodo
 import io
+import json
+import logging
+import tempfile
+import time
+import uuid
 import zipfile
-from weasyprint import HTML
 
 from cartera.models import AnioEconomico
+from myapp.models import School
+
+logger = logging.getLogger(__name__)
 
 SABER_SER_PESO = Decimal("0.10")  # 10%
 LOGROS_PESO    = Decimal("0.90")  # 90%
 
 
 
+def _no_modificado(request, etag, ultima_mod):
+    """Respuesta 304 si el navegador ya tiene esta versión; None si hay que generarla."""
+    if len(messages.get_messages(request)):
+        # hay avisos pendientes: la copia del navegador no los mostraría
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=ultima_mod)
+
+
+def _con_version(response, etag, ultima_mod):
+    """ETag/Last-Modified y caché privada que siempre se revalida."""
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(ultima_mod)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+def _si_falla_pdf(volver):
+    """
+    Si el servicio de PDF no está o falla (y no hay respaldo local), avisa y
+    redirige a ``volver`` en vez de responder 500.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            try:
+                return vista(request, *args, **kwargs)
+            except (ServicioPDFNoDisponible, ErrorRenderPDF) as exc:
+                logger.error("No se pudo generar el PDF del boletín: %s", exc)
+                messages.error(
+                    request,
+                    "No fue posible generar el PDF en este momento. Intenta de nuevo en unos minutos."
+                )
+                return redirect(volver)
+        return envoltura
+    return decorador
+
+
 @login_required
+@_si_falla_pdf("academico:portal")
 def portal_boletin_pdf(request):
     # Solo el estudiante dueño
     est = Estudiante.objects.select_related("curso").filter(user=request.user).first()
@@ -73,49 +139,32 @@ def portal_boletin_pdf(request):
         return redirect("academico:portal")
     periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
 
-    # Calificaciones SOLO de este estudiante en ese periodo
-    calificaciones = (
-        CalificacionLogro.objects
-        .filter(estudiante=est, logro__periodo=periodo)
-        .select_related("logro__oferta__asignatura", "logro")
-        .order_by("logro__oferta__asignatura__nombre", "logro__titulo")
-    )
+    # Sin cambios desde la última descarga: 304 sin calcular ni renderizar
+    motor = getattr(request.school, "motor_pdf", "")
+    etag, ultima_mod = version_portal(est, "pdf", periodo.id, motor)
+    no_modificado = _no_modificado(request, etag, ultima_mod)
+    if no_modificado:
+        return _con_version(no_modificado, etag, ultima_mod)
+
+    # Período cerrado: el boletín ya está congelado (y quizá renderizado)
+    snap = snapshot_boletin(est, periodo)
+    if snap and snap.pdf:
+        response = FileResponse(
+            snap.pdf.open("rb"),
+            as_attachment=True,
+            filename=f"boletin_{est.apellidos}_{est.nombres}_P{periodo.numero}.pdf",
+            content_type="application/pdf",
+        )
+        return _con_version(response, etag, ultima_mod)
 
-    # === Generar PDF ===
+    # Boletín completo con el motor del colegio (snapshot si el período está cerrado)
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = (
         f'attachment; filename="boletin_{est.apellidos}_{est.nombres}_P{periodo.numero}.pdf"'
     )
-
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-
-    story.append(Paragraph(f"<b>Estudiante:</b> {est.nombres} {est.apellidos}", styles["Normal"]))
-    story.append(Paragraph(f"<b>Curso:</b> {est.curso}", styles["Normal"]))
-    story.append(Paragraph(f"<b>Periodo:</b> {periodo.nombre}", styles["Normal"]))
-    story.append(Spacer(1, 10))
-
-    data = [["Asignatura", "Logro", "Nota", "Peso %"]]
-    for c in calificaciones:
-        data.append([
-            c.logro.oferta.asignatura.nombre,
-            c.logro.titulo,
-            f"{(c.nota or 0):.2f}",
-            f"{c.logro.peso}%",
-        ])
-    if len(data) == 1:
-        data.append(["Sin calificaciones registradas", "", "", ""])
-
-    table = Table(data, colWidths=[130, 250, 60, 60])
-    table.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-        ("ALIGN", (2, 1), (3, -1), "CENTER"),
-    ]))
-    story.append(table)
-    doc.build(story)
-    return response
+    contextos = _contextos_boletin(request, anio, est.curso, periodo, [est])
+    _escribir_boletines_pdf(request, contextos, response, est.curso, periodo)
+    return _con_version(response, etag, ultima_mod)
 
 @login_required
 def portal_boletin(request):
@@ -145,6 +194,20 @@ def portal_boletin(request):
 
     periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
 
+    etag, ultima_mod = version_portal(est, "boletin", periodo.id)
+    no_modificado = _no_modificado(request, etag, ultima_mod)
+    if no_modificado:
+        return _con_version(no_modificado, etag, ultima_mod)
+
+    # Período cerrado: se lee el boletín congelado
+    snap = snapshot_boletin(est, periodo)
+    if snap:
+        ctx = contexto_desde_snapshot(
+            snap, anio=anio, curso=est.curso, periodo=periodo, estudiante=est,
+        )
+        response = render(request, "academico/boletin_estudiante.html", ctx)
+        return _con_version(response, etag, ultima_mod)
+
     # Ofertas (asignaturas) del curso del estudiante en el año activo
     ofertas = (
         AsignaturaOferta.objects
@@ -276,7 +339,8 @@ def portal_boletin(request):
         "promedio_anual": promedio_anual,
     }
 
-    return render(request, "academico/boletin_estudiante.html", ctx)
+    response = render(request, "academico/boletin_estudiante.html", ctx)
+    return _con_version(response, etag, ultima_mod)
 
 def _es_estudiante(u):
     return u.is_authenticated and u.groups.filter(name="Estudiante").exists()
@@ -322,6 +386,12 @@ def portal_estudiante(request):
     # 2. Año lectivo activo
     anio = AnioLectivo.objects.filter(activo=True).first()
 
+    # Nada cambió desde la última visita: 304 antes de calcular promedios y asistencia
+    etag, ultima_mod = version_portal(est, "portal", anio.id if anio else 0)
+    no_modificado = _no_modificado(request, etag, ultima_mod)
+    if no_modificado:
+        return _con_version(no_modificado, etag, ultima_mod)
+
     # ✅ IMPORTANTÍSIMO: inicializar SIEMPRE (evita UnboundLocalError)
     horarios_nivel = {
         "preescolar": {
@@ -373,23 +443,9 @@ def portal_estudiante(request):
     fallas_anio = 0
     tardanzas_anio = 0
     if anio and est.curso:
-        pases = PaseLista.objects.filter(
-            anio=anio,
-            curso=est.curso,
-            periodo__in=periodos
-        )
-
-        fallas_anio = AsistenciaDetalle.objects.filter(
-            pase__in=pases,
-            estudiante=est,
-            estado=AsistenciaDetalle.AUSENTE
-        ).count()
-
-        tardanzas_anio = AsistenciaDetalle.objects.filter(
-            pase__in=pases,
-            estudiante=est,
-            estado=AsistenciaDetalle.TARDANZA
-        ).count()
+        totales = totales_anio(est, anio)
+        fallas_anio = totales["fallas"]
+        tardanzas_anio = totales["tardanzas"]
 
         # ✅ determinar nivel
         grado = str(est.curso.grado).upper()
@@ -414,7 +470,8 @@ def portal_estudiante(request):
         "nivel_horario": nivel_horario,     # ✅ ahora SIEMPRE existe
     }
 
-    return render(request, "portal/inicio.html", ctx)
+    response = render(request, "portal/inicio.html", ctx)
+    return _con_version(response, etag, ultima_mod)
 
 # ----------------- Rutas generales / home -----------------
 
@@ -980,12 +1037,29 @@ def periodos_list(request):
     params.pop("page", None)
     querystring = urlencode(params)
 
+    cierres = (
+        CierrePeriodo.objects
+        .filter(school=request.school, cerrado=True)                 # 👈
+        .annotate(pdf_pendientes=Count(
+            "snapshots", filter=Q(snapshots__pdf="") | Q(snapshots__pdf__isnull=True)
+        ))
+    )
+    periodos_cerrados = set()
+    pdf_pendientes = {}  # sólo los cierres con PDF pedidos
+    for c in cierres:
+        periodos_cerrados.add(c.periodo_id)
+        if c.generar_pdf:
+            pdf_pendientes[c.periodo_id] = c.pdf_pendientes
+    for p in page_obj.object_list:
+        p.pdf_pendientes = pdf_pendientes.get(p.id)
+
     ctx = {
         "page_obj": page_obj,
         "q": q,
         "anio_selected": anio_id,
         "anios": AnioLectivo.objects.all().order_by("-activo", "-nombre"),
         "querystring": querystring,
+        "periodos_cerrados": periodos_cerrados,
         "nav_active": "academico",
     }
     return render(request, "academico/periodos.html", ctx)
@@ -1024,6 +1098,68 @@ def periodo_delete(request, pk):
         return redirect("academico:periodos")
     return render(request, "academico/periodo_confirm_delete.html", {"obj": obj, "nav_active": "academico"})
 
+@requiere_gestion
+def periodo_cerrar(request, pk):
+    """
+    Congela los boletines del período para el colegio actual (ver
+    utils_boletin.cerrar_periodo). Con ``pdf=1`` deja pedidos los PDF: no se
+    generan en la petición sino con el comando renderizar_boletines_cerrados
+    (cron), que sólo rinde los pendientes; la lista de períodos los cuenta.
+    """
+    periodo = get_object_or_404(Periodo.objects.select_related("anio"), pk=pk)
+    if request.method != "POST":
+        return redirect("academico:periodos")
+
+    colegio = getattr(request, "colegio", None)
+    logo_url, sello_url = _urls_logo_sello(request, colegio)
+
+    cierre, total = cerrar_periodo(
+        request.school, periodo.anio, periodo,
+        usuario=request.user,
+        colegio=colegio, logo_url=logo_url, sello_url=sello_url,
+    )
+    if total:
+        messages.success(request, f"{periodo.nombre} cerrado: {total} boletines congelados.")
+    elif request.POST.get("pdf") != "1":
+        messages.info(request, f"{periodo.nombre} ya estaba cerrado.")
+
+    if request.POST.get("pdf") == "1":
+        CierrePeriodo.objects.filter(pk=cierre.pk).update(generar_pdf=True)
+        pendientes = cierre.snapshots.filter(Q(pdf="") | Q(pdf__isnull=True)).count()
+        if pendientes:
+            messages.info(request, f"{pendientes} PDF de boletines quedan en cola; se generan en segundo plano.")
+        else:
+            messages.info(request, f"Los boletines de {periodo.nombre} ya tienen su PDF.")
+    return redirect("academico:periodos")
+
+@requiere_gestion
+def periodo_actual(request, pk):
+    """Marca el período actual del colegio (en él registra las llegadas la portería)."""
+    periodo = get_object_or_404(Periodo.objects.select_related("anio"), pk=pk)
+    if request.method != "POST":
+        return redirect("academico:periodos")
+
+    if periodo_cerrado(request.school, periodo):
+        messages.error(request, f"{periodo.nombre} está cerrado: no puede ser el período actual.")
+        return redirect("academico:periodos")
+
+    request.school.periodo_actual = periodo                      # 👈
+    request.school.save(update_fields=["periodo_actual"])
+    messages.success(request, f"{periodo.nombre} ({periodo.anio}) es ahora el período actual.")
+    return redirect("academico:periodos")
+
+@requiere_gestion
+def periodo_reabrir(request, pk):
+    periodo = get_object_or_404(Periodo.objects.select_related("anio"), pk=pk)
+    if request.method != "POST":
+        return redirect("academico:periodos")
+
+    if reabrir_periodo(request.school, periodo.anio, periodo):
+        messages.success(request, f"{periodo.nombre} reabierto: los boletines vuelven a calcularse.")
+    else:
+        messages.info(request, f"{periodo.nombre} no estaba cerrado.")
+    return redirect("academico:periodos")
+
 # ----------------- Logros (gestión) -----------------
 
 @requiere_gestion
@@ -1121,6 +1257,111 @@ def logro_create(request):
     return render(request, "academico/logro_form.html", {"form": form, "edit_mode": False, "nav_active": "academico"})
 
 
+def _etiqueta_destino(oferta, periodo):
+    return f"{oferta.asignatura} · {oferta.curso} · {periodo.nombre}"
+
+
+@requiere_gestion
+def logro_bulk_create(request):
+    """
+    El mismo logro en varias ofertas y períodos. La suma de pesos y los
+    títulos repetidos de todos los destinos se revisan con una consulta
+    agrupada; si alguno falla no se crea nada. Se inserta con bulk_create.
+    """
+    if request.method == "POST":
+        form = LogroBulkForm(request.POST, school=request.school)
+        if form.is_valid():
+            datos = form.cleaned_data
+            destinos = datos["destinos"]
+            titulo, peso = datos["titulo"], datos["peso"]
+
+            ocupados = {
+                (fila["oferta_id"], fila["periodo_id"]): fila
+                for fila in (
+                    Logro.objects
+                    .filter(school=request.school, oferta__in=datos["ofertas"], periodo__in=datos["periodos"])  # 👈
+                    .values("oferta_id", "periodo_id")
+                    .annotate(total=Sum("peso"), mismo_titulo=Count("id", filter=Q(titulo__iexact=titulo)))
+                )
+            }
+
+            excedidos, repetidos, incompletos = [], [], []
+            for oferta, periodo in destinos:
+                fila = ocupados.get((oferta.id, periodo.id), {})
+                total = (fila.get("total") or Decimal("0")) + peso
+                if fila.get("mismo_titulo"):
+                    repetidos.append(_etiqueta_destino(oferta, periodo))
+                elif total > Decimal("100"):
+                    excedidos.append(f"{_etiqueta_destino(oferta, periodo)} ({total}%)")
+                elif total < Decimal("100"):
+                    incompletos.append(oferta.id)
+
+            if repetidos:
+                form.add_error(None, "Ya existe un logro con ese título en: " + "; ".join(repetidos) + ".")
+            if excedidos:
+                form.add_error(None, "La suma de pesos pasaría de 100% en: " + "; ".join(excedidos) + ".")
+
+            if not (repetidos or excedidos):
+                origen = datos["copiar_actividades_de"]
+                with transaction.atomic():
+                    Logro.objects.bulk_create([
+                        Logro(
+                            school=request.school,         # 👈
+                            oferta=oferta,
+                            periodo=periodo,
+                            tipo=datos["tipo"],
+                            titulo=titulo,
+                            descripcion=datos["descripcion"] or None,
+                            peso=peso,
+                        )
+                        for oferta, periodo in destinos
+                    ])
+
+                    copiadas = 0
+                    if origen is not None:
+                        # MySQL no devuelve los ids de bulk_create: se leen de nuevo
+                        nuevos = Logro.objects.filter(
+                            school=request.school,
+                            oferta__in=datos["ofertas"],
+                            periodo__in=datos["periodos"],
+                            titulo=titulo,
+                        ).values_list("id", flat=True)
+                        plantilla = list(origen.actividades.all())
+                        actividades = [
+                            Actividad(
+                                logro_id=logro_id,
+                                titulo=act.titulo,
+                                descripcion=act.descripcion,
+                                fecha=act.fecha,
+                                peso=act.peso,
+                            )
+                            for logro_id in nuevos
+                            for act in plantilla
+                        ]
+                        Actividad.objects.bulk_create(actividades)
+                        copiadas = len(actividades)
+
+                    # bulk_create no dispara señales: invalidar a mano
+                    cursos = {oferta.curso_id for oferta, _ in destinos}
+                    transaction.on_commit(lambda: [invalidar_notas_curso(c) for c in cursos])
+
+                messages.success(
+                    request,
+                    f"Se crearon {len(destinos)} logro(s)"
+                    + (f" y {copiadas} actividad(es)." if copiadas else "."),
+                )
+                if incompletos:
+                    messages.warning(
+                        request,
+                        f"Advertencia: en {len(incompletos)} oferta/periodo la suma de pesos aún no llega a 100%.",
+                    )
+                return redirect("academico:logros")
+    else:
+        form = LogroBulkForm(school=request.school)
+
+    return render(request, "academico/logro_bulk_form.html", {"form": form, "nav_active": "academico"})
+
+
 @requiere_gestion
 def logro_update(request, pk):
     obj = get_object_or_404(Logro, pk=pk, school=request.school)    # 👈
@@ -1195,6 +1436,130 @@ def asistencia_selector(request):
     return render(request, "academico/asistencia_selector.html", ctx)
 
 
+@requiere_gestion
+def asistencia_alertas(request):
+    """
+    Estudiantes con fallas por encima del umbral (porcentaje de los días con
+    pase de lista), del año o de un período. Se lee de los contadores.
+    """
+    docente = Docente.objects.filter(usuario=request.user, school=request.school).first()  # 👈
+
+    if docente and not (request.user.is_staff or request.user.is_superuser):
+        cursos = Curso.objects.filter(pk=docente.curso_asignado_id, school=request.school)
+    else:
+        cursos = Curso.objects.filter(school=request.school).order_by("grado", "nombre")
+
+    anios = AnioLectivo.objects.all().order_by("-activo", "-nombre")
+    anio_id = (request.GET.get("anio") or "").strip()
+    anio = (
+        anios.filter(pk=anio_id).first() if anio_id.isdigit()
+        else anios.filter(activo=True).first()
+    )
+    periodos = Periodo.objects.filter(anio=anio).order_by("numero") if anio else Periodo.objects.none()
+
+    periodo_id = (request.GET.get("periodo") or "").strip()
+    periodo = periodos.filter(pk=periodo_id).first() if periodo_id.isdigit() else None
+    curso_id = (request.GET.get("curso") or "").strip()
+    curso = cursos.filter(pk=curso_id).first() if curso_id.isdigit() else None
+    if curso is None and docente and not (request.user.is_staff or request.user.is_superuser):
+        curso = cursos.first()
+
+    try:
+        umbral = Decimal(request.GET.get("umbral") or ASISTENCIA_UMBRAL_FALLAS)
+    except InvalidOperation:
+        umbral = Decimal(ASISTENCIA_UMBRAL_FALLAS)
+
+    alertas = []
+    if anio and (curso or not docente or request.user.is_staff or request.user.is_superuser):
+        alertas = alertas_inasistencia(request.school, anio, umbral, periodo=periodo, curso=curso)
+
+    ctx = {
+        "anios": anios,
+        "periodos": periodos,
+        "cursos": cursos,
+        "anio": anio,
+        "periodo": periodo,
+        "curso": curso,
+        "umbral": umbral,
+        "alertas": alertas,
+        "nav_active": "academico",
+    }
+    return render(request, "academico/asistencia_alertas.html", ctx)
+
+
+# Fechas por página en la matriz de asistencia
+VENTANA_FECHAS = 20
+
+
+@requiere_gestion
+def asistencia_matriz(request):
+    """
+    Asistencia del curso en el período: estudiantes × fechas, con totales por
+    estudiante y por fecha. En pantalla va por ventanas de fechas;
+    ?formato=csv|xlsx descarga el período completo.
+    """
+    anio_id = request.GET.get("anio")
+    curso_id = request.GET.get("curso")
+    periodo_id = request.GET.get("periodo")
+
+    if not (anio_id and curso_id and periodo_id):
+        messages.error(request, "Faltan parámetros. Selecciona año, curso y período.")
+        return redirect("academico:asistencia_selector")
+
+    anio = get_object_or_404(AnioLectivo, pk=anio_id)
+    curso = get_object_or_404(Curso, pk=curso_id, school=request.school)          # 👈
+    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
+
+    pases = PaseLista.objects.filter(
+        school=request.school, anio=anio, curso=curso, periodo=periodo,            # 👈
+    ).order_by("fecha")
+    estudiantes = Estudiante.objects.filter(
+        curso=curso, school=request.school,
+    ).order_by("apellidos", "nombres")
+    titulo = f"Asistencia {curso.grado} - {curso.nombre} · {periodo.nombre} {anio.nombre}"
+
+    formato = request.GET.get("formato")
+    if formato in ("csv", "xlsx"):
+        columnas = list(pases)
+        filas, totales_fecha = matriz_asistencia(pases, columnas, estudiantes)
+        nombre = f"asistencia_{slugify(titulo)}"
+        if formato == "csv":
+            respuesta = StreamingHttpResponse(
+                csv_asistencia(columnas, filas, totales_fecha),
+                content_type="text/csv; charset=utf-8",
+            )
+            respuesta["Content-Disposition"] = f'attachment; filename="{nombre}.csv"'
+            return respuesta
+
+        archivo = tempfile.SpooledTemporaryFile(max_size=2 * 1024 * 1024)
+        escribir_asistencia_xlsx(archivo, titulo, columnas, filas, totales_fecha)
+        archivo.seek(0)
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=f"{nombre}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+    pagina = Paginator(pases, VENTANA_FECHAS).get_page(request.GET.get("pagina"))
+    columnas = list(pagina.object_list)
+    filas, totales_fecha = matriz_asistencia(pases, columnas, estudiantes)
+
+    ctx = {
+        "anio": anio,
+        "curso": curso,
+        "periodo": periodo,
+        "titulo": titulo,
+        "pagina": pagina,
+        "columnas": columnas,
+        "filas": filas,
+        "totales_fecha": totales_fecha,
+        "query_base": urlencode({"anio": anio.id, "curso": curso.id, "periodo": periodo.id}),
+        "nav_active": "academico",
+    }
+    return render(request, "academico/asistencia_matriz.html", ctx)
+
+
 @requiere_gestion
 def asistencia_tomar(request):
     anio_id = request.GET.get("anio")
@@ -1218,14 +1583,20 @@ def asistencia_tomar(request):
 
     docente = Docente.objects.filter(usuario=request.user, school=request.school).first()
 
-    pase, creado = PaseLista.objects.get_or_create(      # 👈 ahora con school
-        school=request.school,
-        anio=anio,
+    # Un pase de lista por curso y fecha (puede haberlo creado la portería o la captura sin conexión)
+    pase, creado = PaseLista.objects.select_related("periodo").get_or_create(
         curso=curso,
-        periodo=periodo,
         fecha=fecha_val,
-        defaults={"docente": docente},
+        defaults={"school": request.school, "anio": anio, "periodo": periodo, "docente": docente},  # 👈
     )
+    otro_periodo = pase.periodo_id != periodo.id
+    if otro_periodo and periodo_cerrado(request.school, pase.periodo):
+        messages.error(
+            request,
+            f"La asistencia del {fecha_val:%d/%m/%Y} ya está registrada en {pase.periodo.nombre}, "
+            "que está cerrado."
+        )
+        return redirect("academico:asistencia_selector")
 
     estudiantes = Estudiante.objects.filter(
         curso=curso,
@@ -1238,29 +1609,32 @@ def asistencia_tomar(request):
     }
 
     if request.method == "POST":
-        guardados = 0
+        registros = {}
         for est in estudiantes:
             estado = request.POST.get(f"estado_{est.id}", "").strip()
             obs = (request.POST.get(f"obs_{est.id}") or "").strip()
 
-            if not estado:
+            if estado not in ESTADOS_ASISTENCIA:
                 continue
-
-            AsistenciaDetalle.objects.update_or_create(
-                pase=pase,
-                estudiante=est,
-                defaults={
-                    "estado": estado,
-                    "observacion": obs,
-                },
-            )
-            guardados += 1
-
-        messages.success(request, f"Asistencia guardada. Registros procesados: {guardados}.")
+            registros[est.id] = {"estado": estado, "observacion": obs[:255]}
+
+        if otro_periodo:
+            # se guarda en el período elegido; los contadores se recuentan (ver signals)
+            pase.anio, pase.periodo = anio, periodo
+            pase.save(update_fields=["anio", "periodo"])
+        guardar_asistencia(pase, existentes, registros)
+        messages.success(request, f"Asistencia guardada. Registros procesados: {len(registros)}.")
         return redirect(
             f"{request.path}?anio={anio_id}&curso={curso_id}&periodo={periodo_id}&fecha={fecha_str}"
         )
 
+    if otro_periodo:
+        messages.warning(
+            request,
+            f"La asistencia del {fecha_val:%d/%m/%Y} estaba registrada en {pase.periodo.nombre}; "
+            f"al guardar pasará a {periodo.nombre}."
+        )
+
     filas = []
     for est in estudiantes:
         det = existentes.get(est.id)
@@ -1482,19 +1856,20 @@ def notas_actividades_capturar(request, actividad_id):
     )
 
     existentes = {
-        c.estudiante_id: c.nota
+        c.estudiante_id: c
         for c in CalificacionActividad.objects.filter(actividad=actividad)
     }
 
     if request.method == "POST":
-        guardados = 0
+        if periodo_cerrado(request.school, logro.periodo):
+            messages.error(request, "El período está cerrado: reábrelo para modificar notas.")
+            return redirect("academico:actividades", logro_id=logro.id)
+
+        nuevos = {}
         for est in estudiantes:
             raw = (request.POST.get(f"nota_{est.id}", "")).strip()
             if raw == "":
-                CalificacionActividad.objects.filter(
-                    actividad=actividad,
-                    estudiante=est
-                ).delete()
+                nuevos[est.id] = None
                 continue
 
             try:
@@ -1502,20 +1877,29 @@ def notas_actividades_capturar(request, actividad_id):
             except Exception:
                 continue
 
-            CalificacionActividad.objects.update_or_create(
-                actividad=actividad,
-                estudiante=est,
-                defaults={"nota": val}
+            nuevos[est.id] = {"nota": val}
+
+        # Notas de la actividad y nota del logro, en bloque y en una sola transacción
+        with transaction.atomic():
+            guardar_planilla(
+                CalificacionActividad,
+                {"actividad_id": actividad.id},
+                existentes,
+                nuevos,
+                campos=["nota"],
+                unicos=["actividad", "estudiante"],
+            )
+            recalcular_notas_logro(
+                logro, [est.id for est in estudiantes], curso_id=logro.oferta.curso_id
             )
-            guardados += 1
-            recalcular_nota_logro_desde_actividades(est, logro)
 
         messages.success(request, "Notas de actividades guardadas.")
         return redirect("academico:actividades", logro_id=logro.id)
 
     # 👉 aquí “inyectamos” la nota existente en cada estudiante
     for est in estudiantes:
-        est.nota_actividad = existentes.get(est.id)
+        cal = existentes.get(est.id)
+        est.nota_actividad = cal.nota if cal else None
 
     return render(request, "academico/notas_actividades_capturar.html", {
         "actividad": actividad,
@@ -1554,8 +1938,11 @@ def saber_ser_capturar(request, oferta_id, periodo_id):
             return None
 
     if request.method == "POST":
-        guardados = 0
+        if periodo_cerrado(request.school, periodo):
+            messages.error(request, "El período está cerrado: reábrelo para modificar notas.")
+            return redirect("academico:notas_selector")
 
+        nuevos = {}
         for est in estudiantes:
             raw_comp = request.POST.get(f"comp_{est.id}", "")
             raw_resp = request.POST.get(f"resp_{est.id}", "")
@@ -1565,42 +1952,38 @@ def saber_ser_capturar(request, oferta_id, periodo_id):
             val_resp = _parse_decimal(raw_resp)
             val_auto = _parse_decimal(raw_auto)
 
-            # Si las tres vienen vacías → borramos registro (si existe) y pasamos al siguiente
+            # Si las tres vienen vacías → se borra el registro (si existe)
             if val_comp is None and val_resp is None and val_auto is None:
-                SaberSer.objects.filter(
-                    estudiante=est,
-                    asignatura_oferta=oferta,
-                    periodo=periodo,
-                ).delete()
+                nuevos[est.id] = None
                 continue
 
-            SaberSer.objects.update_or_create(
-                estudiante=est,
-                asignatura_oferta=oferta,
-                periodo=periodo,
-                defaults={
-                    "anio": oferta.anio,
-                    "nota_comportamiento": val_comp,
-                    "nota_responsabilidad": val_resp,
-                    "nota_autoevaluacion": val_auto,
-                }
-            )
-            guardados += 1
+            nuevos[est.id] = {
+                "anio_id": oferta.anio_id,
+                "nota_comportamiento": val_comp,
+                "nota_responsabilidad": val_resp,
+                "nota_autoevaluacion": val_auto,
+            }
+
+        guardar_planilla(
+            SaberSer,
+            {"asignatura_oferta_id": oferta.id, "periodo_id": periodo.id},
+            existentes,
+            nuevos,
+            campos=["anio_id", "nota_comportamiento", "nota_responsabilidad", "nota_autoevaluacion"],
+            unicos=["estudiante", "periodo", "asignatura_oferta"],
+            curso_id=oferta.curso_id,
+        )
+        guardados = sum(1 for valores in nuevos.values() if valores is not None)
 
         messages.success(request, f"Notas de Saber Ser guardadas ({guardados} registros).")
         return redirect("academico:notas_selector")
 
-    # GET: inyectamos las 3 notas existentes a cada estudiante
+    # GET: inyectamos las 3 notas existentes a cada estudiante (con los nombres que usa el template)
     for est in estudiantes:
         ss = existentes.get(est.id)
-        if ss:
-            est.nota_saber_ser_comp = ss.nota_comportamiento
-            est.nota_saber_ser_resp = ss.nota_responsabilidad
-            est.nota_saber_ser_auto = ss.nota_autoevaluacion
-        else:
-            est.nota_saber_ser_comp = None
-            est.nota_saber_ser_resp = None
-            est.nota_saber_ser_auto = None
+        est.nota_comportamiento = ss.nota_comportamiento if ss else None
+        est.nota_responsabilidad = ss.nota_responsabilidad if ss else None
+        est.nota_autoevaluacion = ss.nota_autoevaluacion if ss else None
 
     return render(request, "academico/saber_ser_capturar.html", {
         "oferta": oferta,
@@ -1609,114 +1992,462 @@ def saber_ser_capturar(request, oferta_id, periodo_id):
         "nav_active": "academico",
     })
 
-# ----------------- Boletines -----------------
+# Tope de celdas por lote de autoguardado (el navegador manda lotes pequeños)
+AUTOSAVE_MAX_CAMBIOS = 500
 
-def _concepto_letra(n):
-    if n is None:
-        return "N.A."
-    n = Decimal(n)
-    if n >= Decimal("4.60"): return "S"
-    if n >= Decimal("4.00"): return "A"
-    if n >= Decimal("3.00"): return "B"
-    return "D"
 
-def _contexto_boletin(anio, curso, periodo, est):
+@requiere_gestion
+def notas_autosave(request):
     """
-    Copia aquí la parte de tu vista 'boletin_estudiante_pdf' que arma el ctx:
-    areas, promedios, obs_general, etc.
+    Autoguardado de las planillas: recibe sólo las celdas cambiadas en JSON
+    ({"cambios": [...]}, ver utils_notas.aplicar_cambios_notas) y responde
+    qué se guardó y los errores de cada celda.
     """
-    # TODO: este es solo un esquema; tú llenas el contexto real
-    # return ctx
-    ...
+    if request.method != "POST":
+        return JsonResponse({"error": "Usa POST."}, status=405)
+    try:
+        cambios = json.loads(request.body or b"{}").get("cambios")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+    if not isinstance(cambios, list) or len(cambios) > AUTOSAVE_MAX_CAMBIOS:
+        return JsonResponse(
+            {"error": f"Envía una lista 'cambios' de hasta {AUTOSAVE_MAX_CAMBIOS} celdas."},
+            status=400,
+        )
 
-def _boletin_pdf_bytes(request, anio, curso, periodo, est):
-    ctx = _contexto_boletin(anio, curso, periodo, est)
-    html = render_to_string("academico/boletin_estudiante_pdf.html", ctx)
-    pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
-    return pdf_bytes
+    return JsonResponse(aplicar_cambios_notas(request.school, cambios))
 
 
-@requiere_gestion
-def boletines_masivos(request):
-    # protección básica
-    if not (request.user.is_superuser or request.user.is_staff):
-        messages.error(request, "No tiene permisos para descargar boletines masivos.")
-        return redirect("academico:boletin_selector")
+# Topes de un lote de sincronización sin conexión
+SYNC_MAX_OPERACIONES = 200
+SYNC_MAX_CAMBIOS = 5000
 
-    if request.method != "POST":
-        return redirect("academico:boletin_selector")
 
-    anio_id    = request.POST.get("anio")
-    curso_id   = request.POST.get("curso")
-    periodo_id = request.POST.get("periodo")
-    est_ids    = request.POST.getlist("estudiantes")
+@requiere_gestion
+def captura_sincronizar(request):
+    """
+    Recibe la cola de captura sin conexión ({"operaciones": [...]}, ver
+    utils_captura.aplicar_operaciones) y la aplica en una sola transacción.
+    Las operaciones ya aplicadas se reconocen por su id y no se repiten.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Usa POST."}, status=405)
+    try:
+        operaciones = json.loads(request.body or b"{}").get("operaciones")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+    if not isinstance(operaciones, list) or len(operaciones) > SYNC_MAX_OPERACIONES:
+        return JsonResponse(
+            {"error": f"Envía una lista 'operaciones' de hasta {SYNC_MAX_OPERACIONES} elementos."},
+            status=400,
+        )
+    errores = errores_de_formato(operaciones)
+    if errores:
+        return JsonResponse({"error": "Lote con formato inválido.", "errores": errores}, status=400)
+    total = sum(len(op.get("cambios") or []) + len(op.get("registros") or []) for op in operaciones)
+    if total > SYNC_MAX_CAMBIOS:
+        return JsonResponse({"error": f"El lote supera {SYNC_MAX_CAMBIOS} celdas."}, status=400)
 
-    if not (anio_id and curso_id and periodo_id):
-        messages.error(request, "Faltan parámetros (año, curso, periodo).")
-        return redirect("academico:boletin_selector")
+    return JsonResponse(aplicar_operaciones(request.school, request.user, operaciones))
 
-    if not est_ids:
-        messages.warning(request, "No seleccionó ningún estudiante.")
-        url = f"{reverse('academico:boletin_selector')}?anio={anio_id}&curso={curso_id}&periodo={periodo_id}"
-        return redirect(url)
 
-    anio    = get_object_or_404(AnioLectivo, pk=anio_id)
-    curso   = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
-    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
+@requiere_gestion
+def captura_service_worker(request):
+    """
+    Service worker de las páginas de captura. Se sirve desde /academico/ (y no
+    desde /static/) para que su alcance cubra esas páginas.
+    """
+    response = render(request, "academico/sw_captura.js", content_type="application/javascript")
+    patch_cache_control(response, no_cache=True)
+    return response
 
-    estudiantes = (
-        Estudiante.objects
-        .filter(id__in=est_ids, curso=curso, school=request.school)         # 👈
-        .order_by("apellidos", "nombres")
-    )
+# ----------------- Ingreso por portería -----------------
 
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for est in estudiantes:
-            pdf_bytes = _boletin_pdf_bytes(request, anio, curso, periodo, est)
-            filename = f"Boletin_{est.apellidos}_{est.nombres}_{periodo.nombre}.pdf"
-            zip_file.writestr(filename, pdf_bytes)
+@requiere_gestion
+def ingreso_kiosko(request):
+    """Pantalla del kiosko de portería: lector de identificación o QR."""
+    return render(request, "academico/ingreso_kiosko.html", {
+        "limite": request.school.hora_limite_ingreso,
+        "periodo": periodo_ingreso(request.school),
+        "nav_active": "academico",
+    })
 
-    buffer.seek(0)
-    filename_zip = f"Boletines_{curso.grado}_{curso.nombre}_{periodo.nombre}.zip"
-    response = HttpResponse(buffer.getvalue(), content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename=\"{filename_zip}\"'
-    return response
 
-def boletin_trimestral(request, estudiante_id, anio_id, trimestre):
-    estudiante = get_object_or_404(Estudiante, pk=estudiante_id, school=request.school)  # 👈
-    anio = get_object_or_404(AnioEconomico, pk=anio_id)
+@requiere_gestion
+def ingreso_registrar(request):
+    """
+    Una lectura del kiosko ({"codigo": "1012345678"}). Responde al instante;
+    la llegada se guarda con el siguiente lote (ver utils_ingreso).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Usa POST."}, status=405)
+    try:
+        codigo = json.loads(request.body or b"{}").get("codigo")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+    if not isinstance(codigo, str):
+        return JsonResponse({"error": "Envía el 'codigo' leído."}, status=400)
 
-    resumen = resumen_cartera_para_boletin(estudiante, anio, int(trimestre))
+    resultado = registrar_llegada(request.school, codigo[:50])       # 👈
+    return JsonResponse(resultado, status=200 if resultado["ok"] else 404)
 
-    if not resumen["puede_ver"]:
-        # Vista bloqueada
-        return render(
-            request,
-            "academico/boletin_bloqueado_cartera.html",
-            {
-                "estudiante": estudiante,
-                "trimestre": trimestre,
-                **resumen,
-            },
-        )
-    return render(
-        request,
-        "academico/boletin_trimestral.html",
-        {
-            "estudiante": estudiante,
-            "trimestre": trimestre,
-            "anio": anio,
-        },
-    )
 
 @requiere_gestion
-def boletin_selector(request):
-    anio_id = (request.GET.get("anio") or "").strip()
-    curso_id = (request.GET.get("curso") or "").strip()
-    periodo_id = (request.GET.get("periodo") or "").strip()
+def ingreso_vaciar(request):
+    """El kiosko lo llama cuando queda quieto, para no dejar llegadas en la cola."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Usa POST."}, status=405)
+    return JsonResponse({"guardadas": vaciar_cola(), "pendientes": pendientes(request.school)})
 
-    anios = AnioLectivo.objects.all().order_by("-activo", "-nombre")
+
+# ----------------- Importación de notas desde Excel -----------------
+
+# Tamaño máximo del archivo (una planilla de curso pesa unos pocos KB)
+IMPORTACION_MAX_BYTES = 5 * 1024 * 1024
+# La vista previa queda guardada mientras se confirma
+IMPORTACION_TIMEOUT = 30 * 60
+
+
+def _guardar_vista_previa(request, token, datos):
+    """
+    Deja la vista previa en la sesión (que vive en la base): la confirmación
+    puede llegar a otro proceso de la app. De paso descarta las vencidas.
+    """
+    ahora = time.time()
+    previas = {
+        t: p for t, p in request.session.get("importacion-notas", {}).items() if p["expira"] > ahora
+    }
+    previas[token] = {**datos, "expira": ahora + IMPORTACION_TIMEOUT}
+    request.session["importacion-notas"] = previas
+
+
+def _tomar_vista_previa(request, token):
+    """Saca de la sesión la vista previa ``token``; None si no está o venció."""
+    previas = request.session.get("importacion-notas", {})
+    pendiente = previas.pop(token, None)
+    request.session["importacion-notas"] = previas
+    if pendiente is None or pendiente["expira"] <= time.time():
+        return None
+    return pendiente
+
+
+def _alcance_planilla_xlsx(request, datos):
+    """
+    Planilla de un archivo Excel: un logro (página de actividades) o una
+    oferta + período (notas_capturar). Devuelve (estudiantes, actividades,
+    logros, url de regreso, descripción), con una consulta por cada cosa.
+    """
+    if datos.get("logro"):
+        logro = get_object_or_404(
+            Logro.objects.select_related("oferta__curso", "oferta__asignatura", "periodo"),
+            pk=datos.get("logro"),
+            school=request.school,
+        )
+        logros = [logro]
+        oferta, periodo = logro.oferta, logro.periodo
+        volver = reverse("academico:actividades", args=[logro.id])
+        descripcion = f"{oferta.asignatura.nombre} · {logro.titulo} · {periodo.nombre}"
+    else:
+        oferta = get_object_or_404(
+            AsignaturaOferta.objects.select_related("curso", "asignatura"),
+            pk=datos.get("oferta"),
+            school=request.school,
+        )
+        periodo = get_object_or_404(Periodo, pk=datos.get("periodo"), anio_id=oferta.anio_id)
+        logros = list(
+            Logro.objects.filter(oferta=oferta, periodo=periodo, school=request.school).order_by("titulo")
+        )
+        volver = reverse("academico:notas_capturar") + "?" + urlencode({
+            "anio": oferta.anio_id, "curso": oferta.curso_id, "oferta": oferta.id, "periodo": periodo.id,
+        })
+        descripcion = f"{oferta.asignatura.nombre} · {periodo.nombre}"
+
+    actividades = list(
+        Actividad.objects.select_related("logro").filter(logro__in=logros).order_by("logro_id", "id")
+    )
+    estudiantes = list(
+        Estudiante.objects
+        .filter(curso_id=oferta.curso_id, school=request.school)
+        .order_by("apellidos", "nombres")
+    )
+    return estudiantes, actividades, logros, volver, f"{oferta.curso} · {descripcion}"
+
+
+@requiere_gestion
+def notas_importar(request):
+    """
+    Sube un .xlsx con notas (formato en utils_xlsx) y muestra la vista previa:
+    qué celdas cambian y qué filas tienen errores. Nada se guarda hasta
+    confirmar en notas_importar_confirmar.
+    """
+    if request.method != "POST":
+        return redirect("academico:notas_selector")
+
+    estudiantes, actividades, logros, volver, descripcion = _alcance_planilla_xlsx(request, request.POST)
+
+    archivo = request.FILES.get("archivo")
+    if not archivo or not archivo.name.lower().endswith(".xlsx"):
+        messages.error(request, "Selecciona un archivo de Excel (.xlsx).")
+        return redirect(volver)
+    if archivo.size > IMPORTACION_MAX_BYTES:
+        messages.error(request, "El archivo es demasiado grande.")
+        return redirect(volver)
+
+    try:
+        resultado = leer_notas_xlsx(archivo, estudiantes, actividades, logros)
+    except Exception:
+        messages.error(request, "No se pudo leer el archivo. Verifica que sea un .xlsx válido.")
+        return redirect(volver)
+
+    token = uuid.uuid4().hex
+    if resultado["cambios"]:
+        _guardar_vista_previa(request, token, {"cambios": resultado["cambios"], "volver": volver})
+
+    return render(request, "academico/notas_importar_preview.html", {
+        "resultado": resultado,
+        "token": token,
+        "volver": volver,
+        "descripcion": descripcion,
+        "archivo": archivo.name,
+        "nav_active": "academico",
+    })
+
+
+@requiere_gestion
+def notas_importar_confirmar(request):
+    """Aplica la importación de la vista previa: upserts por planilla y un recálculo por logro."""
+    if request.method != "POST":
+        return redirect("academico:notas_selector")
+
+    pendiente = _tomar_vista_previa(request, request.POST.get("token", ""))
+    if not pendiente:
+        messages.error(request, "La vista previa expiró. Vuelve a subir el archivo.")
+        return redirect("academico:notas_selector")
+
+    resultado = aplicar_cambios_notas(request.school, pendiente["cambios"])
+    guardadas = len(resultado["guardados"])
+    if resultado["errores"]:
+        messages.warning(
+            request,
+            f"Se importaron {guardadas} nota(s); {len(resultado['errores'])} no se guardaron: "
+            + "; ".join(sorted({e["error"] for e in resultado["errores"]})),
+        )
+    else:
+        messages.success(request, f"Se importaron {guardadas} nota(s).")
+    return redirect(pendiente["volver"])
+
+@requiere_gestion
+def notas_exportar(request):
+    """
+    Descarga la planilla en .xlsx (oferta + período, o un logro). Con
+    ?plantilla=1 sale vacía, con las columnas que acepta la importación.
+    """
+    estudiantes, actividades, logros, _, descripcion = _alcance_planilla_xlsx(request, request.GET)
+    plantilla = request.GET.get("plantilla") == "1"
+
+    # write_only escribe las filas a disco; el archivo sale por partes con FileResponse
+    archivo = tempfile.SpooledTemporaryFile(max_size=2 * 1024 * 1024)
+    escribir_notas_xlsx(archivo, descripcion, estudiantes, logros, actividades, plantilla=plantilla)
+    archivo.seek(0)
+
+    nombre = slugify(descripcion) or "notas"
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f"{'plantilla' if plantilla else 'notas'}_{nombre}.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+# ----------------- Boletines -----------------
+
+def _concepto_letra(n):
+    if n is None:
+        return "N.A."
+    n = Decimal(n)
+    if n >= Decimal("4.60"): return "S"
+    if n >= Decimal("4.00"): return "A"
+    if n >= Decimal("3.00"): return "B"
+    return "D"
+
+def _urls_logo_sello(request, colegio):
+    """Logo y sello dinámicos por colegio, con fallback al estático."""
+    if colegio and getattr(colegio, "logo", None):
+        logo_url = request.build_absolute_uri(colegio.logo.url)
+    else:
+        logo_url = request.build_absolute_uri(static("img/logo.png"))
+
+    if colegio and getattr(colegio, "sello", None):
+        sello_url = request.build_absolute_uri(colegio.sello.url)
+    else:
+        sello_url = request.build_absolute_uri(static("img/sello.png"))
+    return logo_url, sello_url
+
+
+def _contextos_boletin(request, anio, curso, periodo, estudiantes):
+    """(estudiante, ctx) por estudiante: del snapshot si el período está cerrado, si no se calcula."""
+    # Ajusta esta parte a cómo obtienes el colegio actual
+    colegio = getattr(request, "colegio", None)  # o request.colegio_actual, o est.colegio, etc.
+    logo_url, sello_url = _urls_logo_sello(request, colegio)
+    vivos = {"colegio": colegio, "logo_url": logo_url, "sello_url": sello_url}
+
+    estudiantes = list(estudiantes)
+    snaps = {
+        s.estudiante_id: s
+        for s in BoletinSnapshot.objects.filter(periodo=periodo, estudiante__in=estudiantes)
+    }
+    faltan = [e for e in estudiantes if e.id not in snaps]
+    calculados = {}
+    if faltan:
+        calculados = {
+            est.id: ctx
+            for est, ctx in contextos_boletin(anio, curso, periodo, faltan, **vivos)
+        }
+
+    for est in estudiantes:
+        if est.id in snaps:
+            yield est, contexto_desde_snapshot(
+                snaps[est.id], anio=anio, curso=curso, periodo=periodo, estudiante=est, **vivos
+            )
+        else:
+            yield est, calculados[est.id]
+
+
+def _boletin_pdf_bytes(request, ctx):
+    html = render_to_string("academico/boletin_estudiante_pdf.html", ctx)
+    pdf_bytes = html_a_pdf(html, base_url=request.build_absolute_uri('/'), hojas=("boletin",))
+    return pdf_bytes
+
+
+def _boletin_curso_pdf_bytes(request, contextos, curso, periodo, duplex=False):
+    """
+    Todos los boletines en un solo documento: un único render de WeasyPrint,
+    así logo, sello, fuentes y CSS se incrustan una sola vez.
+    """
+    paginas = [
+        render_to_string("academico/partials/boletin_pagina.html", ctx)
+        for _, ctx in contextos
+    ]
+    html = render_to_string("academico/boletin_curso_pdf.html", {
+        "paginas": paginas,
+        "curso": curso,
+        "periodo": periodo,
+        "duplex": duplex,
+    })
+    return html_a_pdf(html, base_url=request.build_absolute_uri('/'), hojas=("boletin",))
+
+
+def _usa_motor_rapido(request):
+    school = getattr(request, "school", None)
+    return getattr(school, "motor_pdf", None) == School.MOTOR_REPORTLAB
+
+
+def _escribir_boletines_pdf(request, contextos, destino, curso, periodo):
+    """Escribe los boletines en ``destino`` con el motor de PDF del colegio."""
+    if _usa_motor_rapido(request):
+        boletines_pdf_rapido((ctx for _, ctx in contextos), destino)
+        return
+
+    contextos = list(contextos)
+    if len(contextos) == 1:
+        destino.write(_boletin_pdf_bytes(request, contextos[0][1]))
+    else:
+        destino.write(_boletin_curso_pdf_bytes(request, contextos, curso, periodo))
+
+
+@requiere_gestion
+@_si_falla_pdf("academico:boletin_selector")
+def boletines_masivos(request):
+    # protección básica
+    if not (request.user.is_superuser or request.user.is_staff):
+        messages.error(request, "No tiene permisos para descargar boletines masivos.")
+        return redirect("academico:boletin_selector")
+
+    if request.method != "POST":
+        return redirect("academico:boletin_selector")
+
+    anio_id    = request.POST.get("anio")
+    curso_id   = request.POST.get("curso")
+    periodo_id = request.POST.get("periodo")
+    est_ids    = request.POST.getlist("estudiantes")
+    formato    = request.POST.get("formato") or "zip"   # "zip" | "pdf"
+    duplex     = request.POST.get("duplex") == "1"
+
+    if not (anio_id and curso_id and periodo_id):
+        messages.error(request, "Faltan parámetros (año, curso, periodo).")
+        return redirect("academico:boletin_selector")
+
+    if not est_ids:
+        messages.warning(request, "No seleccionó ningún estudiante.")
+        url = f"{reverse('academico:boletin_selector')}?anio={anio_id}&curso={curso_id}&periodo={periodo_id}"
+        return redirect(url)
+
+    anio    = get_object_or_404(AnioLectivo, pk=anio_id)
+    curso   = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
+    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
+
+    estudiantes = (
+        Estudiante.objects
+        .filter(id__in=est_ids, curso=curso, school=request.school)         # 👈
+        .order_by("apellidos", "nombres")
+    )
+    contextos = _contextos_boletin(request, anio, curso, periodo, estudiantes)
+
+    if formato == "pdf":
+        pdf_bytes = _boletin_curso_pdf_bytes(request, contextos, curso, periodo, duplex=duplex)
+        filename_pdf = f"Boletines_{curso.grado}_{curso.nombre}_{periodo.nombre}.pdf"
+        response = HttpResponse(pdf_bytes, content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename=\"{filename_pdf}\"'
+        return response
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for est, ctx in contextos:
+            pdf_bytes = _boletin_pdf_bytes(request, ctx)
+            filename = f"Boletin_{est.apellidos}_{est.nombres}_{periodo.nombre}.pdf"
+            zip_file.writestr(filename, pdf_bytes)
+
+    buffer.seek(0)
+    filename_zip = f"Boletines_{curso.grado}_{curso.nombre}_{periodo.nombre}.zip"
+    response = HttpResponse(buffer.getvalue(), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename=\"{filename_zip}\"'
+    return response
+
+def boletin_trimestral(request, estudiante_id, anio_id, trimestre):
+    estudiante = get_object_or_404(Estudiante, pk=estudiante_id, school=request.school)  # 👈
+    anio = get_object_or_404(AnioEconomico, pk=anio_id)
+
+    resumen = resumen_cartera_para_boletin(estudiante, anio, int(trimestre))
+    if resumen is None:
+        raise Http404("El colegio no tiene configurado ese trimestre.")
+
+    if not resumen["puede_ver"]:
+        # Vista bloqueada
+        return render(
+            request,
+            "academico/boletin_bloqueado_cartera.html",
+            {
+                "estudiante": estudiante,
+                "trimestre": trimestre,
+                **resumen,
+            },
+        )
+    return render(
+        request,
+        "academico/boletin_trimestral.html",
+        {
+            "estudiante": estudiante,
+            "trimestre": trimestre,
+            "anio": anio,
+        },
+    )
+
+@requiere_gestion
+def boletin_selector(request):
+    anio_id = (request.GET.get("anio") or "").strip()
+    curso_id = (request.GET.get("curso") or "").strip()
+    periodo_id = (request.GET.get("periodo") or "").strip()
+
+    anios = AnioLectivo.objects.all().order_by("-activo", "-nombre")
 
     if anio_id:
         cursos = (
@@ -1751,6 +2482,24 @@ def boletin_selector(request):
             .order_by("apellidos", "nombres")
         )
 
+    # Cartera del trimestre (período N = trimestre N) para todo el curso
+    bloqueados = 0
+    con_cartera = False
+    if estudiantes and periodo_id.isdigit():
+        periodo = Periodo.objects.select_related("anio").filter(pk=periodo_id).first()
+        anio_eco = periodo and AnioEconomico.objects.filter(
+            school=request.school, nombre=periodo.anio.nombre                 # 👈
+        ).first()
+        if anio_eco:
+            con_cartera = True
+            estudiantes = list(estudiantes)
+            estado = estado_cartera_estudiantes(
+                [e.id for e in estudiantes], anio_eco, periodo.numero, request.school
+            )
+            for e in estudiantes:
+                e.cartera = estado.get(e.id)
+            bloqueados = sum(1 for v in estado.values() if v["bloqueado"])
+
     # 👉 aquí defines quién puede descargar masivo
     tiene_permiso_masivo = (
         request.user.is_superuser
@@ -1767,12 +2516,15 @@ def boletin_selector(request):
         "curso_selected": curso_id,
         "periodo_selected": periodo_id,
         "estudiantes": estudiantes,
+        "bloqueados_cartera": bloqueados,
+        "con_cartera": con_cartera,
         "tiene_permiso_masivo": tiene_permiso_masivo,
         "nav_active": "academico",
     }
     return render(request, "academico/boletin_selector.html", ctx)
 
 @requiere_gestion
+@_si_falla_pdf("academico:boletin_selector")
 def boletin_generar(request):
     anio_id = request.GET.get("anio")
     curso_id = request.GET.get("curso")
@@ -1782,7 +2534,7 @@ def boletin_generar(request):
         messages.error(request, "Debes seleccionar año, curso y periodo.")
         return redirect("academico:boletin_selector")
 
-    periodo = get_object_or_404(Periodo, pk=periodo_id)
+    periodo = get_object_or_404(Periodo.objects.select_related("anio"), pk=periodo_id, anio_id=anio_id)
     curso = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
     estudiantes = (
         Estudiante.objects
@@ -1792,42 +2544,11 @@ def boletin_generar(request):
 
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="boletines_{curso}_{periodo}.pdf"'
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-
-    for est in estudiantes:
-        story.append(Paragraph(f"<b>Estudiante:</b> {est.nombres} {est.apellidos}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Curso:</b> {curso}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Periodo:</b> {periodo.nombre}", styles["Normal"]))
-        story.append(Spacer(1, 10))
 
-        data = [["Asignatura", "Logro", "Nota", "Peso %"]]
-        calificaciones = (
-            CalificacionLogro.objects
-            .filter(estudiante=est, logro__periodo=periodo)
-            .select_related("logro__oferta__asignatura")
-        )
-        for c in calificaciones:
-            data.append([
-                c.logro.oferta.asignatura.nombre,
-                c.logro.titulo,
-                f"{c.nota:.2f}",
-                f"{c.logro.peso}%",
-            ])
-        if len(data) == 1:
-            data.append(["Sin calificaciones registradas", "", "", ""])
-
-        table = Table(data, colWidths=[130, 250, 60, 60])
-        table.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-            ("ALIGN", (2, 1), (3, -1), "CENTER"),
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 20))
-
-    doc.build(story)
+    # Datos de todo el curso precargados una vez; el motor rápido pinta
+    # cada boletín apenas se arma su contexto.
+    contextos = _contextos_boletin(request, periodo.anio, curso, periodo, estudiantes)
+    _escribir_boletines_pdf(request, contextos, response, curso, periodo)
     return response
 
 from .models import (
@@ -1838,19 +2559,17 @@ from .models import (
 )
 
 # y helpers que ya usas en otros lados (PDF):
-# _promedio_asignatura_periodo, _concepto_letra,
-# ranking_curso_periodo, ranking_curso_anual, _puede_gestionar
+# _promedio_asignatura_periodo, _concepto_letra, _puede_gestionar
 
-@requiere_gestion
-def boletin_estudiante(request):
+def _objetos_boletin(request):
+    """(anio, curso, periodo, estudiante) desde el querystring, o None si faltan parámetros."""
     anio_id    = request.GET.get("anio")
     curso_id   = request.GET.get("curso")
     periodo_id = request.GET.get("periodo")
     est_id     = request.GET.get("estudiante")
 
     if not (anio_id and curso_id and periodo_id and est_id):
-        messages.error(request, "Faltan parámetros (año, curso, periodo, estudiante).")
-        return redirect("academico:boletin_selector")
+        return None
 
     anio    = get_object_or_404(AnioLectivo, pk=anio_id)
     curso   = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
@@ -1861,112 +2580,22 @@ def boletin_estudiante(request):
         curso=curso,
         school=request.school,                                             # 👈
     )
+    return anio, curso, periodo, est
 
-    # ====== OFERTAS (asignaturas del curso en ese año) ======
-    ofertas = (
-        AsignaturaOferta.objects
-        .select_related("asignatura", "docente")
-        .filter(anio=anio, curso=curso)
-        .order_by("asignatura__area", "asignatura__nombre")
-    )
-
-    # ====== RESUMEN DE TRES TRIMESTRES ======
-    periodos_anio = list(
-        Periodo.objects.filter(anio=anio).order_by("numero")[:3]
-    )
-
-    resumen_asignaturas = []
-
-    for of in ofertas:
-        fila_resumen = {
-            "asignatura": of.asignatura.nombre,
-        }
-        proms_validos = []
-
-        for idx, per in enumerate(periodos_anio, start=1):
-            prom_p = _promedio_asignatura_periodo(est, of, per)
-            clave = f"p{idx}"  # p1, p2, p3
-            fila_resumen[clave] = prom_p
-            if prom_p is not None:
-                proms_validos.append(prom_p)
-
-        prom_final = None
-        if proms_validos:
-            prom_final = (sum(proms_validos) / len(proms_validos)).quantize(Decimal("0.01"))
-
-        fila_resumen["prom_final"]  = prom_final
-        fila_resumen["letra_final"] = _concepto_letra(prom_final)
-
-        resumen_asignaturas.append(fila_resumen)
-
-    # Promedios globales por trimestre
-    promedios_trimestre = []
-    for per in periodos_anio:
-        notas = []
-        for of in ofertas:
-            p = _promedio_asignatura_periodo(est, of, per)
-            if p is not None:
-                notas.append(p)
-        prom = None
-        if notas:
-            prom = (sum(notas) / len(notas)).quantize(Decimal("0.01"))
-        promedios_trimestre.append(prom)
-
-    # Promedio anual
-    notas_validas  = [p for p in promedios_trimestre if p is not None]
-    promedio_anual = None
-    if notas_validas:
-        promedio_anual = (sum(notas_validas) / len(notas_validas)).quantize(Decimal("0.01"))
-
-    # === NUEVO: mapa asignatura -> resumen (para la tabla tipo PDF) ===
-    resumen_por_asig = {r["asignatura"]: r for r in resumen_asignaturas}
-
-    # ====== AGRUPAR POR ÁREA (logros + notas del periodo actual) ======
-    areas_dict = defaultdict(list)
-
-    for of in ofertas:
-        area_nombre = of.asignatura.area or "Otras áreas"
 
-        logros = Logro.objects.filter(oferta=of, periodo=periodo).order_by("titulo")
-        cals = (
-            CalificacionLogro.objects
-            .filter(estudiante=est, logro__in=logros)
-            .select_related("logro")
-        )
-
-        detalle = []
-        suma_pesada = Decimal("0")
-        suma_pesos  = Decimal("0")
-        notas_por_logro = {c.logro_id: c.nota for c in cals}
-
-        for lg in logros:
-            nota = notas_por_logro.get(lg.id)
-            detalle.append({"titulo": lg.titulo, "peso": lg.peso, "nota": nota})
-            if nota is not None:
-                suma_pesada += Decimal(nota) * (lg.peso / Decimal("100"))
-                suma_pesos  += (lg.peso / Decimal("100"))
-
-        promedio = None
-        if suma_pesos > 0:
-            promedio = (suma_pesada / suma_pesos).quantize(Decimal("0.01"))
-
-        fila = {
-            "asignatura": of.asignatura.nombre,
-            "docente": f"{of.docente.apellidos} {of.docente.nombres}" if of.docente else "—",
-            "promedio": promedio,
-            "letra": _concepto_letra(promedio),
-            "detalle": detalle,
-        }
-
-        areas_dict[area_nombre].append(fila)
-
-    areas = [
-        {"nombre": nombre, "filas": filas}
-        for nombre, filas in areas_dict.items()
-    ]
-    areas.sort(key=lambda a: a["nombre"])
+@requiere_gestion
+def boletin_estudiante(request):
+    """
+    Encabezado, resumen de notas, asistencia y observación. El detalle de
+    logros por área y los puestos se piden aparte (boletin_estudiante_area y
+    boletin_estudiante_puestos), así la página llega antes.
+    """
+    objetos = _objetos_boletin(request)
+    if objetos is None:
+        messages.error(request, "Faltan parámetros (año, curso, periodo, estudiante).")
+        return redirect("academico:boletin_selector")
+    anio, curso, periodo, est = objetos
 
-    # ====== OBSERVADOR ======
     observaciones = (
         Observador.objects
         .filter(
@@ -1977,22 +2606,27 @@ def boletin_estudiante(request):
         .order_by("fecha")
     )
 
-    # ====== ASISTENCIA ======
-    total_fallas_periodo = AsistenciaDetalle.objects.filter(
-        estudiante=est,
-        estado=AsistenciaDetalle.AUSENTE,
-        pase__anio=anio,
-        pase__curso=curso,
-        pase__periodo=periodo,
-    ).count()
+    # ====== PERÍODO CERRADO: boletín congelado (completo, sin fragmentos) ======
+    snap = snapshot_boletin(est, periodo)
+    if snap:
+        ctx = contexto_desde_snapshot(
+            snap, anio=anio, curso=curso, periodo=periodo, estudiante=est,
+        )
+        ctx.update({
+            "observaciones": observaciones,
+            "es_docente": _puede_gestionar(request.user),
+        })
+        return render(request, "academico/boletin_estudiante.html", ctx)
 
-    total_tardanzas_periodo = AsistenciaDetalle.objects.filter(
-        estudiante=est,
-        estado=AsistenciaDetalle.TARDANZA,
-        pase__anio=anio,
-        pase__curso=curso,
-        pase__periodo=periodo,
-    ).count()
+    # ====== RESUMEN DE TRES TRIMESTRES (sólo las notas de este estudiante) ======
+    datos = DatosNotasCurso(anio, curso, estudiantes=[est])
+    resumen_asignaturas, promedios_trimestre, promedio_anual = resumen_estudiante(datos, est.id)
+
+    # Nombres de área, para pedir el detalle de logros de cada una
+    nombres_areas = sorted({of.asignatura.area or "Otras áreas" for of in datos.ofertas})
+
+    # ====== ASISTENCIA ======
+    asistencia = contadores_periodo([est.id], anio, periodo).get(est.id, {})
 
     # ====== OBSERVACIÓN GENERAL ======
     obs_general = ObservacionBoletin.objects.filter(
@@ -2000,268 +2634,174 @@ def boletin_estudiante(request):
         periodo=periodo
     ).first()
 
-    # ====== PUESTOS POR TRIMESTRE Y ANUAL ======
-    puestos_trimestres = []
-    for per in periodos_anio:
-        mapa_puestos = ranking_curso_periodo(anio, curso, per)  # {est_id: puesto}
-        puestos_trimestres.append(mapa_puestos)
-
-    puesto_p1 = puestos_trimestres[0].get(est.id) if len(puestos_trimestres) > 0 else None
-    puesto_p2 = puestos_trimestres[1].get(est.id) if len(puestos_trimestres) > 1 else None
-    puesto_p3 = puestos_trimestres[2].get(est.id) if len(puestos_trimestres) > 2 else None
-
-    puestos_anual = ranking_curso_anual(anio, curso)  # {est_id: puesto}
-    puesto_final  = puestos_anual.get(est.id)
-
     ctx = {
         "anio": anio,
         "curso": curso,
         "periodo": periodo,
         "estudiante": est,
-        "areas": areas,
+        "nombres_areas": nombres_areas,
+        "diferido": True,
         "observaciones": observaciones,
         "es_docente": _puede_gestionar(request.user),
 
-        "total_fallas_periodo": total_fallas_periodo,
-        "total_tardanzas_periodo": total_tardanzas_periodo,
+        "total_fallas_periodo": asistencia.get("fallas", 0),
+        "total_tardanzas_periodo": asistencia.get("tardanzas", 0),
 
         "resumen_asignaturas": resumen_asignaturas,
-        "resumen_por_asig": resumen_por_asig,
+        "resumen_por_asig": {r["asignatura"]: r for r in resumen_asignaturas},
         "promedios_trimestre": promedios_trimestre,
         "promedio_anual": promedio_anual,
 
         "obs_general": obs_general,
-        "puesto_p1": puesto_p1,
-        "puesto_p2": puesto_p2,
-        "puesto_p3": puesto_p3,
-        "puesto_final": puesto_final,
     }
     return render(request, "academico/boletin_estudiante.html", ctx)
 
-def boletin_estudiante_pdf(request):
-    anio_id     = request.GET.get("anio")
-    curso_id    = request.GET.get("curso")
-    periodo_id  = request.GET.get("periodo")
-    est_id      = request.GET.get("estudiante")
-
-    # ------------------ Validación de parámetros ------------------
-    if not (anio_id and curso_id and periodo_id and est_id):
-        messages.error(request, "Faltan parámetros para generar el boletín en PDF.")
-        return redirect("academico:boletin_selector")
-
-    # ------------------ Objetos base ------------------
-    anio    = get_object_or_404(AnioLectivo, pk=anio_id)
-    curso   = get_object_or_404(Curso, pk=curso_id)
-    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
-    est     = get_object_or_404(Estudiante, pk=est_id, curso=curso)
 
-    ofertas = (
-        AsignaturaOferta.objects
-        .select_related("asignatura", "docente")
-        .filter(anio=anio, curso=curso)
-        .order_by("asignatura__area", "asignatura__nombre")
-    )
+@requiere_gestion
+def boletin_estudiante_area(request):
+    """Fragmento HTML: logros del período para un área (``?area=``) o todas."""
+    objetos = _objetos_boletin(request)
+    if objetos is None:
+        return HttpResponseBadRequest("Faltan parámetros (año, curso, periodo, estudiante).")
+    anio, curso, periodo, est = objetos
+    area = request.GET.get("area")
+
+    snap = snapshot_boletin(est, periodo)
+    if snap:
+        ctx = contexto_desde_snapshot(snap)
+        areas = [a for a in ctx["areas"] if area is None or a["nombre"] == area]
+        return render(request, "academico/partials/boletin_areas.html", {
+            "areas": areas, "resumen_por_asig": ctx["resumen_por_asig"],
+        })
 
-    # ========================================
-    #   RESUMEN DE TRES TRIMESTRES
-    # ========================================
-    periodos_anio = list(
-        Periodo.objects.filter(anio=anio).order_by("numero")[:3]
-    )
+    clave = clave_notas_curso(curso.id, "area", est.id, periodo.id, area or "*")
+    html = cache.get(clave)
+    if html is None:
+        datos = DatosNotasCurso(anio, curso, periodos_extra=[periodo], estudiantes=[est])
+        resumen_asignaturas, _, _ = resumen_estudiante(datos, est.id)
+        html = render_to_string("academico/partials/boletin_areas.html", {
+            "areas": areas_estudiante(datos, est.id, periodo, area=area),
+            "resumen_por_asig": {r["asignatura"]: r for r in resumen_asignaturas},
+        })
+        cache.set(clave, html, BOLETIN_CACHE_TIMEOUT)
+    return HttpResponse(html)
 
-    resumen_asignaturas = []
 
-    for of in ofertas:
-        fila_res = {
-            "asignatura": of.asignatura.nombre,
-            "p1": None,
-            "p2": None,
-            "p3": None,
+@requiere_gestion
+def boletin_estudiante_puestos(request):
+    """Fragmento HTML: promedios generales con los puestos del estudiante en el curso."""
+    objetos = _objetos_boletin(request)
+    if objetos is None:
+        return HttpResponseBadRequest("Faltan parámetros (año, curso, periodo, estudiante).")
+    anio, curso, periodo, est = objetos
+
+    snap = snapshot_boletin(est, periodo)
+    if snap:
+        return render(request, "academico/partials/boletin_puestos.html", contexto_desde_snapshot(snap))
+
+    # El ranking es del curso entero: se calcula una vez y lo comparten todos sus boletines
+    clave = clave_notas_curso(curso.id, "puestos", anio.id)
+    calculado = cache.get(clave)
+    if calculado is None:
+        datos = DatosNotasCurso(anio, curso)
+        calculado = {
+            "puestos": puestos_curso(datos),
+            "promedios": {e_id: resumen_estudiante(datos, e_id)[1:] for e_id in datos.estudiantes_ids},
         }
+        cache.set(clave, calculado, BOLETIN_CACHE_TIMEOUT)
 
-        proms_validos = []
-
-        for idx, per in enumerate(periodos_anio, start=1):
-            prom_p = _promedio_asignatura_periodo(est, of, per)
-            clave = f"p{idx}"
-            fila_res[clave] = prom_p
-            if prom_p is not None:
-                proms_validos.append(prom_p)
-
-        prom_final = None
-        if proms_validos:
-            prom_final = (sum(proms_validos) / len(proms_validos)).quantize(Decimal("0.01"))
-
-        fila_res["prom_final"]  = prom_final
-        fila_res["letra_final"] = _concepto_letra(prom_final)
-
-        resumen_asignaturas.append(fila_res)
-
-    # Promedios globales por trimestre
-    promedios_trimestre = []
-    for per in periodos_anio:
-        notas = []
-        for of in ofertas:
-            p = _promedio_asignatura_periodo(est, of, per)
-            if p is not None:
-                notas.append(p)
-        prom = None
-        if notas:
-            prom = (sum(notas) / len(notas)).quantize(Decimal("0.01"))
-        promedios_trimestre.append(prom)
-
-    # Promedio anual
-    notas_validas  = [p for p in promedios_trimestre if p is not None]
-    promedio_anual = None
-    if notas_validas:
-        promedio_anual = (sum(notas_validas) / len(notas_validas)).quantize(Decimal("0.01"))
-
-    puestos_trimestres = []
-    for per in periodos_anio:
-        mapa_puestos = ranking_curso_periodo(anio, curso, per)
-        puestos_trimestres.append(mapa_puestos)
-
-    puesto_p1 = puestos_trimestres[0].get(est.id) if len(puestos_trimestres) > 0 else None
-    puesto_p2 = puestos_trimestres[1].get(est.id) if len(puestos_trimestres) > 1 else None
-    puesto_p3 = puestos_trimestres[2].get(est.id) if len(puestos_trimestres) > 2 else None
-
-    puestos_anual = ranking_curso_anual(anio, curso)
-    puesto_final = puestos_anual.get(est.id)
+    puestos = [p.get(est.id) for p in calculado["puestos"]["periodos"]] + [None, None, None]
+    promedios_trimestre, promedio_anual = calculado["promedios"].get(est.id, ([], None))
+    return render(request, "academico/partials/boletin_puestos.html", {
+        "promedios_trimestre": promedios_trimestre,
+        "promedio_anual": promedio_anual,
+        "puesto_p1": puestos[0],
+        "puesto_p2": puestos[1],
+        "puesto_p3": puestos[2],
+        "puesto_final": calculado["puestos"]["anual"].get(est.id),
+    })
 
-    # ========================================
-    #   ÁREAS / ASIGNATURAS (detalle por logros)
-    # ========================================
-    areas_dict = defaultdict(list)
+@requiere_gestion
+def boletin_consolidado(request):
+    """
+    Consolidado del curso: estudiantes × asignaturas × períodos y final, con
+    puesto y asignaturas perdidas. ?formato=xlsx o pdf para descargarlo.
+    Se calcula una vez por versión de notas del curso.
+    """
+    anio_id = request.GET.get("anio")
+    curso_id = request.GET.get("curso")
+    if not (anio_id and curso_id):
+        messages.error(request, "Selecciona año y curso para ver el consolidado.")
+        return redirect("academico:boletin_selector")
 
-    for of in ofertas:
-        area_nombre = of.asignatura.area or "Otras áreas"
+    anio = get_object_or_404(AnioLectivo, pk=anio_id)
+    curso = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
 
-        logros = Logro.objects.filter(oferta=of, periodo=periodo).order_by("titulo")
-        cals = (
-            CalificacionLogro.objects
-            .filter(estudiante=est, logro__in=logros)
-            .select_related("logro")
+    clave = clave_notas_curso(curso.id, "consolidado", anio.id)
+    consolidado = cache.get(clave)
+    if consolidado is None:
+        consolidado = consolidado_curso(anio, curso)
+        cache.set(clave, consolidado, BOLETIN_CACHE_TIMEOUT)
+
+    titulo = f"Consolidado {curso.grado} - {curso.nombre} · {anio.nombre}"
+    nombre = slugify(f"consolidado {curso.grado} {curso.nombre} {anio.nombre}")
+    formato = request.GET.get("formato")
+
+    if formato == "xlsx":
+        archivo = tempfile.SpooledTemporaryFile(max_size=2 * 1024 * 1024)
+        escribir_consolidado_xlsx(archivo, titulo, consolidado)
+        archivo.seek(0)
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=f"{nombre}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
 
-        detalle = []
-        suma_pesada = Decimal("0")
-        suma_pesos  = Decimal("0")
-        notas_por_logro = {c.logro_id: c.nota for c in cals}
-
-        for lg in logros:
-            nota = notas_por_logro.get(lg.id)
-            detalle.append({
-                "titulo": lg.titulo,
-                "peso": lg.peso,
-                "nota": nota,
-            })
-            if nota is not None:
-                suma_pesada += Decimal(nota) * (lg.peso / Decimal("100"))
-                suma_pesos  += (lg.peso / Decimal("100"))
-
-        promedio = None
-        if suma_pesos > 0:
-            promedio = (suma_pesada / suma_pesos).quantize(Decimal("0.01"))
-
-        fila = {
-            "asignatura": of.asignatura.nombre,
-            "docente": f"{of.docente.apellidos} {of.docente.nombres}" if of.docente else "—",
-            "promedio": promedio,
-            "letra": _concepto_letra(promedio),
-            "detalle": detalle,
-        }
-        areas_dict[area_nombre].append(fila)
+    ctx = {
+        "anio": anio,
+        "curso": curso,
+        "titulo": titulo,
+        "consolidado": consolidado,
+        "nav_active": "academico",
+    }
 
-    areas = [
-        {"nombre": nombre, "filas": filas}
-        for nombre, filas in areas_dict.items()
-    ]
-    areas.sort(key=lambda a: a["nombre"])
+    if formato == "pdf":
+        html = render_to_string("academico/consolidado_pdf.html", ctx, request=request)
+        response = HttpResponse(content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="{nombre}.pdf"'
+        html_a_pdf(html, base_url=request.build_absolute_uri("/"), destino=response, hojas=("consolidado",))
+        return response
 
-    # Observación general
-    obs_general = ObservacionBoletin.objects.filter(
-        estudiante=est,
-        periodo=periodo
-    ).first()
-
-    # ========= RESUMEN DE FALLAS DEL PERÍODO =========
-    total_fallas_periodo = AsistenciaDetalle.objects.filter(
-        estudiante=est,
-        estado=AsistenciaDetalle.AUSENTE,
-        pase__anio=anio,
-        pase__curso=curso,
-        pase__periodo=periodo,
-    ).count()
-    total_tardanzas_periodo = AsistenciaDetalle.objects.filter(
-        estudiante=est,
-        estado=AsistenciaDetalle.TARDANZA,
-        pase__anio=anio,
-        pase__curso=curso,
-        pase__periodo=periodo,
-    ).count()
-
-    # ========= DOCENTE CURSO Y RECTOR ACTIVO =========
-    docente_curso = Docente.objects.filter(curso_asignado=curso).first()
-    if docente_curso:
-        docente_nombre = f"{docente_curso.nombres} {docente_curso.apellidos}".upper()
-    else:
-        docente_nombre = "DOCENTE"
+    return render(request, "academico/consolidado_curso.html", ctx)
 
-    rector_user = (
-        User.objects
-        .filter(is_active=True, groups__name="Rector")
-        .select_related("docente")
-        .first()
-    )
-    if rector_user:
-        if hasattr(rector_user, "docente"):
-            rector_nombre = f"{rector_user.docente.nombres} {rector_user.docente.apellidos}".upper()
-        else:
-            rector_nombre = (rector_user.get_full_name() or rector_user.username).upper()
-    else:
-        rector_nombre = "RECTOR(A)"
+@_si_falla_pdf("academico:boletin_selector")
+def boletin_estudiante_pdf(request):
+    anio_id     = request.GET.get("anio")
+    curso_id    = request.GET.get("curso")
+    periodo_id  = request.GET.get("periodo")
+    est_id      = request.GET.get("estudiante")
 
-    resumen_por_asig = {r["asignatura"]: r for r in resumen_asignaturas}
+    # ------------------ Validación de parámetros ------------------
+    if not (anio_id and curso_id and periodo_id and est_id):
+        messages.error(request, "Faltan parámetros para generar el boletín en PDF.")
+        return redirect("academico:boletin_selector")
 
-    # ========= COLEGIO (multi-colegio) =========
-    # Ajusta esta parte a cómo obtienes el colegio actual
-    colegio = getattr(request, "colegio", None)  # o request.colegio_actual, o est.colegio, etc.
+    # ------------------ Objetos base ------------------
+    anio    = get_object_or_404(AnioLectivo, pk=anio_id)
+    curso   = get_object_or_404(Curso, pk=curso_id)
+    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
+    est     = get_object_or_404(Estudiante, pk=est_id, curso=curso)
 
-    # Logo y sello dinámicos por colegio, con fallback al estático
-    if colegio and getattr(colegio, "logo", None):
-        logo_url = request.build_absolute_uri(colegio.logo.url)
-    else:
-        logo_url = request.build_absolute_uri(static("img/logo.png"))
+    filename = f"boletin_{est.apellidos}_{est.nombres}_{periodo.nombre}.pdf"
 
-    if colegio and getattr(colegio, "sello", None):
-        sello_url = request.build_absolute_uri(colegio.sello.url)
-    else:
-        sello_url = request.build_absolute_uri(static("img/sello.png"))
+    # Período cerrado con PDF ya generado: se entrega tal cual
+    snap = snapshot_boletin(est, periodo)
+    if snap and snap.pdf:
+        return FileResponse(snap.pdf.open("rb"), filename=filename, content_type="application/pdf")
 
-    # ========= Contexto para el template HTML =========
-    ctx = {
-        "anio": anio,
-        "curso": curso,
-        "periodo": periodo,
-        "estudiante": est,
-        "areas": areas,
-        "obs_general": obs_general,
-        "total_fallas_periodo": total_fallas_periodo,
-        "total_tardanzas_periodo": total_tardanzas_periodo,
-        "resumen_asignaturas": resumen_asignaturas,
-        "resumen_por_asig": resumen_por_asig,
-        "promedios_trimestre": promedios_trimestre,
-        "promedio_anual": promedio_anual,
-        "docente_nombre": docente_nombre,
-        "rector_nombre": rector_nombre,
-        "logo_url": logo_url,
-        "sello_url": sello_url,
-        "puesto_p1": puesto_p1,
-        "puesto_p2": puesto_p2,
-        "puesto_p3": puesto_p3,
-        "puesto_final": puesto_final,
-        "colegio": colegio,  # para usar {{ colegio.nombre }}, {{ colegio.lema }}, etc. en el template
-    }
+    # Notas, promedios, puestos, asistencia y firmas (ver academico/utils_boletin.py)
+    _, ctx = next(_contextos_boletin(request, anio, curso, periodo, [est]))
 
     # =============== GENERAR PDF CON WEASYPRINT ===============
     html_string = render_to_string(
@@ -2271,10 +2811,15 @@ def boletin_estudiante_pdf(request):
     )
 
     response = HttpResponse(content_type="application/pdf")
-    filename = f"boletin_{est.apellidos}_{est.nombres}_{periodo.nombre}.pdf"
     response["Content-Disposition"] = f'inline; filename="{filename}"'
 
-    HTML(string=html_string, base_url=request.build_absolute_uri("/")).write_pdf(response)
+    # Logo, sello y foto se leen del disco (no por HTTP al mismo servidor)
+    html_a_pdf(
+        html_string,
+        base_url=request.build_absolute_uri("/"),
+        destino=response,
+        hojas=("boletin",),
+    )
     return response
 
 @requiere_gestion
@@ -2295,7 +2840,9 @@ def observacion_nueva(request):
     if request.method == "POST":
         texto = (request.POST.get("detalle") or "").strip()
 
-        if not texto:
+        if periodo_cerrado(request.school, periodo):
+            messages.error(request, "El período está cerrado: reábrelo para modificar el boletín.")
+        elif not texto:
             messages.error(request, "Escribe alguna observación antes de guardar.")
         else:
             obj, created = ObservacionBoletin.objects.update_or_create(
@@ -2327,6 +2874,64 @@ def observacion_nueva(request):
     }
     return render(request, "academico/observacion_form.html", ctx)
 
+@requiere_gestion
+def observaciones_curso(request):
+    """
+    Observaciones del período de todo el curso en una página: se cargan en
+    una consulta y se guardan juntas (ver utils_boletin.guardar_observaciones).
+    """
+    anio_id = request.GET.get("anio")
+    curso_id = request.GET.get("curso")
+    periodo_id = request.GET.get("periodo")
+    if not (anio_id and curso_id and periodo_id):
+        messages.error(request, "Selecciona año, curso y período para editar las observaciones.")
+        return redirect("academico:boletin_selector")
+
+    anio = get_object_or_404(AnioLectivo, pk=anio_id)
+    curso = get_object_or_404(Curso, pk=curso_id, school=request.school)  # 👈
+    periodo = get_object_or_404(Periodo, pk=periodo_id, anio=anio)
+    cerrado = periodo_cerrado(request.school, periodo)
+
+    estudiantes = list(
+        Estudiante.objects.filter(curso=curso, school=request.school).order_by("apellidos", "nombres")
+    )
+    existentes = {
+        o.estudiante_id: o
+        for o in ObservacionBoletin.objects.filter(estudiante__in=estudiantes, periodo=periodo)
+    }
+
+    if request.method == "POST":
+        if cerrado:
+            messages.error(request, "El período está cerrado: reábrelo para modificar el boletín.")
+        else:
+            textos = {
+                est.id: request.POST[f"obs_{est.id}"]
+                for est in estudiantes
+                if f"obs_{est.id}" in request.POST
+            }
+            docente = Docente.objects.filter(usuario=request.user, school=request.school).first()
+            resultado = guardar_observaciones(periodo, existentes, textos, docente)
+            if resultado["guardadas"] or resultado["borradas"]:
+                messages.success(
+                    request,
+                    f"Observaciones guardadas: {resultado['guardadas']}"
+                    + (f", borradas: {resultado['borradas']}." if resultado["borradas"] else "."),
+                )
+            else:
+                messages.info(request, "No hubo cambios.")
+        return redirect(request.get_full_path())
+
+    filas = [(est, existentes.get(est.id)) for est in estudiantes]
+    return render(request, "academico/observaciones_curso.html", {
+        "anio": anio,
+        "curso": curso,
+        "periodo": periodo,
+        "filas": filas,
+        "cerrado": cerrado,
+        "con_texto": len(existentes),
+        "nav_active": "academico",
+    })
+
 def _promedio_asignatura_periodo(estudiante, oferta, periodo):
     """
     Calcula el promedio (0–5) de una asignatura para un estudiante
@@ -14,7 +14,7 @@ from urllib.parse import urljoin
 from django.contrib.auth.decorators import login_required, user_passes_test
 import os
 from django.conf import settings
-from weasyprint import HTML
+from academico.utils_pdf import html_a_pdf
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
 from cuentas.models import PerfilUsuario
@@ -592,9 +592,11 @@ def certificado_pdf(request, tipo, estudiante_id):
 
     if tipo == "estudiantil":
         template_name = "administrativo/certificado_estudiantil.html"
+        hoja = "certificado_estudiantil"
         filename = f"certificado_estudiantil_{estudiante.identificacion}_{anio_num}.pdf"
     elif tipo == "notas":
         template_name = "administrativo/certificado_notas.html"
+        hoja = "certificado_notas"
         filename = f"certificado_notas_{estudiante.identificacion}_{anio_num}.pdf"
         # (tu bloque de notas lo dejas igual)
     else:
@@ -602,8 +604,7 @@ def certificado_pdf(request, tipo, estudiante_id):
         return redirect(reverse("administrativo:certificaciones"))
 
     html_string = render_to_string(template_name, context, request=request)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri("/"))
-    pdf_file = html.write_pdf()
+    pdf_file = html_a_pdf(html_string, base_url=request.build_absolute_uri("/"), hojas=(hoja,))
 
     response = HttpResponse(pdf_file, content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
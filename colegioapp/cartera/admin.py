@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AnioEconomico, ConceptoPago, CuentaPorCobrar, Pago
+from .models import AnioEconomico, ConceptoPago, CuentaPorCobrar, Pago, TrimestreCartera
 
 
 @admin.register(AnioEconomico)
@@ -53,3 +53,10 @@ class PagoAdmin(admin.ModelAdmin):
     date_hierarchy = 'fecha_pago'
     ordering = ('-fecha_pago',)
     readonly_fields = ('fecha_pago',)
+
+
+@admin.register(TrimestreCartera)
+class TrimestreCarteraAdmin(admin.ModelAdmin):
+    list_display = ('school', 'numero', 'meses', 'mes_limite', 'dia_limite', 'exige_todo_el_anio')
+    list_filter = ('school',)
+    ordering = ('school', 'numero')
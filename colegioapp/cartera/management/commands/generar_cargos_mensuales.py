@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cartera.models import AnioEconomico
+from cartera.utils import generar_cargos_mensuales
+from myapp.models import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera los cargos de los conceptos recurrentes para todos los estudiantes "
+        "con curso de un colegio. Lo ya generado no se duplica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--colegio", type=int, required=True, help="Id del colegio.")
+        parser.add_argument("--anio", type=int, help="Id del año económico (por defecto, el activo).")
+        parser.add_argument("--meses", required=True, help="Meses separados por coma, p. ej. 2,3,4 o 2-11.")
+        parser.add_argument("--simular", action="store_true", help="Sólo muestra lo que se crearía.")
+
+    def _meses(self, texto):
+        meses = set()
+        try:
+            for parte in texto.split(","):
+                desde, _, hasta = parte.strip().partition("-")
+                meses.update(range(int(desde), int(hasta or desde) + 1))
+        except ValueError:
+            raise CommandError(f"Meses no válidos: {texto}")
+        if not meses or min(meses) < 1 or max(meses) > 12:
+            raise CommandError(f"Meses no válidos: {texto}")
+        return sorted(meses)
+
+    def handle(self, *args, **opts):
+        school = School.objects.filter(pk=opts["colegio"]).first()
+        if school is None:
+            raise CommandError(f"No existe el colegio {opts['colegio']}.")
+
+        anios = AnioEconomico.objects.filter(school=school)
+        anio = anios.filter(pk=opts["anio"]).first() if opts["anio"] else anios.filter(activo=True).first()
+        if anio is None:
+            raise CommandError("No se encontró el año económico.")
+
+        resumen = generar_cargos_mensuales(school, anio, self._meses(opts["meses"]), simular=opts["simular"])
+
+        for fila in resumen["filas"]:
+            self.stdout.write(
+                f"{fila['concepto'].nombre:<30} mes {fila['mes']:>2}: "
+                f"{fila['nuevos']:>5} nuevos, {fila['existentes']:>5} existentes, ${fila['valor']}"
+            )
+        verbo = "Se crearían" if opts["simular"] else "Se crearon"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verbo} {resumen['nuevos']} cargos para {resumen['estudiantes']} estudiantes "
+            f"({resumen['existentes']} ya existían, ${resumen['valor']})."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cartera.utils import recalcular_deuda_bloqueante
+from myapp.models import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cuándo cada estudiante tiene deuda vencida que bloquea el "
+        "boletín. Pensado para correr cada noche (cron) y corregir lo escrito sin señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--colegio", type=int, help="Id del colegio (por defecto, todos).")
+
+    def handle(self, *args, **opts):
+        school = None
+        if opts["colegio"]:
+            school = School.objects.filter(pk=opts["colegio"]).first()
+            if school is None:
+                raise CommandError(f"No existe el colegio {opts['colegio']}.")
+
+        cambiados = recalcular_deuda_bloqueante(school)
+        self.stdout.write(self.style.SUCCESS(f"Estudiantes actualizados: {cambiados}"))
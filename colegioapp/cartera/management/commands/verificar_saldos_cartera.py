@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cartera.utils import cuadrar_saldos, cuentas_descuadradas
+from myapp.models import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el saldo de cada cuenta por cobrar con la suma de sus pagos "
+        "(saldo = valor total - pagos) y lista las que no cuadran. "
+        "Con --corregir recalcula el saldo desde los pagos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--colegio", type=int, help="Id del colegio (por defecto, todos).")
+        parser.add_argument("--corregir", action="store_true", help="Recalcula saldo y pagada de las cuentas descuadradas.")
+        parser.add_argument("--limite", type=int, default=50, help="Cuántas cuentas listar.")
+
+    def handle(self, *args, **opts):
+        school = None
+        if opts["colegio"]:
+            school = School.objects.filter(pk=opts["colegio"]).first()
+            if school is None:
+                raise CommandError(f"No existe el colegio {opts['colegio']}.")
+
+        descuadradas = list(
+            cuentas_descuadradas(school)
+            .select_related("estudiante", "concepto")
+            .order_by("pk")
+        )
+        if not descuadradas:
+            self.stdout.write(self.style.SUCCESS("Todas las cuentas cuadran con sus pagos."))
+            return
+
+        for c in descuadradas[:opts["limite"]]:
+            self.stdout.write(
+                f"#{c.pk} {c.estudiante} · {c.concepto.nombre}: total {c.valor_total}, "
+                f"pagos {c.pagado}, saldo {c.saldo_pendiente} (debería ser {c.esperado}), "
+                f"pagada={'sí' if c.pagada else 'no'}"
+            )
+        if len(descuadradas) > opts["limite"]:
+            self.stdout.write(f"... y {len(descuadradas) - opts['limite']} más.")
+
+        if opts["corregir"]:
+            n = cuadrar_saldos(c.pk for c in descuadradas)
+            self.stdout.write(self.style.SUCCESS(f"Cuentas corregidas: {n}"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(descuadradas)} cuentas no cuadran. Usa --corregir para recalcularlas desde los pagos."
+            ))
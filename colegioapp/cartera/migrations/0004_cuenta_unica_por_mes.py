@@ -0,0 +1,56 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:46
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def quitar_duplicados(apps, schema_editor):
+    """
+    Antes de la restricción única: de cada (estudiante, concepto, mes)
+    repetido se conserva el cargo con pagos (o el más antiguo) y se borran
+    los demás si no tienen pagos. Si dos repetidos tienen pagos no se puede
+    decidir solo: la migración se detiene.
+    """
+    CuentaPorCobrar = apps.get_model("cartera", "CuentaPorCobrar")
+
+    repetidos = (
+        CuentaPorCobrar.objects
+        .filter(mes__isnull=False)
+        .values("estudiante_id", "concepto_id", "mes")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+    )
+    conflictos = []
+    for grupo in repetidos:
+        cuentas = list(
+            CuentaPorCobrar.objects
+            .filter(estudiante_id=grupo["estudiante_id"], concepto_id=grupo["concepto_id"], mes=grupo["mes"])
+            .annotate(n_pagos=Count("pagos"))
+            .order_by("-n_pagos", "id")
+        )
+        sobrantes = cuentas[1:]
+        if any(c.n_pagos for c in sobrantes):
+            conflictos.append(f"estudiante {grupo['estudiante_id']}, concepto {grupo['concepto_id']}, mes {grupo['mes']}")
+            continue
+        CuentaPorCobrar.objects.filter(pk__in=[c.pk for c in sobrantes]).delete()
+
+    if conflictos:
+        raise RuntimeError(
+            "Hay cargos repetidos con pagos en más de uno; únelos a mano antes de migrar: "
+            + "; ".join(conflictos)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0003_anioeconomico_school_conceptopago_school_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='cuentaporcobrar',
+            unique_together={('estudiante', 'concepto', 'mes')},
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_school_hora_limite_ingreso'),
+        ('cartera', '0004_cuenta_unica_por_mes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrimestreCartera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('meses', models.CharField(help_text='Meses separados por coma. Ej: 2,3,4', max_length=40)),
+                ('mes_limite', models.PositiveSmallIntegerField()),
+                ('dia_limite', models.PositiveSmallIntegerField()),
+                ('exige_todo_el_anio', models.BooleanField(default=False, help_text='Si está marcado, exige estar al día en todo concepto del año (no solo los meses del trimestre).')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trimestres_cartera', to='myapp.school')),
+            ],
+            options={
+                'ordering': ('school', 'numero'),
+                'unique_together': {('school', 'numero')},
+            },
+        ),
+    ]
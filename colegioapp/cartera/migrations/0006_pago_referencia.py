@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartera', '0005_trimestre_cartera'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='referencia',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=80),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from datetime import date
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from academico.models import *
 # Create your models here.
@@ -45,6 +48,54 @@ class ConceptoPago(models.Model):
         return f"{self.nombre} ({self.anio})"
 
 
+class TrimestreCartera(models.Model):
+    """
+    Trimestre de cobro del colegio para el boletín: los meses que deben
+    estar pagos y la fecha límite. Si el colegio no define ninguno se usan
+    los de cartera.utils.TRIMESTRES.
+    """
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name="trimestres_cartera")
+    numero = models.PositiveSmallIntegerField()
+    meses = models.CharField(max_length=40, help_text="Meses separados por coma. Ej: 2,3,4")
+    mes_limite = models.PositiveSmallIntegerField()
+    dia_limite = models.PositiveSmallIntegerField()
+    exige_todo_el_anio = models.BooleanField(
+        default=False,
+        help_text="Si está marcado, exige estar al día en todo concepto del año (no solo los meses del trimestre)."
+    )
+
+    class Meta:
+        unique_together = ("school", "numero")
+        ordering = ("school", "numero")
+
+    def __str__(self):
+        return f"Trimestre {self.numero} ({self.school})"
+
+    @property
+    def lista_meses(self):
+        return [int(m) for m in self.meses.replace(" ", "").split(",") if m]
+
+    def clean(self):
+        try:
+            meses = self.lista_meses
+        except ValueError:
+            raise ValidationError({"meses": "Escribe los meses como números separados por coma."})
+        if not meses or any(m < 1 or m > 12 for m in meses):
+            raise ValidationError({"meses": "Los meses van de 1 a 12."})
+        try:
+            date(2000, self.mes_limite, self.dia_limite)  # año bisiesto: admite 29 de febrero
+        except (TypeError, ValueError):
+            raise ValidationError({"dia_limite": "La fecha límite no es válida."})
+
+    def como_config(self):
+        """Mismo formato que las entradas de TRIMESTRES."""
+        return {
+            "meses": self.lista_meses,
+            "deadline": (self.mes_limite, self.dia_limite),
+            "check_all_concepts": self.exige_todo_el_anio,
+        }
+
+
 class CuentaPorCobrar(models.Model):
     school = models.ForeignKey(
         School,
@@ -62,6 +113,10 @@ class CuentaPorCobrar(models.Model):
     pagada = models.BooleanField(default=False)
     mes = models.PositiveSmallIntegerField(blank=True, null=True)
 
+    class Meta:
+        # un cargo por estudiante, concepto y mes (los cargos sin mes no se restringen)
+        unique_together = ("estudiante", "concepto", "mes")
+
     def __str__(self):
         return f"{self.estudiante} - {self.concepto.nombre} ({self.concepto.anio})"
 
@@ -87,6 +142,8 @@ class Pago(models.Model):
     valor_pagado = models.DecimalField(max_digits=10, decimal_places=2)
     medio_pago = models.CharField(max_length=50)  # libre, lo llenas desde el HTML
     observaciones = models.TextField(blank=True, null=True)
+    # referencia del banco en pagos importados del extracto (evita importarlos dos veces)
+    referencia = models.CharField(max_length=80, blank=True, default="", db_index=True)
 
     def __str__(self):
         return f"Pago {self.valor_pagado} - {self.cuenta.estudiante}"
\ No newline at end of file
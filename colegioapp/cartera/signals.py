@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from academico.utils_cache import invalidar_datos_estudiante
+from .models import ConceptoPago, CuentaPorCobrar, Pago
+from .utils import actualizar_deuda_bloqueante
+
+
+# El portal del estudiante usa la versión de sus datos para el ETag
+# (ver academico/utils_cache.py): cuentas y pagos también la renuevan.
+# Además mantienen Estudiante.deuda_bloqueante_desde, que el portal lee
+# en vez de consultar cartera en cada boletín.
+
+@receiver([post_save, post_delete], sender=CuentaPorCobrar)
+def invalidar_portal_por_cuenta(sender, instance, **kwargs):
+    actualizar_deuda_bloqueante([instance.estudiante_id])
+    invalidar_datos_estudiante(instance.estudiante_id)
+
+
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_portal_por_pago(sender, instance, **kwargs):
+    estudiante_id = (
+        CuentaPorCobrar.objects
+        .filter(pk=instance.cuenta_id)
+        .values_list("estudiante_id", flat=True)
+        .first()
+    )
+    actualizar_deuda_bloqueante([estudiante_id])
+    invalidar_datos_estudiante(estudiante_id)
+
+
+@receiver(post_save, sender=ConceptoPago)
+def recalcular_deuda_por_concepto(sender, instance, created, **kwargs):
+    # pudo cambiar bloquea_boletin: revisar a quienes tienen cargos del concepto
+    if created:
+        return
+    actualizar_deuda_bloqueante(
+        CuentaPorCobrar.objects.filter(concepto=instance).values_list("estudiante_id", flat=True).distinct()
+    )
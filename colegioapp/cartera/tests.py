@@ -1,3 +1,148 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+
+from academico.models import Estudiante
+from cartera.models import AnioEconomico, ConceptoPago, CuentaPorCobrar, Pago
+from cartera.utils import registrar_pago
+from cartera.utils_extracto import contabilizar_extracto, leer_extracto
+from myapp.models import School
+
+
+class PagosConcurrentesTests(TransactionTestCase):
+    """
+    Varios cajeros (hilos, cada uno con su conexión) pagan a la vez la misma
+    cuenta, que alcanza sólo para 3 de cada 4 intentos. No se deben perder
+    descuentos ni quedar saldo negativo.
+    """
+
+    CAJEROS = 6
+    PAGOS = 8
+    VALOR = Decimal("1000")
+
+    def setUp(self):
+        # La base SQLite en memoria de las pruebas no admite escrituras desde
+        # varios hilos ("database table is locked"); MySQL o SQLite en archivo sí.
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("SQLite en memoria no admite escrituras concurrentes")
+        self.school = School.objects.create(name="Colegio de prueba", domain="pagos.test", logo="logos/x.png")
+        anio = AnioEconomico.objects.create(
+            school=self.school, nombre="prueba-pagos",
+            fecha_inicio="2000-01-01", fecha_fin="2000-12-31",
+        )
+        estudiante = Estudiante.objects.create(
+            school=self.school, nombres="Ana", apellidos="Prueba",
+            identificacion="PAGOS-1", fecha_nacimiento="2010-01-01",
+        )
+        self.aceptables = self.CAJEROS * self.PAGOS * 3 // 4
+        self.total = self.VALOR * self.aceptables
+        concepto = ConceptoPago.objects.create(
+            school=self.school, anio=anio, nombre="Pensión", valor=self.total, bloquea_boletin=False,
+        )
+        self.cuenta = CuentaPorCobrar.objects.create(
+            school=self.school, estudiante=estudiante, concepto=concepto,
+            valor_total=self.total, saldo_pendiente=self.total,
+        )
+
+    def test_sin_descuentos_perdidos_ni_sobrepagos(self):
+        resultados = {"ok": 0, "rechazados": 0}
+        candado = threading.Lock()
+        salida = threading.Barrier(self.CAJEROS)
+
+        def cajero():
+            ok = rechazados = 0
+            try:
+                salida.wait()
+                for _ in range(self.PAGOS):
+                    pago = Pago(school=self.school, cuenta_id=self.cuenta.pk, valor_pagado=self.VALOR, medio_pago="caja")
+                    if registrar_pago(pago):
+                        ok += 1
+                    else:
+                        rechazados += 1
+            finally:
+                connection.close()
+            with candado:
+                resultados["ok"] += ok
+                resultados["rechazados"] += rechazados
+
+        hilos = [threading.Thread(target=cajero) for _ in range(self.CAJEROS)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.cuenta.refresh_from_db()
+        pagado = Pago.objects.filter(cuenta=self.cuenta).aggregate(t=Sum("valor_pagado"))["t"]
+        intentos = self.CAJEROS * self.PAGOS
+        self.assertEqual(resultados["ok"], self.aceptables)
+        self.assertEqual(resultados["rechazados"], intentos - self.aceptables)
+        self.assertEqual(pagado, self.total)
+        self.assertEqual(self.cuenta.saldo_pendiente, Decimal("0"))
+        self.assertTrue(self.cuenta.pagada)
+
+
+class ExtractoCSVTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name="Colegio de prueba", domain="extracto.test", logo="logos/x.png")
+        anio = AnioEconomico.objects.create(
+            school=self.school, nombre="prueba-extracto",
+            fecha_inicio="2000-01-01", fecha_fin="2000-12-31",
+        )
+        estudiante = Estudiante.objects.create(
+            school=self.school, nombres="Luis", apellidos="Prueba",
+            identificacion="1001", fecha_nacimiento="2010-01-01",
+        )
+        concepto = ConceptoPago.objects.create(school=self.school, anio=anio, nombre="Pensión", valor=150000)
+        self.cuentas = [
+            CuentaPorCobrar.objects.create(
+                school=self.school, estudiante=estudiante, concepto=concepto,
+                valor_total=150000, saldo_pendiente=150000, mes=mes, fecha_vencimiento=f"2000-{mes:02d}-05",
+            )
+            for mes in (2, 3, 4)
+        ]
+        self.cuenta = self.cuentas[0]
+
+    def _leer(self, contenido):
+        return leer_extracto(SimpleUploadedFile("extracto.csv", contenido.encode("utf-8")), self.school)
+
+    def test_titulos_del_banco_sobre_el_encabezado(self):
+        contenido = (
+            "Banco X\n"
+            "Movimientos del mes\n"
+            "Fecha;Documento;Valor;Referencia\n"
+            "01/03/2000;1001;150000;TRF-1\n"
+        )
+        archivo = SimpleUploadedFile("extracto.csv", contenido.encode("utf-8"))
+        resultado = leer_extracto(archivo, self.school)
+        self.assertEqual(resultado["excepciones"], [])
+        self.assertEqual(len(resultado["pagos"]), 1)
+        pago = resultado["pagos"][0]
+        self.assertEqual(pago["referencia"], "TRF-1")
+        self.assertEqual([c["id"] for c in pago["cuentas"]], [self.cuenta.id])
+
+    def test_lineas_iguales_sin_fecha_ni_referencia(self):
+        # la pensión de dos meses en un extracto y la del siguiente en otro
+        febrero_marzo = "Banco X febrero-marzo\nDocumento;Valor\n1001;150000\n1001;150000\n"
+        resultado = self._leer(febrero_marzo)
+        self.assertEqual(resultado["excepciones"], [])
+        self.assertEqual(len(resultado["pagos"]), 2)
+        primeros = resultado["pagos"]
+        contabilizar_extracto(self.school, resultado["pagos"])
+
+        resultado = self._leer("Banco X abril\nDocumento;Valor\n1001;150000\n")
+        self.assertEqual(resultado["excepciones"], [])
+        self.assertEqual([c["id"] for c in resultado["pagos"][0]["cuentas"]], [self.cuentas[2].id])
+        contabilizar_extracto(self.school, resultado["pagos"])
+        self.assertEqual(Pago.objects.filter(cuenta__in=self.cuentas).count(), 3)
+
+        # volver a subir el mismo archivo sí se rechaza
+        resultado = self._leer(febrero_marzo)
+        self.assertEqual(resultado["pagos"], [])
+        self.assertEqual(
+            [e["error"] for e in resultado["excepciones"]],
+            [f"La referencia {p['referencia']} ya se importó." for p in primeros],
+        )
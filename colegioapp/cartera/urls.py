@@ -26,8 +26,11 @@ urlpatterns = [
     path("pagos/nuevo/", views.pago_create, name="pago_create"),
     path("pagos/<int:pk>/editar/", views.pago_update, name="pago_update"),
     path("pagos/<int:pk>/eliminar/", views.pago_delete, name="pago_delete"),
+    path("pagos/importar/", views.pagos_importar, name="pagos_importar"),
+    path("pagos/importar/confirmar/", views.pagos_importar_confirmar, name="pagos_importar_confirmar"),
     path("pensiones/selector/", views.cargos_mensuales_selector, name="cargos_mensuales_selector"),
     path("pensiones/planilla/", views.cargos_mensuales_planilla, name="cargos_mensuales_planilla"),
+    path("pensiones/masivo/", views.cargos_mensuales_masivo, name="cargos_mensuales_masivo"),
 # Hub de reportes
     path("reportes/", views.reportes_home, name="reportes"),
 # Reportes individuales
@@ -1,15 +1,263 @@
-from datetime import date
-from .models import CuentaPorCobrar, AnioEconomico
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from academico.models import Estudiante
+from academico.utils_cache import invalidar_datos_estudiante
+from .models import ConceptoPago, CuentaPorCobrar, AnioEconomico, Pago, TrimestreCartera
+
+# Filas por INSERT al generar cargos en bloque
+CARGOS_LOTE = 1000
+# Día del mes en que vence el cargo mensual
+DIA_VENCIMIENTO = 6
+# Estudiantes por consulta al recalcular la deuda bloqueante
+DEUDA_LOTE = 2000
 
 def estudiante_tiene_deuda_bloqueante(estudiante):
-    hoy = date.today()
-    return CuentaPorCobrar.objects.filter(
-        estudiante=estudiante,
-        pagada=False,
-        saldo_pendiente__gt=0,          # hay saldo por pagar
-        concepto__bloquea_boletin=True, # solo conceptos marcados como bloqueantes (pensión, matrícula...)
-        fecha_vencimiento__lt=hoy,      # la fecha de vencimiento ya pasó (por ejemplo, día 6)
-    ).exists()
+    # Estudiante.deuda_bloqueante_desde lo mantiene actualizar_deuda_bloqueante:
+    # basta comparar con hoy, sin consultar cartera
+    desde = estudiante.deuda_bloqueante_desde
+    return desde is not None and desde <= date.today()
+
+
+def actualizar_deuda_bloqueante(estudiante_ids):
+    """
+    Recalcula Estudiante.deuda_bloqueante_desde: el día siguiente al primer
+    vencimiento con saldo de un concepto que bloquea el boletín (pensión,
+    matrícula...), o None si no hay. Como se guarda la fecha y no un sí/no,
+    la cuenta que se vence mañana bloquea mañana sin volver a escribir nada.
+
+    Una consulta agrupada por cada DEUDA_LOTE estudiantes y un UPDATE por
+    fecha distinta, sólo para quienes cambian. Devuelve cuántos cambiaron.
+    """
+    ids = sorted({i for i in estudiante_ids if i})
+    cambiados = 0
+    for inicio in range(0, len(ids), DEUDA_LOTE):
+        lote = ids[inicio:inicio + DEUDA_LOTE]
+        vencimientos = dict(
+            CuentaPorCobrar.objects
+            .filter(
+                estudiante_id__in=lote,
+                pagada=False,
+                saldo_pendiente__gt=0,           # hay saldo por pagar
+                concepto__bloquea_boletin=True,  # solo conceptos marcados como bloqueantes
+                fecha_vencimiento__isnull=False,
+            )
+            .values("estudiante_id")
+            .annotate(primero=Min("fecha_vencimiento"))
+            .values_list("estudiante_id", "primero")
+        )
+
+        por_fecha = defaultdict(list)
+        for est_id, actual in Estudiante.objects.filter(pk__in=lote).values_list("id", "deuda_bloqueante_desde"):
+            primero = vencimientos.get(est_id)
+            # bloquea cuando la fecha de vencimiento ya pasó (por ejemplo, día 6)
+            desde = primero + timedelta(days=1) if primero else None
+            if desde != actual:
+                por_fecha[desde].append(est_id)
+
+        for desde, grupo in por_fecha.items():
+            # update(): no dispara las señales de Estudiante
+            Estudiante.objects.filter(pk__in=grupo).update(deuda_bloqueante_desde=desde)
+            cambiados += len(grupo)
+    return cambiados
+
+
+def recalcular_deuda_bloqueante(school=None):
+    """Pasada completa (comando nocturno): corrige lo que se escribió sin señales."""
+    estudiantes = Estudiante.objects.all()
+    if school is not None:
+        estudiantes = estudiantes.filter(school=school)
+    return actualizar_deuda_bloqueante(estudiantes.values_list("id", flat=True))
+
+def mover_saldo(cuenta_id, valor):
+    """
+    Descuenta ``valor`` del saldo de la cuenta (negativo: lo devuelve) con un
+    UPDATE ... SET saldo = saldo - valor que sólo aplica si el saldo alcanza.
+    La base de datos hace la resta con la fila bloqueada, así dos cajeros
+    sobre la misma cuenta no se pisan ni la dejan en negativo.
+
+    Devuelve False si el saldo no alcanzaba. Llamar dentro de transaction.atomic().
+    """
+    cuentas = CuentaPorCobrar.objects.filter(pk=cuenta_id)
+    if valor > 0:
+        cuentas = cuentas.filter(saldo_pendiente__gte=valor)
+    if not cuentas.update(saldo_pendiente=F("saldo_pendiente") - valor):
+        return False
+    CuentaPorCobrar.objects.filter(pk=cuenta_id).update(
+        pagada=Case(When(saldo_pendiente=0, then=Value(True)), default=Value(False))
+    )
+    return True
+
+
+def registrar_pago(pago):
+    """
+    Guarda un Pago nuevo y lo descuenta del saldo en la misma transacción.
+    Devuelve False (sin guardar nada) si el saldo ya no alcanza.
+    """
+    with transaction.atomic():
+        if not mover_saldo(pago.cuenta_id, pago.valor_pagado or Decimal("0")):
+            return False
+        pago.save()  # sus señales recalculan la deuda bloqueante y el portal
+    return True
+
+
+def _pagado_por_cuenta():
+    return Coalesce(
+        Subquery(
+            Pago.objects
+            .filter(cuenta=OuterRef("pk"))
+            .values("cuenta")
+            .annotate(total=Sum("valor_pagado"))
+            .values("total")
+        ),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def cuentas_descuadradas(school=None):
+    """
+    Cuentas cuyo saldo o marca de pagada no coincide con lo que dicen sus
+    pagos: saldo = max(valor_total - suma de pagos, 0). Una sola consulta
+    con la suma de pagos como subconsulta por cuenta.
+
+    Un saldo ajustado a mano en el formulario de la cuenta (descuento, beca)
+    también aparece aquí: es un descuadre frente a los pagos.
+    """
+    cuentas = CuentaPorCobrar.objects.all()
+    if school is not None:
+        cuentas = cuentas.filter(concepto__school=school)
+    return (
+        cuentas
+        .annotate(pagado=_pagado_por_cuenta())
+        .annotate(esperado=Greatest(F("valor_total") - F("pagado"), Value(Decimal("0"))))
+        .filter(
+            ~Q(saldo_pendiente=F("esperado"))
+            | Q(pagada=True, esperado__gt=0)
+            | Q(pagada=False, esperado=0)
+        )
+    )
+
+
+def cuadrar_saldos(cuenta_ids):
+    """Recalcula saldo y pagada desde los pagos, en dos UPDATE para todas las cuentas."""
+    ids = list(cuenta_ids)
+    if not ids:
+        return 0
+    with transaction.atomic():
+        cuentas = CuentaPorCobrar.objects.filter(pk__in=ids)
+        n = cuentas.update(
+            saldo_pendiente=Greatest(F("valor_total") - _pagado_por_cuenta(), Value(Decimal("0")))
+        )
+        cuentas.update(pagada=Case(When(saldo_pendiente=0, then=Value(True)), default=Value(False)))
+
+        estudiantes = set(cuentas.values_list("estudiante_id", flat=True))
+        actualizar_deuda_bloqueante(estudiantes)
+        transaction.on_commit(lambda: [invalidar_datos_estudiante(i) for i in estudiantes])
+    return n
+
+
+def fecha_vencimiento_mes(anio, mes):
+    """Vencimiento del cargo de ``mes``: el DIA_VENCIMIENTO de ese mes del año económico."""
+    try:
+        anio_num = int(str(anio.nombre))
+    except ValueError:
+        anio_num = date.today().year  # fallback seguro
+    return date(anio_num, mes, DIA_VENCIMIENTO)
+
+
+def generar_cargos_mensuales(school, anio, meses, conceptos=None, cursos=None, simular=False):
+    """
+    Cargos de los conceptos recurrentes del año para todos los estudiantes
+    con curso del colegio (o los de ``cursos``) en cada uno de ``meses``.
+
+    Lo ya generado se lee en una consulta y se salta; el resto se inserta
+    con bulk_create(ignore_conflicts=True) por lotes de CARGOS_LOTE, así una
+    segunda corrida (o una planilla de curso en paralelo) no duplica nada:
+    la restricción única (estudiante, concepto, mes) lo garantiza.
+
+    Con ``simular`` sólo calcula el resumen:
+    {"filas": [{"concepto", "mes", "nuevos", "existentes", "valor"}],
+     "estudiantes", "nuevos", "existentes", "valor"}.
+    """
+    if conceptos is None:
+        conceptos = ConceptoPago.objects.filter(school=school, anio=anio, recurrente=True, activo=True)
+    conceptos = list(conceptos.order_by("nombre"))
+    meses = sorted(set(meses))
+
+    estudiantes = Estudiante.objects.filter(school=school, curso__isnull=False)
+    if cursos is not None:
+        estudiantes = estudiantes.filter(curso__in=cursos)
+    ids = list(estudiantes.values_list("id", flat=True))
+
+    existentes = set(
+        CuentaPorCobrar.objects.filter(
+            estudiante_id__in=ids, concepto__in=conceptos, mes__in=meses,
+        ).values_list("estudiante_id", "concepto_id", "mes")
+    )
+    # cargos ya hechos por (concepto, mes)
+    hechos = Counter((concepto_id, mes) for _, concepto_id, mes in existentes)
+
+    filas = []
+    for concepto in conceptos:
+        for mes in meses:
+            ya = hechos[(concepto.id, mes)]
+            filas.append({
+                "concepto": concepto,
+                "mes": mes,
+                "nuevos": len(ids) - ya,
+                "existentes": ya,
+                "valor": (len(ids) - ya) * concepto.valor,
+            })
+    resumen = {
+        "filas": filas,
+        "estudiantes": len(ids),
+        "nuevos": sum(f["nuevos"] for f in filas),
+        "existentes": sum(f["existentes"] for f in filas),
+        "valor": sum((f["valor"] for f in filas), 0),
+    }
+    if simular or not resumen["nuevos"]:
+        return resumen
+
+    def cargos():
+        for concepto in conceptos:
+            for mes in meses:
+                vencimiento = fecha_vencimiento_mes(anio, mes)
+                for est_id in ids:
+                    if (est_id, concepto.id, mes) in existentes:
+                        continue
+                    yield CuentaPorCobrar(
+                        school=school,
+                        estudiante_id=est_id,
+                        concepto=concepto,
+                        fecha_vencimiento=vencimiento,
+                        valor_total=concepto.valor,
+                        saldo_pendiente=concepto.valor,
+                        pagada=False,
+                        mes=mes,
+                    )
+
+    with transaction.atomic():
+        lote = []
+        for cargo in cargos():
+            lote.append(cargo)
+            if len(lote) >= CARGOS_LOTE:
+                CuentaPorCobrar.objects.bulk_create(lote, ignore_conflicts=True)
+                lote = []
+        if lote:
+            CuentaPorCobrar.objects.bulk_create(lote, ignore_conflicts=True)
+
+        # bulk_create no dispara señales: deuda bloqueante y portal de cada estudiante
+        actualizar_deuda_bloqueante(ids)
+        transaction.on_commit(lambda: [invalidar_datos_estudiante(i) for i in ids])
+
+    return resumen
+
 
 TRIMESTRES = {
     1: {
@@ -30,17 +278,66 @@ TRIMESTRES = {
     },
 }
 
+def trimestres_colegio(school):
+    """Trimestres de cobro del colegio (TrimestreCartera) o, si no tiene, los de TRIMESTRES."""
+    propios = {
+        t.numero: t.como_config()
+        for t in TrimestreCartera.objects.filter(school=school)
+    }
+    return propios or TRIMESTRES
+
+
+def _fecha_limite(anio, conf):
+    year_int = int(anio.nombre)  # asumiendo anio.nombre = "2025"
+    dl_month, dl_day = conf["deadline"]
+    return date(year_int, dl_month, dl_day)
+
+
+def estado_cartera_estudiantes(estudiante_ids, anio: AnioEconomico, trimestre: int, school):
+    """
+    Estado de cartera de varios estudiantes para el boletín de un trimestre,
+    en una sola consulta agrupada por estudiante con sumas condicionales:
+    {estudiante_id: {"pendiente", "bloqueado"}} (sin deudas = no aparece).
+    Devuelve {} si el colegio no tiene ese trimestre.
+    """
+    conf = trimestres_colegio(school).get(trimestre)
+    if conf is None:
+        return {}
+    vencido = date.today() > _fecha_limite(anio, conf)
+
+    filas = (
+        CuentaPorCobrar.objects
+        .filter(
+            estudiante_id__in=estudiante_ids,
+            concepto__anio=anio,
+            saldo_pendiente__gt=0,
+            pagada=False,
+        )
+        .values("estudiante_id")
+        .annotate(
+            trimestre=Sum("saldo_pendiente", filter=Q(mes__in=conf["meses"])),
+            anio=Sum("saldo_pendiente"),
+        )
+    )
+
+    estado = {}
+    for f in filas:
+        # 3er trimestre: cuenta la deuda de TODO concepto del año
+        pendiente = f["anio"] if conf.get("check_all_concepts") else (f["trimestre"] or 0)
+        if pendiente:
+            estado[f["estudiante_id"]] = {"pendiente": pendiente, "bloqueado": vencido}
+    return estado
+
+
 def resumen_cartera_para_boletin(estudiante, anio: AnioEconomico, trimestre: int):
     """
     Devuelve si el estudiante puede ver el boletín de ese trimestre
-    y el detalle de lo que debe.
+    y el detalle de lo que debe, o None si el colegio no tiene ese trimestre.
     """
-    conf = TRIMESTRES[trimestre]
-    year_int = int(anio.nombre)  # asumiendo anio.nombre = "2025"
-
-    dl_month, dl_day = conf["deadline"]
-    deadline = date(year_int, dl_month, dl_day)
-    hoy = date.today()
+    conf = trimestres_colegio(estudiante.school_id).get(trimestre)
+    if conf is None:
+        return None
+    deadline = _fecha_limite(anio, conf)
 
     # Deudas de los meses del trimestre, cualquier concepto de ese año
     deudas_trimestre = CuentaPorCobrar.objects.filter(
@@ -62,31 +359,20 @@ def resumen_cartera_para_boletin(estudiante, anio: AnioEconomico, trimestre: int
                 saldo_pendiente__gt=0,
                 pagada=False,
             )
+            .exclude(mes__in=conf["meses"])
         )
 
-    tiene_deudas_trimestre = deudas_trimestre.exists()
-    tiene_deudas_otros = deudas_otros.exists()
-
-    total_pendiente = (
-        deudas_trimestre.aggregate(total=Sum("saldo_pendiente"))["total"] or 0
-    )
-    if conf.get("check_all_concepts"):
-        total_pendiente += (
-            deudas_otros.aggregate(total=Sum("saldo_pendiente"))["total"] or 0
-        )
-
-    puede_ver = True
-    motivo = ""
+    estado = estado_cartera_estudiantes([estudiante.id], anio, trimestre, estudiante.school_id)
+    est_estado = estado.get(estudiante.id, {"pendiente": 0, "bloqueado": False})
 
-    if hoy > deadline and (tiene_deudas_trimestre or tiene_deudas_otros):
-        puede_ver = False
-        motivo = "Presenta obligaciones económicas pendientes para este trimestre."
+    puede_ver = not est_estado["bloqueado"]
+    motivo = "" if puede_ver else "Presenta obligaciones económicas pendientes para este trimestre."
 
     return {
         "puede_ver": puede_ver,
         "deadline": deadline,
         "deudas_trimestre": deudas_trimestre,
         "deudas_otros": deudas_otros,
-        "total_pendiente": total_pendiente,
+        "total_pendiente": est_estado["pendiente"],
         "motivo": motivo,
-    }
\ No newline at end of file
+    }
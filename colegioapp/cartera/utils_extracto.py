@@ -0,0 +1,361 @@
+"""
+Conciliación de extractos bancarios (.csv o .xlsx).
+
+El extracto trae una fila de encabezados con al menos "Identificación" (o
+"Documento") y "Valor" (o "Monto"); "Fecha" y "Referencia" son opcionales.
+Las filas anteriores al encabezado (títulos del banco) se ignoran. Sin
+"Referencia", cada línea recibe una generada con el archivo y la fila: sólo
+se rechaza como repetida si se vuelve a subir el mismo archivo.
+
+Cada línea se cruza con las cuentas abiertas del estudiante: primero la más
+antigua cuyo saldo es exactamente el valor y, si ninguna, todas sus cuentas
+cuando el valor es el total que debe. Estudiantes, cuentas abiertas y
+referencias ya importadas se cargan en una consulta cada uno para todo el
+archivo. Lo que no cuadra queda como excepción en la vista previa.
+
+contabilizar_extracto guarda lo conciliado en una transacción: bloquea las
+cuentas, inserta los pagos con bulk_create y descuenta los saldos con un
+UPDATE por lote.
+"""
+import csv
+import hashlib
+import io
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from openpyxl import load_workbook
+
+from academico.models import Estudiante
+from academico.utils_cache import invalidar_datos_estudiante
+from .models import CuentaPorCobrar, Pago
+from .utils import actualizar_deuda_bloqueante
+
+# Filas que se revisan buscando el encabezado
+FILAS_ENCABEZADO = 15
+# Cuentas por UPDATE al descontar saldos
+SALDOS_LOTE = 500
+MEDIO_PAGO_EXTRACTO = "transferencia"
+
+COLUMNAS = {
+    "identificacion": ("identificación", "identificacion", "documento", "cédula", "cedula", "nit"),
+    "valor": ("valor", "monto", "crédito", "credito", "abono"),
+    "fecha": ("fecha",),
+    "referencia": ("referencia", "ref", "comprobante"),
+}
+
+
+def _texto(valor):
+    """Celda a texto: 1012345678.0 -> '1012345678'."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _valor(celda):
+    """
+    Valor del extracto a Decimal. Acepta números de Excel y textos como
+    "$ 1.250.000", "1.250.000,50" o "1,250,000.50". Devuelve None si no es válido.
+    """
+    if isinstance(celda, (int, float, Decimal)):
+        return Decimal(str(celda))
+    texto = re.sub(r"[^\d,.\-]", "", _texto(celda))
+    if not texto:
+        return None
+    if "," in texto and "." in texto:
+        # el último separador es el decimal
+        miles, decimal = (".", ",") if texto.rfind(",") > texto.rfind(".") else (",", ".")
+        texto = texto.replace(miles, "").replace(decimal, ".")
+    elif "," in texto:
+        partes = texto.split(",")
+        texto = texto.replace(",", ".") if len(partes) == 2 and len(partes[1]) <= 2 else texto.replace(",", "")
+    elif texto.count(".") > 1 or re.search(r"\.\d{3}$", texto):
+        texto = texto.replace(".", "")  # 150.000 = ciento cincuenta mil
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        return None
+
+
+def _fecha(celda):
+    if isinstance(celda, datetime):
+        return celda.date()
+    if isinstance(celda, date):
+        return celda
+    texto = _texto(celda)
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _filas_csv(archivo):
+    crudo = archivo.read()
+    try:
+        texto = crudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = crudo.decode("latin-1")  # exportaciones de Excel en Windows
+    yield from csv.reader(io.StringIO(texto), delimiter=_separador(texto))
+
+
+def _separador(texto):
+    """
+    El separador se saca de la fila de encabezado: el primero con el que
+    alguna de las primeras líneas tiene las columnas conocidas. Los títulos
+    del banco encima del encabezado no traen separadores y confunden a
+    csv.Sniffer. Sin encabezado reconocible, coma.
+    """
+    for linea in texto.splitlines()[:FILAS_ENCABEZADO]:
+        for separador in (";", ",", "\t"):
+            if _columnas(next(csv.reader([linea], delimiter=separador), [])):
+                return separador
+    return ","
+
+
+def _filas_xlsx(archivo):
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _columnas(fila):
+    """Posición de cada columna conocida en la fila, o None si no es el encabezado."""
+    nombres = [_texto(v).lower() for v in fila]
+    posiciones = {}
+    for clave, alias in COLUMNAS.items():
+        for i, nombre in enumerate(nombres):
+            if nombre in alias:
+                posiciones[clave] = i
+                break
+    if "identificacion" in posiciones and "valor" in posiciones:
+        return posiciones
+    return None
+
+
+def _detalle(cuenta):
+    return f"{cuenta.concepto.nombre} {cuenta.nombre_mes}".strip()
+
+
+def _referencia_generada(digesto, numero, fecha, identificacion, valor):
+    # sin referencia del banco: la fila de este archivo (volver a subirlo da
+    # las mismas); dos meses o dos transferencias iguales no chocan
+    base = f"{digesto}|{numero}|{fecha or ''}|{identificacion}|{valor}"
+    return "EXT-" + hashlib.sha1(base.encode()).hexdigest()[:16]
+
+
+def leer_extracto(archivo, school):
+    """
+    Lee el extracto y lo concilia contra la cartera del colegio.
+
+    Devuelve {"pagos": [{"fila", "identificacion", "estudiante",
+    "estudiante_id", "valor", "fecha", "referencia", "cuentas": [{"id",
+    "valor", "detalle"}]}], "excepciones": [{"fila", "identificacion",
+    "valor", "error"}], "total": Decimal}. Lanza ValueError si el archivo no
+    tiene encabezado reconocible.
+    """
+    digesto = hashlib.sha1(archivo.read()).hexdigest()
+    archivo.seek(0)
+    filas = _filas_xlsx(archivo) if archivo.name.lower().endswith(".xlsx") else _filas_csv(archivo)
+
+    # ---- encabezado ----
+    columnas = None
+    for numero, fila in enumerate(filas, start=1):
+        columnas = _columnas(fila) if fila else None
+        if columnas or numero >= FILAS_ENCABEZADO:
+            break
+    if not columnas:
+        raise ValueError("No se encontró el encabezado (Identificación y Valor) en las primeras filas.")
+
+    def celda(fila, clave):
+        i = columnas.get(clave)
+        return fila[i] if i is not None and i < len(fila) else None
+
+    # ---- líneas ----
+    resultado = {"pagos": [], "excepciones": [], "total": Decimal("0")}
+    excepciones = resultado["excepciones"]
+    lineas = []
+    for numero, fila in enumerate(filas, start=numero + 1):
+        if not fila or not any(_texto(v) for v in fila):
+            continue
+        identificacion = _texto(celda(fila, "identificacion"))
+        valor = _valor(celda(fila, "valor"))
+        if not identificacion:
+            excepciones.append({"fila": numero, "identificacion": "", "valor": valor, "error": "Sin identificación."})
+            continue
+        if valor is None or valor <= 0:
+            excepciones.append({
+                "fila": numero, "identificacion": identificacion, "valor": valor,
+                "error": "Valor vacío, negativo o no numérico.",
+            })
+            continue
+        fecha = _fecha(celda(fila, "fecha"))
+        referencia = (
+            _texto(celda(fila, "referencia"))[:80]
+            or _referencia_generada(digesto, numero, fecha, identificacion, valor)
+        )
+        lineas.append((numero, identificacion, valor, fecha, referencia))
+
+    if not lineas:
+        return resultado
+
+    # ---- datos en bloque: una consulta por tabla ----
+    estudiantes = {
+        e.identificacion.strip(): e
+        for e in Estudiante.objects.filter(
+            school=school, identificacion__in={ident for _, ident, _, _, _ in lineas}
+        )
+    }
+    abiertas = defaultdict(list)
+    for c in (
+        CuentaPorCobrar.objects
+        .select_related("concepto")
+        .filter(
+            estudiante__in=estudiantes.values(),
+            concepto__school=school,
+            pagada=False,
+            saldo_pendiente__gt=0,
+        )
+        .order_by("fecha_vencimiento", "id")
+    ):
+        abiertas[c.estudiante_id].append(c)
+    importadas = set(
+        Pago.objects
+        .filter(cuenta__concepto__school=school, referencia__in={ref for *_, ref in lineas})
+        .values_list("referencia", flat=True)
+    )
+
+    # ---- conciliación ----
+    usadas = set()      # cuentas ya tomadas por una línea anterior del archivo
+    vistas = set()      # referencias repetidas dentro del archivo
+    for numero, identificacion, valor, fecha, referencia in lineas:
+        def excepcion(error):
+            excepciones.append({"fila": numero, "identificacion": identificacion, "valor": valor, "error": error})
+
+        est = estudiantes.get(identificacion)
+        if est is None:
+            excepcion("No hay un estudiante con esa identificación en el colegio.")
+            continue
+        if referencia in importadas:
+            excepcion(f"La referencia {referencia} ya se importó.")
+            continue
+        if referencia in vistas:
+            excepcion(f"La referencia {referencia} está repetida en el archivo.")
+            continue
+
+        libres = [c for c in abiertas[est.id] if c.id not in usadas]
+        if not libres:
+            excepcion(f"{est} no tiene cuentas pendientes.")
+            continue
+
+        cuentas = next(([c] for c in libres if c.saldo_pendiente == valor), None)
+        if cuentas is None and sum(c.saldo_pendiente for c in libres) == valor:
+            cuentas = libres
+        if cuentas is None:
+            saldos = ", ".join(f"{_detalle(c)}: {c.saldo_pendiente}" for c in libres)
+            excepcion(f"El valor no coincide con ningún saldo de {est} ({saldos}).")
+            continue
+
+        usadas.update(c.id for c in cuentas)
+        vistas.add(referencia)
+        resultado["total"] += valor
+        resultado["pagos"].append({
+            "fila": numero,
+            "identificacion": identificacion,
+            "estudiante": str(est),
+            "estudiante_id": est.id,
+            "valor": valor,
+            "fecha": fecha,
+            "referencia": referencia,
+            "cuentas": [
+                {
+                    "id": c.id,
+                    "valor": c.saldo_pendiente,
+                    "detalle": _detalle(c),
+                }
+                for c in cuentas
+            ],
+        })
+    excepciones.sort(key=lambda e: e["fila"])
+    return resultado
+
+
+def contabilizar_extracto(school, pagos, medio_pago=MEDIO_PAGO_EXTRACTO):
+    """
+    Registra los pagos conciliados por leer_extracto en una transacción.
+
+    Las cuentas se bloquean (select_for_update) y se revisa que el saldo
+    siga alcanzando: si otro cajero pagó algo entre la vista previa y la
+    confirmación, esa línea se omite entera. Los pagos van en un bulk_create
+    y los saldos se descuentan con UPDATE ... CASE por lotes de SALDOS_LOTE.
+
+    Devuelve {"registrados": n, "total": Decimal, "omitidos": [{"fila", "error"}]}.
+    """
+    ids = {c["id"] for p in pagos for c in p["cuentas"]}
+    resultado = {"registrados": 0, "total": Decimal("0"), "omitidos": []}
+
+    with transaction.atomic():
+        saldos = dict(
+            CuentaPorCobrar.objects
+            .select_for_update()
+            .filter(pk__in=ids, concepto__school=school)
+            .values_list("id", "saldo_pendiente")
+        )
+        referencias = {p["referencia"] for p in pagos}
+        importadas = set(
+            Pago.objects
+            .filter(cuenta__concepto__school=school, referencia__in=referencias)
+            .values_list("referencia", flat=True)
+        )
+
+        nuevos, descuentos, estudiantes = [], defaultdict(Decimal), set()
+        for p in pagos:
+            if p["referencia"] in importadas:
+                resultado["omitidos"].append({"fila": p["fila"], "error": "La referencia ya se importó."})
+                continue
+            if any(saldos.get(c["id"], Decimal("0")) < c["valor"] for c in p["cuentas"]):
+                resultado["omitidos"].append({"fila": p["fila"], "error": "El saldo cambió desde la vista previa."})
+                continue
+            for c in p["cuentas"]:
+                saldos[c["id"]] -= c["valor"]
+                descuentos[c["id"]] += c["valor"]
+                nuevos.append(Pago(
+                    school=school,
+                    cuenta_id=c["id"],
+                    valor_pagado=c["valor"],
+                    medio_pago=medio_pago,
+                    referencia=p["referencia"],
+                    observaciones=(
+                        f"Extracto bancario, fila {p['fila']}"
+                        + (f", transferencia del {p['fecha']:%d/%m/%Y}" if p["fecha"] else "")
+                    ),
+                ))
+            estudiantes.add(p["estudiante_id"])
+            resultado["registrados"] += 1
+            resultado["total"] += p["valor"]
+
+        Pago.objects.bulk_create(nuevos, batch_size=SALDOS_LOTE)
+
+        cuenta_ids = list(descuentos)
+        for inicio in range(0, len(cuenta_ids), SALDOS_LOTE):
+            lote = cuenta_ids[inicio:inicio + SALDOS_LOTE]
+            cuentas = CuentaPorCobrar.objects.filter(pk__in=lote)
+            cuentas.update(saldo_pendiente=Case(
+                *[When(pk=i, then=F("saldo_pendiente") - descuentos[i]) for i in lote],
+                default=F("saldo_pendiente"),
+            ))
+            cuentas.update(pagada=Case(When(saldo_pendiente=0, then=Value(True)), default=Value(False)))
+
+        # bulk_create y update no disparan señales: deuda bloqueante y portal
+        actualizar_deuda_bloqueante(estudiantes)
+        transaction.on_commit(lambda: [invalidar_datos_estudiante(i) for i in estudiantes])
+
+    return resultado
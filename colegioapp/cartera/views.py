@@ -8,8 +8,19 @@ from django.contrib import messages
 from .forms import AnioEconomicoForm, ConceptoPagoForm, CuentaPorCobrarForm, PagoForm
 from urllib.parse import urlencode
 from django.db import transaction
+import time
+import uuid
 from decimal import Decimal
 from academico.models import Curso, Estudiante
+from academico.utils_cache import invalidar_datos_estudiante
+from .utils_extracto import contabilizar_extracto, leer_extracto
+from .utils import (
+    actualizar_deuda_bloqueante, fecha_vencimiento_mes, generar_cargos_mensuales, mover_saldo, registrar_pago,
+)
+
+# Tamaño máximo del extracto bancario y tiempo que espera la vista previa
+EXTRACTO_MAX_BYTES = 5 * 1024 * 1024
+EXTRACTO_TIMEOUT = 30 * 60
 
 MESES = [
     (1, "Enero"),
@@ -112,27 +123,14 @@ def cargos_mensuales_planilla(request):
     # Valor y fecha de vencimiento por defecto
     valor_defecto = concepto.valor or Decimal("0")
 
-    # Si anio.nombre es "2026" (string), esto funciona:
-    try:
-        anio_num = int(str(anio.nombre))
-    except ValueError:
-        anio_num = date.today().year  # fallback seguro
-
     # Ej: vence el día 6 del mes
-    fecha_vencimiento_defecto = date(anio_num, mes, 6)
+    fecha_vencimiento_defecto = fecha_vencimiento_mes(anio, mes)
 
     if request.method == "POST":
         seleccionados = set(request.POST.getlist("estudiantes"))  # ids como strings
-        creadas = 0
-
-        for est in estudiantes:
-            if str(est.id) not in seleccionados:
-                continue
-
-            if est.id in cuentas_existentes:
-                continue
-
-            CuentaPorCobrar.objects.create(
+        nuevas = [
+            CuentaPorCobrar(
+                school=school,
                 estudiante=est,
                 concepto=concepto,
                 fecha_vencimiento=fecha_vencimiento_defecto,
@@ -141,7 +139,18 @@ def cargos_mensuales_planilla(request):
                 pagada=False,
                 mes=mes,
             )
-            creadas += 1
+            for est in estudiantes
+            if str(est.id) in seleccionados and est.id not in cuentas_existentes
+        ]
+        with transaction.atomic():
+            # la restricción única salta lo que otro usuario haya generado mientras tanto
+            CuentaPorCobrar.objects.bulk_create(nuevas, ignore_conflicts=True)
+            ids = [c.estudiante_id for c in nuevas]
+            actualizar_deuda_bloqueante(ids)
+            transaction.on_commit(lambda: [invalidar_datos_estudiante(i) for i in ids])
+        creadas = CuentaPorCobrar.objects.filter(
+            estudiante__in=estudiantes, concepto=concepto, mes=mes
+        ).count() - len(cuentas_existentes)
 
         messages.success(request, f"Se generaron {creadas} cargos para {curso} / mes {mes}.")
         url = (
@@ -176,6 +185,77 @@ def cargos_mensuales_planilla(request):
     return render(request, "cartera/cargos_mensuales_planilla.html", ctx)
 
 
+def cargos_mensuales_masivo(request):
+    """
+    Cargos mensuales de todo el colegio: conceptos recurrentes del año x
+    meses x estudiantes con curso. "Simular" sólo muestra el resumen;
+    "Generar" crea lo que falte (lo ya generado se respeta).
+    """
+    school = getattr(request, "school", None)
+    if not school:
+        messages.error(request, "No se detectó el colegio del dominio.")
+        return redirect("cartera:home")
+
+    anios = AnioEconomico.objects.filter(school=school).order_by("-activo", "-nombre")  # 👈
+    cursos = Curso.objects.filter(school=school).order_by("grado", "nombre")  # 👈
+
+    datos = request.POST if request.method == "POST" else request.GET
+    anio_id = (datos.get("anio") or "").strip()
+    anio = anios.filter(pk=anio_id).first() if anio_id.isdigit() else anios.filter(activo=True).first()
+
+    conceptos = ConceptoPago.objects.none()
+    if anio:
+        conceptos = ConceptoPago.objects.filter(
+            school=school, anio=anio, recurrente=True, activo=True  # 👈
+        ).order_by("nombre")
+
+    meses_sel = [int(m) for m in datos.getlist("meses") if m.isdigit() and 1 <= int(m) <= 12]
+    conceptos_sel = [c for c in datos.getlist("conceptos") if c.isdigit()]
+    cursos_sel = [c for c in datos.getlist("cursos") if c.isdigit()]
+
+    resumen = None
+    if request.method == "POST":
+        if not anio:
+            messages.error(request, "Selecciona el año económico.")
+        elif not meses_sel:
+            messages.error(request, "Selecciona al menos un mes.")
+        elif not conceptos.exists():
+            messages.error(request, "El año no tiene conceptos recurrentes activos.")
+        else:
+            elegidos = conceptos.filter(pk__in=conceptos_sel) if conceptos_sel else conceptos
+            simular = "generar" not in request.POST
+            resumen = generar_cargos_mensuales(
+                school, anio, meses_sel,
+                conceptos=elegidos,
+                cursos=cursos.filter(pk__in=cursos_sel) if cursos_sel else None,
+                simular=simular,
+            )
+            nombres = dict(MESES)
+            for fila in resumen["filas"]:
+                fila["nombre_mes"] = nombres[fila["mes"]]
+            resumen["simulado"] = simular
+            if not simular:
+                messages.success(
+                    request,
+                    f"Se generaron {resumen['nuevos']} cargos "
+                    f"({resumen['existentes']} ya existían).",
+                )
+
+    ctx = {
+        "anios": anios,
+        "anio": anio,
+        "cursos": cursos,
+        "conceptos": conceptos,
+        "meses": MESES,
+        "meses_sel": meses_sel,
+        "conceptos_sel": conceptos_sel,
+        "cursos_sel": cursos_sel,
+        "resumen": resumen,
+        "nav_active": "cartera",
+    }
+    return render(request, "cartera/cargos_mensuales_masivo.html", ctx)
+
+
 def conceptos_list(request):
     school = getattr(request, "school", None)
 
@@ -725,19 +805,16 @@ def pago_create(request):
     if request.method == "POST":
         form = PagoForm(request.POST, school=school)
         if form.is_valid():
-            with transaction.atomic():
-                pago = form.save(commit=False)
-                cuenta = pago.cuenta
-
-                cuenta.saldo_pendiente = (cuenta.saldo_pendiente or Decimal("0")) - (pago.valor_pagado or Decimal("0"))
-                if cuenta.saldo_pendiente <= 0:
-                    cuenta.saldo_pendiente = Decimal("0")
-                    cuenta.pagada = True
-                cuenta.save(update_fields=["saldo_pendiente", "pagada"])
-                pago.save()
-
-            messages.success(request, "Pago registrado correctamente.")
-            return redirect("cartera:pagos")
+            pago = form.save(commit=False)
+            # el saldo se descuenta en la base de datos: otro cajero pudo pagar la misma cuenta
+            if registrar_pago(pago):
+                messages.success(request, "Pago registrado correctamente.")
+                return redirect("cartera:pagos")
+            cuenta = CuentaPorCobrar.objects.get(pk=pago.cuenta_id)
+            form.add_error(
+                "valor_pagado",
+                f"El saldo de la cuenta cambió mientras registrabas el pago: ahora es {cuenta.saldo_pendiente}.",
+            )
     else:
         form = PagoForm(school=school)
 
@@ -756,21 +833,30 @@ def pago_update(request, pk):
         form = PagoForm(request.POST, instance=obj, school=school)
         if form.is_valid():
             with transaction.atomic():
-                original = Pago.objects.select_related("cuenta").get(pk=obj.pk)
+                # bloquea el pago: dos ediciones a la vez no calculan el delta sobre el mismo original
+                original = Pago.objects.select_for_update().get(pk=obj.pk)
                 pago = form.save(commit=False)
-                cuenta = pago.cuenta
-
-                delta = (pago.valor_pagado or Decimal("0")) - (original.valor_pagado or Decimal("0"))
-                cuenta.saldo_pendiente = (cuenta.saldo_pendiente or Decimal("0")) - delta
+                valor = pago.valor_pagado or Decimal("0")
+                valor_original = original.valor_pagado or Decimal("0")
 
-                if cuenta.saldo_pendiente <= 0:
-                    cuenta.saldo_pendiente = Decimal("0")
-                    cuenta.pagada = True
+                if pago.cuenta_id == original.cuenta_id:
+                    aplicado = mover_saldo(pago.cuenta_id, valor - valor_original)
                 else:
-                    cuenta.pagada = False
+                    # cambió de cuenta: se devuelve a la anterior y se cobra en la nueva
+                    aplicado = mover_saldo(original.cuenta_id, -valor_original) and mover_saldo(pago.cuenta_id, valor)
+                if aplicado:
+                    pago.save()
+                    if pago.cuenta_id != original.cuenta_id:
+                        # las señales del pago sólo cubren la cuenta nueva
+                        est_anterior = original.cuenta.estudiante_id
+                        actualizar_deuda_bloqueante([est_anterior])
+                        transaction.on_commit(lambda: invalidar_datos_estudiante(est_anterior))
+                else:
+                    transaction.set_rollback(True)
 
-                cuenta.save(update_fields=["saldo_pendiente", "pagada"])
-                pago.save()
+            if not aplicado:
+                form.add_error("valor_pagado", "El nuevo valor excede el saldo pendiente actual de la cuenta.")
+                return render(request, "cartera/pago_form.html", {"form": form, "edit_mode": True, "obj": obj, "nav_active": "cartera"})
 
             messages.success(request, "Pago actualizado correctamente.")
             return redirect("cartera:pagos")
@@ -790,14 +876,128 @@ def pago_delete(request, pk):
 
     if request.method == "POST":
         with transaction.atomic():
-            cuenta = obj.cuenta
-            cuenta.saldo_pendiente = (cuenta.saldo_pendiente or Decimal("0")) + (obj.valor_pagado or Decimal("0"))
-            if cuenta.saldo_pendiente > 0:
-                cuenta.pagada = False
-            cuenta.save(update_fields=["saldo_pendiente", "pagada"])
-            obj.delete()
+            # si otro usuario ya lo borró, no se devuelve dos veces el valor
+            pago = Pago.objects.select_for_update().filter(pk=obj.pk).first()
+            if pago is not None:
+                mover_saldo(pago.cuenta_id, -(pago.valor_pagado or Decimal("0")))
+                pago.delete()
 
         messages.success(request, "Pago eliminado.")
         return redirect("cartera:pagos")
 
-    return render(request, "cartera/pago_confirm_delete.html", {"obj": obj, "nav_active": "cartera"})
\ No newline at end of file
+    return render(request, "cartera/pago_confirm_delete.html", {"obj": obj, "nav_active": "cartera"})
+
+def _guardar_extracto(request, token, school, pagos):
+    """
+    Deja los pagos conciliados en la sesión (que vive en la base): la
+    confirmación puede llegar a otro proceso de la app. La sesión se guarda
+    como JSON, así que valores y fechas van como texto. Descarta las vencidas.
+    """
+    ahora = time.time()
+    previas = {
+        t: p for t, p in request.session.get("extracto-cartera", {}).items() if p["expira"] > ahora
+    }
+    previas[token] = {
+        "school_id": school.id,
+        "expira": ahora + EXTRACTO_TIMEOUT,
+        "pagos": [
+            {
+                "fila": p["fila"],
+                "estudiante_id": p["estudiante_id"],
+                "referencia": p["referencia"],
+                "valor": str(p["valor"]),
+                "fecha": p["fecha"].isoformat() if p["fecha"] else None,
+                "cuentas": [{"id": c["id"], "valor": str(c["valor"])} for c in p["cuentas"]],
+            }
+            for p in pagos
+        ],
+    }
+    request.session["extracto-cartera"] = previas
+
+
+def _tomar_extracto(request, token, school):
+    """Saca de la sesión los pagos de la vista previa ``token``; None si no están o vencieron."""
+    previas = request.session.get("extracto-cartera", {})
+    pendiente = previas.pop(token, None)
+    request.session["extracto-cartera"] = previas
+    if pendiente is None or pendiente["expira"] <= time.time() or pendiente["school_id"] != school.id:
+        return None
+    return [
+        {
+            **p,
+            "valor": Decimal(p["valor"]),
+            "fecha": date.fromisoformat(p["fecha"]) if p["fecha"] else None,
+            "cuentas": [{"id": c["id"], "valor": Decimal(c["valor"])} for c in p["cuentas"]],
+        }
+        for p in pendiente["pagos"]
+    ]
+
+
+def pagos_importar(request):
+    """
+    Sube un extracto bancario (.csv o .xlsx) y muestra la vista previa: qué
+    líneas se concilian con cuentas abiertas y cuáles quedan como excepción.
+    Nada se guarda hasta confirmar en pagos_importar_confirmar.
+    """
+    school = getattr(request, "school", None)
+    if not school:
+        messages.error(request, "No se detectó el colegio del dominio.")
+        return redirect("cartera:pagos")
+
+    if request.method != "POST":
+        return render(request, "cartera/pagos_importar.html", {"nav_active": "cartera"})
+
+    archivo = request.FILES.get("archivo")
+    if not archivo or not archivo.name.lower().endswith((".csv", ".xlsx")):
+        messages.error(request, "Selecciona el extracto en .csv o .xlsx.")
+        return redirect("cartera:pagos_importar")
+    if archivo.size > EXTRACTO_MAX_BYTES:
+        messages.error(request, "El archivo es demasiado grande.")
+        return redirect("cartera:pagos_importar")
+
+    try:
+        resultado = leer_extracto(archivo, school)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("cartera:pagos_importar")
+    except Exception:
+        messages.error(request, "No se pudo leer el archivo. Verifica que sea un .csv o .xlsx válido.")
+        return redirect("cartera:pagos_importar")
+
+    token = uuid.uuid4().hex
+    if resultado["pagos"]:
+        _guardar_extracto(request, token, school, resultado["pagos"])
+
+    return render(request, "cartera/pagos_importar_preview.html", {
+        "resultado": resultado,
+        "token": token,
+        "archivo": archivo.name,
+        "nav_active": "cartera",
+    })
+
+
+def pagos_importar_confirmar(request):
+    """Registra los pagos conciliados de la vista previa en una sola transacción."""
+    school = getattr(request, "school", None)
+    if not school or request.method != "POST":
+        return redirect("cartera:pagos")
+
+    pagos = _tomar_extracto(request, request.POST.get("token", ""), school)
+    if not pagos:
+        messages.error(request, "La vista previa expiró. Vuelve a subir el extracto.")
+        return redirect("cartera:pagos_importar")
+
+    resultado = contabilizar_extracto(school, pagos)
+    if resultado["omitidos"]:
+        messages.warning(
+            request,
+            f"Se registraron {resultado['registrados']} pago(s) por ${resultado['total']}; "
+            f"{len(resultado['omitidos'])} línea(s) se omitieron: "
+            + "; ".join(f"fila {o['fila']}: {o['error']}" for o in resultado["omitidos"][:10]),
+        )
+    else:
+        messages.success(
+            request,
+            f"Se registraron {resultado['registrados']} pago(s) del extracto por ${resultado['total']}.",
+        )
+    return redirect("cartera:pagos")
@@ -37,4 +37,15 @@ class SchoolAdmin(admin.ModelAdmin):
                 "phone",
             )
         }),
+        ("Boletines", {
+            "fields": (
+                "motor_pdf",
+            )
+        }),
+        ("Asistencia", {
+            "fields": (
+                "hora_limite_ingreso",
+                "periodo_actual",
+            )
+        }),
     )
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_school_sello'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='motor_pdf',
+            field=models.CharField(choices=[('weasyprint', 'Completo (HTML / WeasyPrint)'), ('reportlab', 'Rápido (reportlab, para impresión masiva)')], default='weasyprint', help_text='El motor rápido dibuja un diseño más sencillo, pensado para imprimir cursos completos.', max_length=20, verbose_name='Motor de boletines en PDF'),
+        ),
+    ]
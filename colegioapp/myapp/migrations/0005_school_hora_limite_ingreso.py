@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_school_motor_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='hora_limite_ingreso',
+            field=models.TimeField(blank=True, help_text='En el ingreso por portería, quien llega después de esta hora queda con tardanza.', null=True, verbose_name='Hora límite de llegada'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.4 on 2026-10-19 16:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0002_aniolectivo_asignaturacatalogo_asignaturaoferta_and_more'),
+        ('myapp', '0005_school_hora_limite_ingreso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='periodo_actual',
+            field=models.ForeignKey(blank=True, help_text='Período en el que la portería registra las llegadas del día.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='academico.periodo', verbose_name='Período actual'),
+        ),
+    ]
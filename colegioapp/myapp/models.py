@@ -37,6 +37,38 @@ class School(models.Model):
     address = models.CharField("Dirección", max_length=250, blank=True)
     phone = models.CharField("Teléfono", max_length=20, blank=True)
 
+    # BOLETINES
+    MOTOR_WEASYPRINT = "weasyprint"
+    MOTOR_REPORTLAB = "reportlab"
+    MOTORES_PDF = [
+        (MOTOR_WEASYPRINT, "Completo (HTML / WeasyPrint)"),
+        (MOTOR_REPORTLAB, "Rápido (reportlab, para impresión masiva)"),
+    ]
+    motor_pdf = models.CharField(
+        "Motor de boletines en PDF",
+        max_length=20,
+        choices=MOTORES_PDF,
+        default=MOTOR_WEASYPRINT,
+        help_text="El motor rápido dibuja un diseño más sencillo, pensado para imprimir cursos completos."
+    )
+
+    # ASISTENCIA
+    hora_limite_ingreso = models.TimeField(
+        "Hora límite de llegada",
+        null=True,
+        blank=True,
+        help_text="En el ingreso por portería, quien llega después de esta hora queda con tardanza."
+    )
+    periodo_actual = models.ForeignKey(
+        "academico.Periodo",
+        verbose_name="Período actual",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="Período en el que la portería registra las llegadas del día."
+    )
+
     class Meta:
         verbose_name = "Colegio"
         verbose_name_plural = "Colegios"